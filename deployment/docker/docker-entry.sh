@@ -2,6 +2,7 @@
 
 /code/manage.py integrity_check --configuration=Production
 /code/manage.py migrate --configuration=Production
+/code/manage.py createcachetable --configuration=Production
 /code/manage.py silk_clear_request_log --configuration=Production
 /code/manage.py creatersakey --configuration=Production
 /code/manage.py print_settings --configuration=Production
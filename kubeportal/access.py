@@ -0,0 +1,174 @@
+"""
+    Cache for the decisions of the sub-authentication endpoint.
+
+    Ingress-nginx asks the portal for every single request to a protected web
+    application. The decision for a (user, web application) pair, together
+    with the bearer token, is therefore kept in the Django cache. The same
+    holds for the set of OIDC clients a user may log in with.
+
+    The cache keys contain version numbers: one per user and one for everything
+    else (groups, web applications, service accounts). The signal handlers in
+    kubeportal/signals.py replace these versions when relevant data changes,
+    which makes all affected entries unreachable at once. A missing version is
+    created with a new random value, so that evicted versions never bring back
+    old entries.
+
+    With the default per-process cache backend, changes made in one worker
+    process reach the other ones only after KUBEPORTAL_SUBAUTH_CACHE_TTL seconds.
+
+    When KUBEPORTAL_SUBAUTH_TICKET_LIFETIME is set, a successful check also
+    issues a signed ticket cookie with the user, its service account and the
+    web applications it may access. Until the ticket expires, it is verified by
+    its signature alone. The same signal handlers put users on an in-memory
+    denylist, which rejects tickets issued before the change. This denylist
+    only exists in the worker process that saw the change, so the ticket
+    lifetime should be short.
+"""
+
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from kubeportal import metrics
+
+GLOBAL_VERSION_KEY = 'kubeportal-access-version'
+USER_VERSION_KEY = 'kubeportal-access-version-user-{}'
+DECISION_KEY = 'kubeportal-subauth-{global_version}-{user_version}-{user_id}-{webapp_pk}'
+OIDC_CLIENTS_KEY = 'kubeportal-oidc-clients-{global_version}-{user_version}-{user_id}'
+
+TICKET_COOKIE_NAME = 'kubeportal_subauth_ticket'
+TICKET_SALT = 'kubeportal.access.ticket'
+
+# User ID -> time of the last revocation, None for all users
+_revoked = {}
+_revoked_lock = threading.Lock()
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def _versions(user_id):
+    keys = [GLOBAL_VERSION_KEY, USER_VERSION_KEY.format(user_id)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return versions[keys[0]], versions[keys[1]]
+
+
+def _decision_key(user_id, webapp_pk):
+    global_version, user_version = _versions(user_id)
+    return DECISION_KEY.format(global_version=global_version, user_version=user_version,
+                               user_id=user_id, webapp_pk=webapp_pk)
+
+
+def get_subauth_decision(user_id, webapp_pk):
+    """
+    Returns the cached decision for the given user and web application as
+    dictionary with the keys 'allowed', 'reason', 'token' and 'session_hash',
+    or None.
+    """
+    decision = cache.get(_decision_key(user_id, webapp_pk))
+    metrics.cache_access('subauth', decision is not None)
+    return decision
+
+
+def store_subauth_decision(user_id, webapp_pk, allowed, reason, token, session_hash):
+    cache.set(_decision_key(user_id, webapp_pk),
+              {'allowed': allowed, 'reason': reason, 'token': token, 'session_hash': session_hash},
+              timeout=settings.SUBAUTH_CACHE_TTL)
+
+
+def allowed_oidc_clients(user):
+    """
+    Returns the set of primary keys of the OIDC clients the given user may log in
+    with, through the web applications of the user's groups.
+    The set is computed by one database query and then cached.
+    """
+    global_version, user_version = _versions(user.pk)
+    key = OIDC_CLIENTS_KEY.format(global_version=global_version, user_version=user_version, user_id=user.pk)
+    clients = cache.get(key)
+    metrics.cache_access('oidc_clients', clients is not None)
+    if clients is None:
+        from kubeportal.models.webapplication import WebApplication
+        clients = set(WebApplication.objects.filter(user_access__user_id=user.pk, oidc_client__isnull=False)
+                      .values_list('oidc_client_id', flat=True))
+        cache.set(key, clients, timeout=settings.SUBAUTH_CACHE_TTL)
+    return clients
+
+
+def issue_ticket(user_id, namespace, service_account, webapp_pks):
+    """
+    Returns a signed ticket for the given user, allowing the sub-authentication
+    for the given web applications with the token of the given service account.
+    """
+    return signing.dumps({'user': str(user_id), 'ns': namespace, 'svca': service_account,
+                          'webapps': sorted(webapp_pks), 'issued': time.time()},
+                         salt=TICKET_SALT, compress=True)
+
+
+def check_ticket(ticket, webapp_pk):
+    """
+    Returns the ticket content when the ticket is valid, not revoked and
+    allows the given web application, otherwise None.
+    """
+    try:
+        content = signing.loads(ticket, salt=TICKET_SALT, max_age=settings.SUBAUTH_TICKET_LIFETIME)
+    except signing.BadSignature:
+        return None
+    if int(webapp_pk) not in content['webapps']:
+        return None
+    with _revoked_lock:
+        revoked = max(_revoked.get(content['user'], 0), _revoked.get(None, 0))
+    if content['issued'] <= revoked:
+        return None
+    return content
+
+
+def ticket_token(ticket, webapp_pk):
+    """
+    Returns the bearer token for the given ticket cookie value,
+    or None if tickets are disabled or the ticket does not allow the web application.
+    """
+    if not settings.SUBAUTH_TICKET_LIFETIME or not ticket:
+        return None
+    content = check_ticket(ticket, webapp_pk)
+    if content is None:
+        return None
+    from kubeportal.k8s.kubernetes_api import get_service_account_token
+    try:
+        return get_service_account_token(content['ns'], content['svca'])
+    except Exception:
+        return None
+
+
+def _revoke(user_id):
+    now = time.time()
+    with _revoked_lock:
+        # Entries older than the ticket lifetime have no effect anymore
+        for key in [key for key, revoked in _revoked.items()
+                    if now - revoked > settings.SUBAUTH_TICKET_LIFETIME]:
+            del _revoked[key]
+        _revoked[user_id] = now
+
+
+def invalidate_user(user_id):
+    """
+    Drops all cached decisions and tickets for the given user.
+    """
+    cache.set(USER_VERSION_KEY.format(user_id), _new_version(), timeout=None)
+    _revoke(str(user_id))
+
+
+def invalidate_all():
+    """
+    Drops all cached decisions and tickets.
+    """
+    cache.set(GLOBAL_VERSION_KEY, _new_version(), timeout=None)
+    _revoke(None)
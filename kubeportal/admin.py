@@ -15,8 +15,9 @@ from oidc_provider.models import Client
 from sortedm2m_filter_horizontal_widget.forms import SortedFilteredSelectMultiple
 import logging
 import uuid
+from collections import Counter
 from . import models, admin_views
-from .k8s import k8s_sync, kubernetes_api as api
+from .k8s import k8s_sync, sync_scheduler, kubernetes_api as api
 from .models.kubernetesnamespace import KubernetesNamespace
 from .models.kubernetesserviceaccount import KubernetesServiceAccount
 from .models.portalgroup import PortalGroup
@@ -36,10 +37,17 @@ class CustomAdminSite(admin.AdminSite):
         urls += [
                 path('cleanup/', admin_views.CleanupView.as_view(), name='cleanup'),
                 path('sync/', admin_views.sync_view, name='sync'),
+                path('sync/status/', admin_views.SyncStatusView.as_view(), name='sync_status'),
                 path('prune/', admin_views.prune, name='prune')
                 ]
         return urls
 
+    def index(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['sync_interval'] = settings.SYNC_INTERVAL
+        extra_context['sync_state'] = sync_scheduler.get_state()
+        return super().index(request, extra_context)
+
 
 class KubernetesServiceAccountAdmin(admin.ModelAdmin):
     list_display = ['name', 'namespace']
@@ -187,32 +195,38 @@ class KubernetesNamespaceAdmin(admin.ModelAdmin):
     list_display_links = None
     list_filter = ['visible']
     ns_list = None
-    pod_list = None
+    pod_counts = None
     actions = [make_visible, make_invisible]
 
     def portal_users(self, instance):
         return ','.join(User.objects.filter(service_account__namespace=instance).values_list('username', flat=True))
 
     def created(self, instance):
-        if not self.ns_list:
-            self.ns_list = api.get_namespaces()
-
-        for ns in self.ns_list:
-            if ns.metadata.name == instance.name:
-                return ns.metadata.creation_timestamp
-        return None
+        if self.ns_list is None:
+            try:
+                self.ns_list = {ns.metadata.name: ns.metadata.creation_timestamp for ns in api.iter_namespaces()}
+            except Exception:
+                logger.exception("Error while fetching namespaces from Kubernetes")
+                return None
+        return self.ns_list.get(instance.name)
     created.short_description = "Created in Kubernetes"
 
     def number_of_pods(self, instance):
-        if not self.pod_list:
-            self.pod_list = api.get_pods()
-        count = 0
-        for pod in self.pod_list:
-            if pod.metadata.namespace == instance.name:
-                count += 1
-        return count
+        if self.pod_counts is None:
+            try:
+                self.pod_counts = Counter(pod.metadata.namespace for pod in api.iter_pods())
+            except Exception:
+                logger.exception("Error while fetching list of all pods from Kubernetes")
+                return None
+        return self.pod_counts[instance.name]
     number_of_pods.short_description = "Number of pods"
 
+    def changelist_view(self, request, extra_context=None):
+        # Fetch the cluster data again for every page view
+        self.ns_list = None
+        self.pod_counts = None
+        return super().changelist_view(request, extra_context)
+
     def has_change_permission(self, request, obj=None):
         if not request.user.is_superuser:
             return False
@@ -6,7 +6,7 @@ from django.conf import settings
 from django.contrib import messages
 from kubeportal.models.kubernetesnamespace import KubernetesNamespace
 from kubeportal.models import User
-from .k8s import k8s_sync
+from .k8s import sync_jobs
 
 import logging
 
@@ -14,8 +14,21 @@ logger = logging.getLogger('KubePortal')
 
 
 def sync_view(request):
-    k8s_sync.sync(request)
-    return redirect('admin:index')
+    if request.method == 'POST':
+        if not sync_jobs.start_job():
+            messages.warning(request, "Synchronization is already running.")
+    return redirect('admin:sync_status')
+
+
+class SyncStatusView(LoginRequiredMixin, TemplateView):
+    template_name = "admin/sync_status.html"
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        context['site_header'] = settings.BRANDING + " (Admin Backend)"
+        context['title'] = "Synchronization"
+        context['job'] = sync_jobs.get_job()
+        return context
 
 
 class CleanupView(LoginRequiredMixin, TemplateView):
@@ -115,8 +115,8 @@ class DeploymentsView(generics.RetrieveAPIView, generics.CreateAPIView):
     )
     def get(self, request, version, namespace):
         if request.user.has_namespace(namespace):
-            deployments = api.get_namespaced_deployments(namespace, request.user)
-            puids = [item.metadata.namespace + '_' + item.metadata.name for item in deployments]
+            names = api.get_namespaced_names('deployments', namespace, request.user)
+            puids = [namespace + '_' + name for name in names]
             instance = DeploymentListSerializer({
                 'deployment_urls': [reverse(viewname='deployment_retrieval', kwargs={'puid': puid}, request=request) for puid in puids]\
             })
@@ -1,12 +1,19 @@
+from datetime import timedelta
+
 from drf_spectacular.utils import extend_schema
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 from rest_framework import serializers
 from rest_framework.reverse import reverse
 
 from kubeportal.api.views.tools import get_user_count, get_kubeportal_version, get_branding
-from kubeportal.k8s import kubernetes_api as api
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from kubeportal.k8s import stats as cluster_stats
+from kubeportal.models import clusterstatistic
+from kubeportal.models.clusterstatistic import ClusterStatistic
 
 
 class InfoListSerializer(serializers.Serializer):
@@ -17,13 +24,13 @@ class InfoListSerializer(serializers.Serializer):
 
 
 class InfoDetailView(GenericAPIView):
-    stats = {'k8s_version': api.get_kubernetes_version,
-             'k8s_apiserver_url': api.get_apiserver,
-             'k8s_node_count': api.get_number_of_nodes,
-             'k8s_cpu_count': api.get_number_of_cpus,
-             'k8s_mem_sum': api.get_memory_sum,
-             'k8s_pod_count': api.get_number_of_pods,
-             'k8s_volume_count': api.get_number_of_volumes,
+    stats = {'k8s_version': None,
+             'k8s_apiserver_url': None,
+             'k8s_node_count': None,
+             'k8s_cpu_count': None,
+             'k8s_mem_sum': None,
+             'k8s_pod_count': None,
+             'k8s_volume_count': None,
              'portal_user_count': get_user_count,
              'portal_version': get_kubeportal_version
              }
@@ -67,7 +74,11 @@ class InfoDetailView(GenericAPIView):
         }
     )
     def get(self, request, version, info_slug):
-        if info_slug in self.stats.keys():
+        if info_slug in cluster_stats.STATS:
+            # Served from the cluster statistics snapshot, the Age header tells how old it is
+            stats, age = cluster_stats.get_snapshot()
+            return Response({info_slug: stats[info_slug]}, headers={'Age': str(age)})
+        elif info_slug in self.stats.keys():
             return Response({info_slug: self.stats[info_slug]()})
         else:
             raise NotFound
@@ -84,3 +95,130 @@ class InfoView(GenericAPIView):
         for info_slug in InfoDetailView.stats.keys():
             result[info_slug] = reverse(viewname='info_detail', kwargs={'info_slug': info_slug}, request=request)
         return Response({'info_urls': result})
+
+
+class InfoBatchSerializer(serializers.Serializer):
+    """
+    The API serializer for a batch of info values.
+    """
+    infos = serializers.DictField(read_only=True)
+    errors = serializers.DictField(read_only=True)
+
+
+class InfoBatchView(GenericAPIView):
+
+    @extend_schema(
+        operation={
+            "operationId": "get_infos_batch",
+            "tags": ["api"],
+            "summary": "Get multiple information values about the portal and the cluster in one call.",
+            "security": [{"jwtAuth": []}],
+            "parameters": [{
+                "in": "query",
+                "name": "slugs",
+                "required": "false",
+                "description": "Comma-separated list of info slugs, or 'all' (the default).",
+                "schema": {"type": "string"}
+            }],
+            "responses": {
+                "200": {
+                    "description": "Returns the requested information values in 'infos'. Values that could not be determined are null, with an explanation in 'errors'."
+                },
+                "401": {
+                    "description": "The JWT authentication information is missing."
+                }
+            }
+        }
+    )
+    def get(self, request, version):
+        slugs = request.query_params.get('slugs', 'all')
+        if slugs == 'all':
+            slugs = list(InfoDetailView.stats.keys())
+        else:
+            slugs = [slug.strip() for slug in slugs.split(',') if slug.strip()]
+
+        infos, errors, headers = {}, {}, {}
+        if any(slug in cluster_stats.STATS for slug in slugs):
+            # All cluster values come from one snapshot, instead of one API server call per slug
+            stats, age = cluster_stats.get_snapshot()
+            headers['Age'] = str(age)
+        for slug in slugs:
+            if slug in cluster_stats.STATS:
+                infos[slug] = stats[slug]
+                if infos[slug] is None:
+                    errors[slug] = "Value could not be fetched from the cluster."
+            elif slug in InfoDetailView.stats.keys():
+                try:
+                    infos[slug] = InfoDetailView.stats[slug]()
+                except Exception as e:
+                    infos[slug] = None
+                    errors[slug] = str(e)
+            else:
+                errors[slug] = "Unknown info slug."
+        return Response({'infos': infos, 'errors': errors}, headers=headers)
+
+
+class InfoHistorySerializer(serializers.Serializer):
+    """
+    The API serializer for the history of the cluster statistics.
+    """
+    resolution = serializers.CharField(read_only=True)
+    points = serializers.ListField(child=serializers.DictField(), read_only=True)
+
+
+class InfoHistoryView(GenericAPIView):
+
+    def _parse_time(self, request, name, default):
+        value = request.query_params.get(name)
+        if value is None:
+            return default
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValidationError({name: "Expected an ISO 8601 timestamp."})
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    @extend_schema(
+        operation={
+            "operationId": "get_infos_history",
+            "tags": ["api"],
+            "summary": "Get the history of the cluster statistics.",
+            "security": [{"jwtAuth": []}],
+            "parameters": [
+                {"in": "query", "name": "start", "required": "false", "schema": {"type": "string", "format": "date-time"},
+                 "description": "Begin of the time range. Defaults to one day ago."},
+                {"in": "query", "name": "end", "required": "false", "schema": {"type": "string", "format": "date-time"},
+                 "description": "End of the time range. Defaults to now."},
+                {"in": "query", "name": "resolution", "required": "false",
+                 "schema": {"type": "string", "enum": [clusterstatistic.RAW, clusterstatistic.HOUR, clusterstatistic.DAY]},
+                 "description": "Interval of the returned points. Chosen from the length of the time range when not given."}],
+            "responses": {
+                "200": {
+                    "description": "Returns the resolution and the list of points, each with timestamp and the cluster statistics."
+                },
+                "400": {
+                    "description": "Invalid query parameters."
+                },
+                "401": {
+                    "description": "The JWT authentication information is missing."
+                }
+            }
+        }
+    )
+    def get(self, request, version):
+        end = self._parse_time(request, 'end', timezone.now())
+        start = self._parse_time(request, 'start', end - timedelta(days=1))
+        resolution = request.query_params.get('resolution')
+        if resolution is None:
+            # Raw points only exist for the recent past anyway
+            if end - start <= clusterstatistic.RAW_RETENTION:
+                resolution = clusterstatistic.RAW
+            elif end - start <= clusterstatistic.HOUR_RETENTION:
+                resolution = clusterstatistic.HOUR
+            else:
+                resolution = clusterstatistic.DAY
+        elif resolution not in clusterstatistic.TRUNC and resolution != clusterstatistic.RAW:
+            raise ValidationError({'resolution': "Unknown resolution."})
+        return Response({'resolution': resolution,
+                         'points': ClusterStatistic.history(start, end, resolution)})
@@ -105,8 +105,8 @@ class IngressesView(generics.CreateAPIView, generics.RetrieveAPIView):
     )
     def get(self, request, version, namespace):
         if request.user.has_namespace(namespace):
-            ingresses = api.get_namespaced_ingresses(namespace, request.user)
-            puids = [item.metadata.namespace + '_' + item.metadata.name for item in ingresses]
+            names = api.get_namespaced_names('ingresses', namespace, request.user)
+            puids = [namespace + '_' + name for name in names]
             instance = IngressListSerializer({
                 'ingress_urls': [reverse(viewname='ingress_retrieval', kwargs={'puid': puid}, request=request) for puid in puids]
             })
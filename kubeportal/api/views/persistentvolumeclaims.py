@@ -82,8 +82,8 @@ class PersistentVolumeClaimsView(generics.RetrieveAPIView, generics.CreateAPIVie
     )
     def get(self, request, version, namespace):
         if request.user.has_namespace(namespace):
-            pvcs = api.get_namespaced_pvcs(namespace, request.user)
-            puids = [item.metadata.namespace + '_' + item.metadata.name for item in pvcs]
+            names = api.get_namespaced_names('pvcs', namespace, request.user)
+            puids = [namespace + '_' + name for name in names]
             instance = PersistentVolumeClaimListSerializer({
                 'persistentvolumeclaim_urls': [reverse(viewname='pvc_retrieval', kwargs={'puid': puid}, request=request) for puid in puids]\
             })
@@ -1,4 +1,6 @@
+from django.utils.dateparse import parse_datetime
 from drf_spectacular.utils import extend_schema
+from kubernetes import client
 from rest_framework import serializers, generics
 from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
@@ -10,6 +12,9 @@ import logging
 
 logger = logging.getLogger('KubePortal')
 
+# camelCase volume type in the API -> snake_case attribute name in the client library
+VOLUME_TYPES = {key: attribute for attribute, key in client.V1Volume.attribute_map.items()}
+
 
 class VolumeSerializer(serializers.Serializer):
     """
@@ -37,51 +42,50 @@ class ContainerSerializer(serializers.Serializer):
     volume_mounts = serializers.ListField(read_only=True, child=VolumeMountSerializer())
 
     @classmethod
-    def create_from_k8s_container(cls, k8s_container, k8s_pod):
-        # step through pod volumes and get serialized information
+    def create_from_k8s_container_dict(cls, container, pod):
+        """
+        Creates the serializer for a container of a pod, both given as plain
+        dictionaries, as returned by the raw functions in kubernetes_api.
+        """
         volume_list = {}
-        for k8s_volume in k8s_pod.spec.volumes:
-            k8s_volume_data = k8s_volume.to_dict()
-            # see V1Volume definition for the idea here
+        for k8s_volume in pod['spec'].get('volumes') or []:
             volume_type = ""
-            for k, v in k8s_volume_data.items():
-                if v is not None and k not in ['name',]:
+            for k in k8s_volume.keys():
+                if k != 'name':
                     volume_type = k
-            volume_name = k8s_volume.name
+            volume_name = k8s_volume['name']
             volume_path = ""
-            # Type-specific considerations
-            if volume_type == 'host_path':
-                volume_path = k8s_volume.host_path.path
+            if volume_type == 'hostPath':
+                volume_path = k8s_volume['hostPath']['path']
             elif volume_type == 'secret':
-                volume_name = k8s_volume.secret.secret_name
-            elif volume_type == 'config_map':
-                volume_name = k8s_volume.config_map.name
-            elif volume_type == 'persistent_volume_claim':
-                volume_name = k8s_volume.persistent_volume_claim.claim_name
+                volume_name = k8s_volume['secret'].get('secretName')
+            elif volume_type == 'configMap':
+                volume_name = k8s_volume['configMap'].get('name')
+            elif volume_type == 'persistentVolumeClaim':
+                volume_name = k8s_volume['persistentVolumeClaim']['claimName']
             volume = VolumeSerializer({
                 'name': volume_name,
-                'type': volume_type.replace('_', ' '),
+                # Words of the snake_case attribute name, e.g. 'persistent volume claim'
+                'type': VOLUME_TYPES.get(volume_type, volume_type).replace('_', ' '),
                 'path': volume_path
             })
-            volume_list[k8s_volume.name] = volume.data
+            volume_list[k8s_volume['name']] = volume.data
 
-        # step through volume mounts
         volume_mount_list = []
-        for k8s_volumemount in k8s_container.volume_mounts:
-            volume = volume_list.get(k8s_volumemount.name, None)
-            if volume and k8s_volumemount.sub_path:
-                volume['path'] += k8s_volumemount.sub_path
+        for k8s_volumemount in container.get('volumeMounts') or []:
+            volume = volume_list.get(k8s_volumemount['name'], None)
+            if volume and k8s_volumemount.get('subPath'):
+                volume['path'] += k8s_volumemount['subPath']
             vm = VolumeMountSerializer({
-                'volume': volume_list.get(k8s_volumemount.name, ""),
-                'mount_path': k8s_volumemount.mount_path,
+                'volume': volume_list.get(k8s_volumemount['name'], ""),
+                'mount_path': k8s_volumemount['mountPath'],
             })
             volume_mount_list.append(vm.data)
 
-        # Create serialized container data
         instance = cls({
-            'image': k8s_container.image,
+            'image': container['image'],
             'volume_mounts': volume_mount_list,
-            'name': k8s_container.name})
+            'name': container['name']})
 
         return instance
 
@@ -102,20 +106,33 @@ class PodSerializer(serializers.Serializer):
 
     @classmethod
     def create_from_k8s_pod(cls, k8s_pod):
+        """
+        Same as create_from_k8s_pod_dict(), but for a V1Pod model object.
+        """
+        return cls.create_from_k8s_pod_dict(api.to_raw(k8s_pod))
+
+    @classmethod
+    def create_from_k8s_pod_dict(cls, pod):
+        """
+        Creates the serializer for a pod given as plain dictionary,
+        as returned by the raw functions in kubernetes_api.
+        """
         container_instances = []
-        for k8s_container in k8s_pod.spec.containers:
-            instance = ContainerSerializer.create_from_k8s_container(k8s_container, k8s_pod)
+        for container in pod['spec']['containers']:
+            instance = ContainerSerializer.create_from_k8s_container_dict(container, pod)
             container_instances.append(instance.data)
 
+        status = pod.get('status') or {}
+        start_time = status.get('startTime')
         pod_instance = cls({
-            'name': k8s_pod.metadata.name,
-            'puid': k8s_pod.metadata.namespace + "_" + k8s_pod.metadata.name,
-            'creation_timestamp': k8s_pod.metadata.creation_timestamp,
-            'start_timestamp': k8s_pod.status.start_time,
-            'phase': k8s_pod.status.phase if k8s_pod.status.phase else "",
-            'reason': k8s_pod.status.reason if k8s_pod.status.reason else "",
-            'message': k8s_pod.status.message if k8s_pod.status.message else "",
-            'host_ip': k8s_pod.status.host_ip if k8s_pod.status.host_ip else "",
+            'name': pod['metadata']['name'],
+            'puid': pod['metadata']['namespace'] + "_" + pod['metadata']['name'],
+            'creation_timestamp': parse_datetime(pod['metadata']['creationTimestamp']),
+            'start_timestamp': parse_datetime(start_time) if start_time else None,
+            'phase': status.get('phase') or "",
+            'reason': status.get('reason') or "",
+            'message': status.get('message') or "",
+            'host_ip': status.get('hostIP') or "",
             'containers': container_instances})
 
         return pod_instance
@@ -133,31 +150,15 @@ class PodRetrievalView(generics.RetrieveAPIView):
     )
     def get(self, request, version, puid):
         namespace, pod_name = puid.split('_')
-        pod = api.get_namespaced_pod(namespace, pod_name, request.user)
+        pod = api.get_namespaced_pod_raw(namespace, pod_name, request.user)
         if not pod:
             logger.error(f"Pod {pod_name} in namespace {namespace} not found.")
             raise NotFound
         if request.user.has_namespace(namespace):
-            container_instances = []
-            for k8s_container in pod.spec.containers:
-                instance = ContainerSerializer.create_from_k8s_container(k8s_container, pod)
-                container_instances.append(instance.data)
-
-            pod_instance = PodSerializer({
-                'name': pod.metadata.name,
-                'puid': pod.metadata.namespace + "_" + pod.metadata.name,
-                'creation_timestamp': pod.metadata.creation_timestamp,
-                'start_timestamp': pod.status.start_time,
-                'phase': pod.status.phase if pod.status.phase else "",
-                'reason': pod.status.reason if pod.status.reason else "",
-                'message': pod.status.message if pod.status.message else "",
-                'host_ip': pod.status.host_ip if pod.status.host_ip else "",
-                'containers': container_instances})
-
-            return Response(pod_instance.data)
+            return Response(PodSerializer.create_from_k8s_pod_dict(pod).data)
         else:
             logger.warning(
-                f"User '{request.user}' has no access to the namespace '{pod.metadata.namespace}' of pod '{pod.metadata.uid}'. Access denied.")
+                f"User '{request.user}' has no access to the namespace '{pod['metadata']['namespace']}' of pod '{pod['metadata']['uid']}'. Access denied.")
             raise NotFound
 
 
@@ -175,8 +176,8 @@ class PodsView(generics.RetrieveAPIView, generics.CreateAPIView):
     )
     def get(self, request, version, namespace):
         if request.user.has_namespace(namespace):
-            pods = api.get_namespaced_pods(namespace, request.user)
-            puids = [item.metadata.namespace + "_" + item.metadata.name for item in pods]
+            names = api.get_namespaced_names('pods', namespace, request.user)
+            puids = [namespace + "_" + name for name in names]
 
             instance = PodListSerializer({
                 'pod_urls': [reverse(viewname='pod_retrieval', kwargs={'puid': puid}, request=request) for puid in
@@ -91,8 +91,8 @@ class ServicesView(generics.CreateAPIView, generics.RetrieveAPIView):
     )
     def get(self, request, version, namespace):
         if request.user.has_namespace(namespace):
-            services = api.get_namespaced_services(namespace, request.user)
-            puids = [item.metadata.namespace + '_' + item.metadata.name for item in services]
+            names = api.get_namespaced_names('services', namespace, request.user)
+            puids = [namespace + '_' + name for name in names]
             instance = ServiceListSerializer({
                 'service_urls': [reverse(viewname='service_retrieval', kwargs={'puid': puid}, request=request) for puid in puids]
             })
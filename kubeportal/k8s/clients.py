@@ -0,0 +1,301 @@
+"""
+    Process-wide registry of Kubernetes API clients.
+
+    Creating a client.ApiClient is expensive: the credentials are loaded again,
+    and every client brings its own urllib3 connection pool, so every new client
+    means a new TLS handshake with the API server. The registry below loads the
+    portal credentials once per worker process and hands out one pooled ApiClient
+    per API group.
+
+    Clients with the credentials of single portal users are kept in a bounded
+    LRU cache, keyed by the UID of the Kubernetes service account.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from kubernetes import client, config
+from kubernetes.config.incluster_config import SERVICE_TOKEN_FILENAME
+from kubernetes.config.kube_config import KUBE_CONFIG_DEFAULT_LOCATION
+
+from kubeportal import metrics
+from kubeportal.k8s.resilience import ResilientApiClient
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+# How often (in seconds) the credential files are checked for rotation.
+CREDENTIALS_CHECK_INTERVAL = 30
+
+API_GROUPS = {
+    'core_v1': client.CoreV1Api,
+    'rbac_v1': client.RbacAuthorizationV1Api,
+    'apps_v1': client.AppsV1Api,
+    'net_v1': client.NetworkingV1beta1Api,
+    'storage_v1': client.StorageV1Api,
+}
+
+
+def _load_portal_configuration():
+    """
+    Load the credentials of the running Kubeportal software into a new
+    configuration object. Unlike the helpers of the Kubernetes library,
+    this does not touch the global default configuration.
+
+    Returns a tuple of the configuration and the file it was loaded from,
+    or (None, None) on error.
+    """
+    configuration = client.Configuration()
+    try:
+        # Kubeportal runs as pod in Kubernetes
+        config.load_incluster_config(client_configuration=configuration)
+        return configuration, SERVICE_TOKEN_FILENAME
+    except Exception:
+        try:
+            # There is a ~/.kube/config file available
+            # This is the typical mode on developer machines,
+            # or when Kubeportal runs as Docker container outside of K8S
+            config.load_kube_config(client_configuration=configuration)
+            return configuration, os.path.expanduser(KUBE_CONFIG_DEFAULT_LOCATION)
+        except Exception:
+            # We have no user token to use, and all helpers failed
+            logger.error("Could not load Kubernetes configuration with helpers.")
+            return None, None
+
+
+def _file_fingerprint(path):
+    """
+    Returns a value that changes when the given file is replaced or modified.
+    Mounted service account tokens are swapped through a symlink, so
+    the resolved path is part of the fingerprint.
+    """
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+        return (os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+class PortalClientRegistry:
+    """
+    Thread-safe registry of API clients using the portal credentials.
+
+    The registry is bound to the process that created it. After a fork
+    (e.g. uwsgi workers), the first access in the child process starts
+    over with fresh connection pools, since sockets must not be shared
+    between processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._configuration = None
+        self._source = None
+        self._fingerprint = None
+        self._last_check = 0
+        self._api_clients = {}
+        self._apis = {}
+        self._loaded = 0
+
+    def _close_clients(self):
+        for api_client in self._api_clients.values():
+            try:
+                api_client.rest_client.pool_manager.clear()
+            except Exception:
+                logger.exception("Error while closing Kubernetes API client connection pool")
+
+    def _load(self):
+        self._configuration, self._source = _load_portal_configuration()
+        self._fingerprint = _file_fingerprint(self._source)
+        self._last_check = time.monotonic()
+        self._loaded += 1
+
+    def _check_credentials(self):
+        """
+        Reload everything when the credential file was rotated.
+        Must be called with the lock held.
+        """
+        now = time.monotonic()
+        if now - self._last_check < CREDENTIALS_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        if _file_fingerprint(self._source) != self._fingerprint:
+            logger.info("Kubernetes credentials of the portal changed, re-creating API clients.")
+            self._close_clients()
+            self._api_clients = {}
+            self._apis = {}
+            self._load()
+
+    def _ensure_loaded(self):
+        if self._pid != os.getpid():
+            # We are a forked child, the inherited sockets belong to the parent
+            self._reset()
+        if self._loaded == 0:
+            self._load()
+        else:
+            self._check_credentials()
+
+    def get_configuration(self):
+        """
+        Returns the loaded portal configuration, or None on error.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return self._configuration
+
+    def get_api_client(self, group='default'):
+        """
+        Returns the shared ApiClient for the given API group.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            api_client = self._api_clients.get(group)
+            if api_client is None:
+                api_client = ResilientApiClient(self._configuration)
+                self._api_clients[group] = api_client
+            return api_client
+
+    def get_api(self, group):
+        """
+        Returns the shared API object (e.g. CoreV1Api) for the given API group.
+        """
+        with self._lock:
+            api = self._apis.get(group)
+            api_client = self.get_api_client(group)
+            if api is None or api.api_client is not api_client:
+                api = API_GROUPS[group](api_client)
+                self._apis[group] = api
+            return api
+
+    def reload(self):
+        """
+        Drop all clients and load the portal credentials again on next access.
+        """
+        with self._lock:
+            self._close_clients()
+            self._reset()
+
+    def pool_stats(self):
+        """
+        Returns statistics about the connection pools, as dictionary
+        with one entry per API group.
+        """
+        with self._lock:
+            result = {'pid': self._pid,
+                      'configuration_loads': self._loaded,
+                      'groups': {}}
+            for group, api_client in self._api_clients.items():
+                pools = api_client.rest_client.pool_manager.pools
+                group_stats = {'pools': 0, 'connections': 0, 'idle_connections': 0, 'requests': 0}
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    group_stats['pools'] += 1
+                    group_stats['connections'] += pool.num_connections
+                    group_stats['requests'] += pool.num_requests
+                    group_stats['idle_connections'] += pool.pool.qsize() if pool.pool else 0
+                result['groups'][group] = group_stats
+            return result
+
+
+portal_clients = PortalClientRegistry()
+
+
+class UserClientCache:
+    """
+    Thread-safe LRU cache of API clients with the credentials of single portal users.
+
+    Entries are keyed by the service account UID and expire after a
+    configurable time, so that rotated service account tokens are picked up.
+    Size and lifetime are read from the settings on every access, to allow
+    overriding them in tests.
+
+    Every eviction increases the generation of the key (clear() the one of
+    all keys), so that a client built while the key was evicted is not stored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, factory):
+        """
+        Returns the cached ApiClient for the given key. On a cache miss,
+        the factory function is called to create it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                api_client, created = entry
+                if now - created < settings.USER_CLIENT_CACHE_TTL:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.cache_access('user_clients', True)
+                    return api_client
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            generation = (self._epoch, self._generations.get(key, 0))
+        metrics.cache_access('user_clients', False)
+
+        # Building the client needs API server round trips, which
+        # should not block other threads working with the cache.
+        api_client = factory()
+
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(key, 0)):
+                logger.debug(f"Not caching Kubernetes API client for service account {key}, it was evicted meanwhile.")
+                return api_client
+            self._entries[key] = (api_client, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.USER_CLIENT_CACHE_SIZE:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return api_client
+
+    def evict(self, key):
+        """
+        Removes the cached client for the given key, if any.
+        """
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            if self._entries.pop(key, None) is not None:
+                logger.debug(f"Evicted cached Kubernetes API client for service account {key}.")
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def stats(self):
+        """
+        Returns the cache counters as dictionary.
+        """
+        with self._lock:
+            return {'size': len(self._entries),
+                    'max_size': settings.USER_CLIENT_CACHE_SIZE,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+
+user_clients = UserClientCache()
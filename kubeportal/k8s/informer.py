@@ -0,0 +1,202 @@
+"""
+    Watch-driven in-memory mirror of namespaced cluster resources.
+
+    Each informer lists one resource type across all namespaces, and then
+    watches it from the returned resource version. The objects are kept in
+    memory, indexed by namespace and by label. A watch that expired on the
+    server side (410 Gone) leads to a new list, so the mirror never misses
+    an update for longer than one round trip.
+
+    The informers run with portal permissions. Authorization of portal users
+    must be checked by the caller, see kubernetes_api._from_informer().
+"""
+
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from kubernetes import client, watch
+
+from kubeportal.k8s.clients import portal_clients
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+# Server-side timeout of a single watch request, the watch is resumed afterwards.
+WATCH_TIMEOUT = 300
+
+
+class Informer:
+    """
+    Local cache for one resource type, kept up to date by a list + watch loop.
+    """
+
+    def __init__(self, kind, api_group, list_function):
+        self.kind = kind
+        self._api_group = api_group
+        self._list_function = list_function
+        self._lock = threading.RLock()
+        self._thread = None
+        self._pid = None
+        self._synced = False
+        self._resource_version = None
+        self._objects = {}
+        self._by_namespace = defaultdict(dict)
+        self._by_label = defaultdict(set)
+
+    def _list_all(self):
+        api = portal_clients.get_api(self._api_group)
+        return getattr(api, self._list_function)
+
+    def _add(self, obj):
+        key = (obj.metadata.namespace, obj.metadata.name)
+        self._remove(key)
+        self._objects[key] = obj
+        self._by_namespace[key[0]][key[1]] = obj
+        for label in (obj.metadata.labels or {}).items():
+            self._by_label[label].add(key)
+
+    def _remove(self, key):
+        obj = self._objects.pop(key, None)
+        if obj is None:
+            return
+        namespace_index = self._by_namespace[key[0]]
+        namespace_index.pop(key[1], None)
+        if not namespace_index:
+            del self._by_namespace[key[0]]
+        for label in (obj.metadata.labels or {}).items():
+            keys = self._by_label.get(label)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_label[label]
+
+    def replace(self, objects, resource_version):
+        """
+        Replaces the complete cache content, e.g. after a list call.
+        """
+        with self._lock:
+            self._objects = {}
+            self._by_namespace = defaultdict(dict)
+            self._by_label = defaultdict(set)
+            for obj in objects:
+                self._add(obj)
+            self._resource_version = resource_version
+            self._synced = True
+
+    def handle_event(self, event_type, obj):
+        """
+        Applies a single watch event to the cache.
+        """
+        with self._lock:
+            if event_type in ('ADDED', 'MODIFIED'):
+                self._add(obj)
+            elif event_type == 'DELETED':
+                self._remove((obj.metadata.namespace, obj.metadata.name))
+            self._resource_version = obj.metadata.resource_version
+
+    def is_synced(self):
+        return self._synced and self._pid == os.getpid()
+
+    def get(self, namespace, name):
+        with self._lock:
+            return self._objects.get((namespace, name))
+
+    def list(self, namespace=None, labels=None):
+        """
+        Returns the cached objects, optionally restricted to a namespace and
+        to objects carrying all of the given labels (dictionary).
+        The result is ordered by namespace and name, like the API server does it.
+        """
+        with self._lock:
+            if labels:
+                keys = None
+                for label in labels.items():
+                    matching = self._by_label.get(label, set())
+                    keys = matching if keys is None else keys & matching
+                if namespace is not None:
+                    keys = {key for key in keys if key[0] == namespace}
+                return [self._objects[key] for key in sorted(keys)]
+            if namespace is not None:
+                namespace_index = self._by_namespace.get(namespace, {})
+                return [namespace_index[name] for name in sorted(namespace_index)]
+            return [self._objects[key] for key in sorted(self._objects)]
+
+    def start(self):
+        """
+        Starts the list + watch thread, if it is not running in this process.
+        """
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            # After a fork, the inherited cache content has no watch attached
+            self._pid = os.getpid()
+            self._synced = False
+            self._thread = threading.Thread(target=self._run,
+                                            name=f'kubeportal-informer-{self.kind}',
+                                            daemon=True)
+            self._thread.start()
+
+    def _relist(self):
+        result = self._list_all()()
+        self.replace(result.items, result.metadata.resource_version)
+        logger.debug(f"Informer for {self.kind} listed {len(result.items)} objects.")
+
+    def _run(self):
+        backoff = 1
+        while True:
+            try:
+                if self._resource_version is None or not self._synced:
+                    self._relist()
+                w = watch.Watch()
+                for event in w.stream(self._list_all(),
+                                      resource_version=self._resource_version,
+                                      allow_watch_bookmarks=True,
+                                      timeout_seconds=WATCH_TIMEOUT):
+                    if event['type'] == 'BOOKMARK':
+                        self._resource_version = event['object'].metadata.resource_version
+                    else:
+                        self.handle_event(event['type'], event['object'])
+                backoff = 1
+            except client.rest.ApiException as e:
+                if e.status == 410:
+                    logger.debug(f"Watch for {self.kind} expired, listing again.")
+                    self._resource_version = None
+                    continue
+                logger.error(f"Watch for {self.kind} failed with status {e.status}, retrying in {backoff} seconds.")
+                self._synced = False
+                time.sleep(backoff + random.random())
+                backoff = min(backoff * 2, 60)
+            except Exception:
+                logger.exception(f"Watch for {self.kind} failed, retrying in {backoff} seconds.")
+                self._synced = False
+                time.sleep(backoff + random.random())
+                backoff = min(backoff * 2, 60)
+
+
+INFORMERS = {
+    'pods': Informer('pods', 'core_v1', 'list_pod_for_all_namespaces'),
+    'deployments': Informer('deployments', 'apps_v1', 'list_deployment_for_all_namespaces'),
+    'services': Informer('services', 'core_v1', 'list_service_for_all_namespaces'),
+    'ingresses': Informer('ingresses', 'net_v1', 'list_ingress_for_all_namespaces'),
+    'pvcs': Informer('pvcs', 'core_v1', 'list_persistent_volume_claim_for_all_namespaces'),
+}
+
+
+def get_synced_informer(kind):
+    """
+    Returns the informer for the given resource kind, but only if
+    informers are enabled and the cache content is complete.
+    Starts the informer in the background on first usage.
+    """
+    if not settings.INFORMERS_ENABLED:
+        return None
+    informer = INFORMERS[kind]
+    informer.start()
+    if informer.is_synced():
+        return informer
+    return None
@@ -8,29 +8,55 @@
     Kubeportal will never delete resources in Kubernetes, so there is no code
     and no UI for that. Admins should perform deletion operation directly
     in Kubernetes, e.g. through kubectl, and sync KubePortal afterwards.
+
+    Besides the full sync, namespaces and service accounts can be mirrored
+    incrementally by watches (see watch()), as done by the 'watch_kubernetes'
+    management command. The last seen resource version is stored in the database,
+    so that a restarted watch continues where it stopped. A full list only
+    happens when there is no stored version, or when it expired (410 Gone).
 """
 
 import json
 import logging
+import random
+import time
 
 from django.contrib import messages
-from kubernetes import client
+from django.db import close_old_connections
+from kubernetes import client, watch as k8s_watch
 
-from kubeportal.models.kubernetesnamespace import KubernetesNamespace
+from kubeportal import metrics
+from kubeportal.k8s import kubernetes_api as api
+from kubeportal.models.kubernetesnamespace import KubernetesNamespace, HIDDEN_NAMESPACES
 from kubeportal.models.kubernetesserviceaccount import KubernetesServiceAccount
+from kubeportal.models.kuberneteswatchstate import KubernetesWatchState
 
 logger = logging.getLogger('KubePortal')
 
-def sync(request=None):
+def sync(request=None, progress=None):
     '''
     Synchronizes the local shallow copy of Kubernetes data.
     Returns True on success.
+
+    The optional progress function is called with the phase name, the number of processed
+    and the total number of items in this phase (or None, when unknown).
     '''
+    with metrics.sync_duration.time():
+        result = _sync(request, progress or (lambda phase, done, total: None))
+    metrics.sync_runs.labels('success' if result else 'failure').inc()
+    return result
+
+
+def _sync(request, progress):
     try:
+        progress("namespaces from cluster", 0, None)
         res1 = KubernetesNamespace.create_missing_in_portal()
-        res2 = KubernetesNamespace.create_missing_in_cluster()
+        progress("namespaces", 0, None)
+        res2 = KubernetesNamespace.create_missing_in_cluster(progress)
+        progress("service accounts from cluster", 0, None)
         res3 = KubernetesServiceAccount.create_missing_in_portal()
-        res4 = KubernetesServiceAccount.create_missing_in_cluster()
+        progress("service accounts", 0, None)
+        res4 = KubernetesServiceAccount.create_missing_in_cluster(progress)
         if request:
             messages.info(request, "Synchronization finished.")
         logger.debug("Synchronization finished.")
@@ -43,3 +69,113 @@ def sync(request=None):
             messages.error(
                 request, "Kubernetes returned an error during synchronization: {0}".format(msg))
         return False
+
+
+# Server-side timeout of a single watch request, the watch is resumed afterwards.
+WATCH_TIMEOUT = 300
+
+
+def apply_namespace_event(event_type, k8s_ns):
+    """
+    Applies a watch event for a cluster namespace to the portal database.
+    Events may be applied more than once, e.g. after a relist.
+    """
+    name, uid = k8s_ns.metadata.name, k8s_ns.metadata.uid
+    if event_type in ('ADDED', 'MODIFIED'):
+        if not KubernetesNamespace.objects.filter(uid=uid).exists():
+            # Created in the portal, or re-created in the cluster under the same name
+            if KubernetesNamespace.objects.filter(name=name).update(uid=uid):
+                logger.info(f"Found Kubernetes namespace {name} with new UID, updating record.")
+            else:
+                logger.info(f"Found new Kubernetes namespace {name}, creating record.")
+                KubernetesNamespace(name=name, uid=uid, visible=name not in HIDDEN_NAMESPACES).save()
+    elif event_type == 'DELETED':
+        if KubernetesNamespace.objects.filter(uid=uid).delete()[0]:
+            logger.warning(f"Kubernetes namespace '{name}' was deleted, removing portal record.")
+
+
+def apply_service_account_event(event_type, k8s_svca):
+    """
+    Applies a watch event for a cluster service account to the portal database.
+    Events may be applied more than once, e.g. after a relist.
+    """
+    namespace, name, uid = k8s_svca.metadata.namespace, k8s_svca.metadata.name, k8s_svca.metadata.uid
+    if event_type in ('ADDED', 'MODIFIED'):
+        if not KubernetesServiceAccount.objects.filter(uid=uid).exists():
+            ns = KubernetesNamespace.get_or_sync(namespace)
+            if KubernetesServiceAccount.objects.filter(namespace=ns, name=name).update(uid=uid):
+                logger.info(f"Found Kubernetes service account {name} with new UID, updating record.")
+            else:
+                logger.info(f"Found new Kubernetes service account {name}, creating record.")
+                KubernetesServiceAccount(name=name, uid=uid, namespace=ns).save()
+    elif event_type == 'DELETED':
+        if KubernetesServiceAccount.objects.filter(uid=uid).delete()[0]:
+            logger.warning(f"Kubernetes service account '{namespace}:{name}' was deleted, removing portal record.")
+
+
+# Watched resource types, with the list function for the watch, the full sync and the event handler
+WATCHES = {
+    'namespaces': ('list_namespace', KubernetesNamespace, apply_namespace_event),
+    'serviceaccounts': ('list_service_account_for_all_namespaces', KubernetesServiceAccount,
+                        apply_service_account_event),
+}
+
+
+def _relist(kind):
+    """
+    Performs the full sync for one resource type.
+    Returns the resource version the watch can start from.
+    """
+    list_function, model, _ = WATCHES[kind]
+    # Fetched before the sync, so that the watch replays everything that happens meanwhile
+    resource_version = getattr(api.get_portal_core_v1(), list_function)(limit=1).metadata.resource_version
+    if not (model.create_missing_in_portal() and model.create_missing_in_cluster()):
+        raise RuntimeError(f"Full sync of {kind} failed.")
+    logger.info(f"Full sync of {kind} finished, watching from resource version {resource_version}.")
+    return resource_version
+
+
+def _store_resource_version(state, resource_version):
+    state.resource_version = resource_version
+    state.save(update_fields=['resource_version', 'modified'])
+
+
+def watch_once(kind):
+    """
+    Runs the watch for one resource type until the server closes it.
+    Lists all objects beforehand, if there is no valid resource version.
+    """
+    list_function, _, handle_event = WATCHES[kind]
+    state, _ = KubernetesWatchState.objects.get_or_create(kind=kind)
+    try:
+        if not state.resource_version:
+            _store_resource_version(state, _relist(kind))
+        w = k8s_watch.Watch()
+        for event in w.stream(getattr(api.get_portal_core_v1(), list_function),
+                              resource_version=state.resource_version,
+                              allow_watch_bookmarks=True,
+                              timeout_seconds=WATCH_TIMEOUT):
+            if event['type'] != 'BOOKMARK':
+                handle_event(event['type'], event['object'])
+            _store_resource_version(state, event['object'].metadata.resource_version)
+    except client.rest.ApiException as e:
+        if e.status != 410:
+            raise
+        logger.info(f"Watch for {kind} expired, a full sync is needed.")
+        _store_resource_version(state, None)
+
+
+def watch(kind):
+    """
+    Keeps the portal records of one resource type in sync, forever.
+    """
+    backoff = 1
+    while True:
+        try:
+            close_old_connections()
+            watch_once(kind)
+            backoff = 1
+        except Exception:
+            logger.exception(f"Watch for {kind} failed, retrying in {backoff} seconds.")
+            time.sleep(backoff + random.random())
+            backoff = min(backoff * 2, 60)
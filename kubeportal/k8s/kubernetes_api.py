@@ -3,9 +3,19 @@
     Read-only methods put exceptions into the log file and return empty results on problems.
 """
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import orjson
 from django.conf import settings
+from django.utils.dateparse import parse_datetime
 from kubernetes import client, config
-from base64 import b64decode
+
+from kubeportal.k8s.clients import portal_clients, user_clients
+from kubeportal.k8s.tokens import token_store
+from kubeportal.k8s.informer import get_synced_informer
+from kubeportal.k8s.resilience import ResilientApiClient, breaker, stale_results
 
 import logging
 
@@ -13,6 +23,21 @@ logger = logging.getLogger('KubePortal')
 
 HIDDEN_NAMESPACES = ['kube-system', 'kube-public']
 
+# How often (in seconds) the cached Kubernetes version is checked against the API server.
+VERSION_CHECK_INTERVAL = 3600
+
+# List API paths of the namespaced resource kinds, for metadata-only requests
+NAMESPACED_LIST_PATHS = {
+    'pods': '/api/v1/namespaces/{namespace}/pods',
+    'deployments': '/apis/apps/v1/namespaces/{namespace}/deployments',
+    'services': '/api/v1/namespaces/{namespace}/services',
+    'ingresses': '/apis/networking.k8s.io/v1beta1/namespaces/{namespace}/ingresses',
+    'pvcs': '/api/v1/namespaces/{namespace}/persistentvolumeclaims',
+}
+
+# Asks the API server for object metadata only, older servers send full objects
+METADATA_LIST_ACCEPT = 'application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json'
+
 
 ### Helper functions for accessing the Kubernetes API server with
 ### permissions of the running portal software
@@ -20,53 +45,52 @@ HIDDEN_NAMESPACES = ['kube-system', 'kube-public']
 def get_portal_configuration():
     """
     Get a configuration for the Kubernetes client library.
-    The credentials of the running Kubeportal software are used. 
+    The credentials of the running Kubeportal software are used.
+    They are loaded only once per process, see clients.PortalClientRegistry.
 
-    Returns None on error. 
+    Returns None on error.
     """
-    try:
-        # Kubeportal runs as pod in Kubernetes
-        return config.load_incluster_config()
-    except Exception:
-        try:
-            # There is a ~/.kube/config file available
-            # This is the typical mode on developer machines,
-            # or when Kubeportal runs as Docker container outside of K8S
-            return config.load_kube_config()
-        except Exception:
-            # We have no user token to use, and all helpers failed
-            logger.error("Could not load Kubernetes configuration with helpers.")
-            return None
+    return portal_clients.get_configuration()
 
 
 def get_portal_api_client():
-    configuration = get_portal_configuration()
-    return client.ApiClient(configuration)
+    return portal_clients.get_api_client()
 
 
 def get_portal_core_v1():
-    api_client = get_portal_api_client()
-    return client.CoreV1Api(api_client)
+    return portal_clients.get_api('core_v1')
 
 
 def get_portal_rbac_v1():
-    api_client = get_portal_api_client()
-    return client.RbacAuthorizationV1Api(api_client)
+    return portal_clients.get_api('rbac_v1')
 
 
 def get_portal_apps_v1():
-    api_client = get_portal_api_client()
-    return client.AppsV1Api(api_client)
+    return portal_clients.get_api('apps_v1')
 
 
 def get_portal_net_v1():
-    api_client = get_portal_api_client()
-    return client.NetworkingV1beta1Api(api_client)
+    return portal_clients.get_api('net_v1')
 
 
 def get_portal_storage_v1():
-    api_client = get_portal_api_client()
-    return client.StorageV1Api(api_client)
+    return portal_clients.get_api('storage_v1')
+
+
+def get_portal_pool_stats():
+    """
+    Returns statistics about the connection pools used with portal permissions.
+    """
+    return portal_clients.pool_stats()
+
+
+def get_breaker_state():
+    """
+    Returns the state of the API server circuit breaker, for monitoring.
+    """
+    state = breaker.state()
+    state['stale_results'] = stale_results.stats()
+    return state
 
 
 ### Helper functions for accessing the Kubernetes API server with
@@ -75,16 +99,24 @@ def get_portal_storage_v1():
 def get_token(kubeportal_service_account):
     """
     Returns the secret K8S login token for a portal user as base64-encoded string.
+    The token is served from the in-process token store when possible.
     """
-    core_v1 = get_portal_core_v1()
-    service_account = core_v1.read_namespaced_service_account(
-        name=kubeportal_service_account.name,
-        namespace=kubeportal_service_account.namespace.name)
-    secret_name = service_account.secrets[0].name
-    secret = core_v1.read_namespaced_secret(
-        name=secret_name, namespace=kubeportal_service_account.namespace.name)
-    encoded_token = secret.data['token']
-    return b64decode(encoded_token).decode()
+    return get_service_account_token(kubeportal_service_account.namespace.name, kubeportal_service_account.name)
+
+
+def get_service_account_token(namespace, name):
+    """
+    Returns the secret K8S login token of the given service account,
+    without loading the portal database objects.
+    """
+    return token_store.get(namespace, name)
+
+
+def get_token_cache_stats():
+    """
+    Returns hit and miss counters of the service account token store.
+    """
+    return token_store.stats()
 
 
 def get_user_configuration(user):
@@ -128,12 +160,28 @@ def get_user_configuration(user):
         }]
     }
 
-    return config.load_kube_config_from_dict(config_data)
+    configuration = client.Configuration()
+    config.load_kube_config_from_dict(config_data, client_configuration=configuration)
+    return configuration
 
 
 def get_user_api_client(user):
+    """
+    Returns an API client with the credentials of the given portal user.
+    Clients for approved users are cached by their service account UID.
+    """
+    if user.has_access_approved() and user.service_account.uid:
+        return user_clients.get(user.service_account.uid,
+                                lambda: ResilientApiClient(get_user_configuration(user)))
     configuration = get_user_configuration(user)
-    return client.ApiClient(configuration)
+    return ResilientApiClient(configuration)
+
+
+def get_user_client_cache_stats():
+    """
+    Returns hit and miss counters of the per-user API client cache.
+    """
+    return user_clients.stats()
 
 
 def get_user_core_v1(user):
@@ -158,6 +206,173 @@ def get_user_net_v1(user):
 
 # General functions
 
+def _from_informer(kind, namespace=None, user=None):
+    """
+    Returns the list of objects of the given kind from the local informer cache,
+    or None when the cache cannot be used.
+
+    The informers run with portal permissions, so user requests are only
+    served when the namespace belongs to the user. Everything else goes
+    to the API server with the user credentials, as before.
+    """
+    informer = get_synced_informer(kind)
+    if informer is None:
+        return None
+    if user is not None and not user.has_namespace(namespace):
+        return None
+    return informer.list(namespace)
+
+
+def _get_from_informer(kind, namespace, name, user):
+    """
+    Returns a single object from the local informer cache, or None.
+    """
+    informer = get_synced_informer(kind)
+    if informer is None or not user.has_namespace(namespace):
+        return None
+    return informer.get(namespace, name)
+
+
+def _paginate(list_function, **kwargs):
+    """
+    Generator for the items of a Kubernetes list call, fetched in chunks
+    of LIST_PAGE_SIZE objects with 'limit' and 'continue'. Only one chunk
+    is deserialized and kept in memory at a time.
+
+    Unlike the read-only functions below, errors are not swallowed here.
+    A consumer must not mistake a partial result for the complete list.
+    """
+    _continue = None
+    while True:
+        if _continue:
+            result = list_function(limit=settings.LIST_PAGE_SIZE, _continue=_continue, **kwargs)
+        else:
+            result = list_function(limit=settings.LIST_PAGE_SIZE, **kwargs)
+        yield from result.items
+        _continue = result.metadata._continue
+        if not _continue:
+            return
+
+
+def _iter_cluster(kind, list_function):
+    """
+    Generator for all objects of the given kind in the cluster, served
+    from the informer cache when possible, or paged from the API server.
+    """
+    cached = _from_informer(kind, None, None)
+    if cached is not None:
+        return iter(cached)
+    return _paginate(list_function)
+
+
+def _raw(api_method, *args, **kwargs):
+    """
+    Calls a generated API method (e.g. core_v1.list_namespaced_pod) without
+    model deserialization. Returns the parsed JSON response as plain
+    dictionary, with the original camelCase keys of the Kubernetes API.
+    """
+    response = api_method(*args, _preload_content=False, **kwargs)
+    return orjson.loads(response.data)
+
+
+# Only used for converting model objects, never talks to the API server
+_serializer = client.ApiClient()
+
+
+def to_raw(obj):
+    """
+    Converts a model object, e.g. from the informer cache, into the
+    plain dictionary representation returned by _raw().
+    """
+    return _serializer.sanitize_for_serialization(obj)
+
+
+def _list_metadata_page(api_client, path, limit, _continue=None):
+    """
+    Fetches one page of a list call as PartialObjectMetadataList, and returns
+    the parsed JSON response. The object specs are never transferred or deserialized.
+    """
+    query_params = [('limit', limit)]
+    if _continue:
+        query_params.append(('continue', _continue))
+    response = api_client.call_api(path, 'GET',
+                                   query_params=query_params,
+                                   header_params={'Accept': METADATA_LIST_ACCEPT},
+                                   auth_settings=['BearerToken'],
+                                   _return_http_data_only=True,
+                                   _preload_content=False)
+    return orjson.loads(response.data)
+
+
+def _iter_metadata(api_client, path):
+    """
+    Generator for the metadata dictionaries of all objects behind the given
+    list API path (e.g. '/api/v1/pods'), fetched in chunks.
+    Raises an exception on error.
+    """
+    _continue = None
+    while True:
+        page = _list_metadata_page(api_client, path, settings.LIST_PAGE_SIZE, _continue)
+        for item in page.get('items') or []:
+            yield item['metadata']
+        _continue = page['metadata'].get('continue')
+        if not _continue:
+            return
+
+
+def count_from_page(page):
+    """
+    Returns the total number of objects from the first page of a list call
+    with limit=1, or None when the API server did not announce the remaining items.
+    """
+    items = len(page.get('items') or [])
+    if not page['metadata'].get('continue'):
+        return items
+    remaining = page['metadata'].get('remainingItemCount')
+    if remaining is None:
+        return None
+    return items + remaining
+
+
+def get_namespaced_names(kind: str, namespace: str, user):
+    """
+    Get the names of all objects of the given kind (e.g. 'pods') in a namespace,
+    with the permissions of the given user. Only the object metadata is fetched,
+    which is enough for building URLs.
+
+    Returns an empty list on error.
+    """
+    cached = _from_informer(kind, namespace, user)
+    if cached is not None:
+        return [item.metadata.name for item in cached]
+    try:
+        api_client = get_user_api_client(user)
+        path = NAMESPACED_LIST_PATHS[kind].format(namespace=namespace)
+        return [metadata['name'] for metadata in _iter_metadata(api_client, path)]
+    except Exception:
+        logger.exception(f"Error while fetching {kind} of namespace {namespace}")
+        return []
+
+
+def call_in_parallel(function, argument_list):
+    """
+    Calls the given API function once per argument tuple, with up to
+    KUBEPORTAL_SYNC_CREATE_WORKERS calls running at the same time.
+
+    Yields a tuple of arguments, result and exception per call, in the order
+    of completion. Exceptions are collected instead of raised, so that one
+    failing call does not stop the others.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, settings.SYNC_CREATE_WORKERS),
+                            thread_name_prefix='kubeportal-api') as executor:
+        futures = {executor.submit(function, *arguments): arguments for arguments in argument_list}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
 def is_minikube():
     """
     Checks if the current context is minikube. This is needed for checks in the test code.
@@ -185,8 +400,9 @@ def create_k8s_ns(name: str):
     try:
         k8s_ns = client.V1Namespace(
             api_version="v1", kind="Namespace", metadata=client.V1ObjectMeta(name=name))
-        core_v1.create_namespace(k8s_ns)
+        created = core_v1.create_namespace(k8s_ns)
         logger.info("Created Kubernetes namespace '{0}'".format(name))
+        return created
     except client.rest.ApiException as e:
         # Race condition or earlier sync error - the K8S namespace is already there
         if e.status == 409:
@@ -224,6 +440,14 @@ def get_namespaces():
         return None
 
 
+def iter_namespaces():
+    """
+    Generator for all cluster namespaces, fetched in chunks.
+    Raises an exception on error.
+    """
+    return _paginate(get_portal_core_v1().list_namespace)
+
+
 # Service Accounts
 
 def create_k8s_svca(namespace: str, name: str):
@@ -240,8 +464,9 @@ def create_k8s_svca(namespace: str, name: str):
     try:
         k8s_svca = client.V1ServiceAccount(
             api_version="v1", kind="ServiceAccount", metadata=client.V1ObjectMeta(name=name))
-        core_v1.create_namespaced_service_account(namespace=namespace, body=k8s_svca)
+        created = core_v1.create_namespaced_service_account(namespace=namespace, body=k8s_svca)
         logger.info(f"Created Kubernetes service account '{namespace}:{name}'")
+        return created
     except client.rest.ApiException as e:
         # Race condition or earlier sync error - the K8S namespace is already there
         if e.status == 409:
@@ -279,6 +504,14 @@ def get_service_accounts():
         return None
 
 
+def iter_service_accounts():
+    """
+    Generator for all service accounts in the cluster, fetched in chunks.
+    Raises an exception on error.
+    """
+    return _paginate(get_portal_core_v1().list_service_account_for_all_namespaces)
+
+
 ### Persistent Volume Claims
 
 def create_k8s_pvc(namespace: str, name: str, access_modes: tuple, storage_class_name: str, size: str, user):
@@ -327,6 +560,9 @@ def get_namespaced_pvcs(namespace: str, user):
     """
     Get all pvcs for a specific Kubernetes namespace in the cluster.
     """
+    cached = _from_informer('pvcs', namespace, user)
+    if cached is not None:
+        return cached
     core_v1 = get_user_core_v1(user)
     try:
         return core_v1.list_namespaced_persistent_volume_claim(namespace).items
@@ -342,6 +578,9 @@ def get_pvcs():
     This operation is performed by portal backend admins, which may not have
     enough permissions. It is also non-destructive, so we run it with portal permissions.
     """
+    cached = _from_informer('pvcs', None, None)
+    if cached is not None:
+        return cached
     core_v1 = get_portal_core_v1()
     try:
         return core_v1.list_persistent_volume_claim_for_all_namespaces().items
@@ -350,10 +589,21 @@ def get_pvcs():
         return None
 
 
+def iter_pvcs():
+    """
+    Generator for all pvcs in the cluster, fetched in chunks.
+    Raises an exception on error.
+    """
+    return _iter_cluster('pvcs', get_portal_core_v1().list_persistent_volume_claim_for_all_namespaces)
+
+
 def get_namespaced_pvc(namespace: str, name: str, user):
     """
     Get pvc in the cluster in a particular namespace.
     """
+    cached = _get_from_informer('pvcs', namespace, name, user)
+    if cached is not None:
+        return cached
     core_v1 = get_user_core_v1(user)
     try:
         return core_v1.read_namespaced_persistent_volume_claim(name, namespace)
@@ -404,6 +654,9 @@ def get_namespaced_deployments(namespace, user):
     """
     Get all deployments for a specific Kubernetes namespace in the cluster.
     """
+    cached = _from_informer('deployments', namespace, user)
+    if cached is not None:
+        return cached
     apps_v1 = get_user_apps_v1(user)
     try:
         return apps_v1.list_namespaced_deployment(namespace).items
@@ -419,6 +672,9 @@ def get_deployments():
     This operation is performed by portal backend admins, which may not have
     enough permissions. It is also non-destructive, so we run it with portal permissions.
     """
+    cached = _from_informer('deployments', None, None)
+    if cached is not None:
+        return cached
     apps_v1 = get_portal_apps_v1()
     try:
         return apps_v1.list_deployment_for_all_namespaces().items
@@ -427,10 +683,21 @@ def get_deployments():
         return None
 
 
+def iter_deployments():
+    """
+    Generator for all deployments in the cluster, fetched in chunks.
+    Raises an exception on error.
+    """
+    return _iter_cluster('deployments', get_portal_apps_v1().list_deployment_for_all_namespaces)
+
+
 def get_namespaced_deployment(namespace: str, name: str, user):
     """
     Get deployment in the cluster by its namespace and name.
     """
+    cached = _get_from_informer('deployments', namespace, name, user)
+    if cached is not None:
+        return cached
     apps_v1 = get_user_apps_v1(user)
     try:
         return apps_v1.read_namespaced_deployment(name, namespace)
@@ -471,6 +738,9 @@ def get_pods():
     This operation is performed by portal backend admins, which may not have
     enough permissions. It is also non-destructive, so we run it with portal permissions.
     """
+    cached = _from_informer('pods', None, None)
+    if cached is not None:
+        return cached
     core_v1 = get_portal_core_v1()
     try:
         return core_v1.list_pod_for_all_namespaces().items
@@ -479,7 +749,18 @@ def get_pods():
         return None
 
 
+def iter_pods():
+    """
+    Generator for all pods in the cluster, fetched in chunks.
+    Raises an exception on error.
+    """
+    return _iter_cluster('pods', get_portal_core_v1().list_pod_for_all_namespaces)
+
+
 def get_namespaced_pod(namespace: str, name: str, user):
+    cached = _get_from_informer('pods', namespace, name, user)
+    if cached is not None:
+        return cached
     core_v1 = get_user_core_v1(user)
     try:
         return core_v1.read_namespaced_pod(name, namespace)
@@ -492,6 +773,9 @@ def get_namespaced_pods(namespace: str, user):
     """
     Get all pods for a specific Kubernetes namespace in the cluster.
     """
+    cached = _from_informer('pods', namespace, user)
+    if cached is not None:
+        return cached
     core_v1 = get_user_core_v1(user)
     try:
         return core_v1.list_namespaced_pod(namespace).items
@@ -500,13 +784,31 @@ def get_namespaced_pods(namespace: str, user):
         return []
 
 
+def get_namespaced_pod_raw(namespace: str, name: str, user):
+    """
+    Like get_namespaced_pod(), but returns the pod as plain dictionary, see _raw().
+    """
+    cached = _get_from_informer('pods', namespace, name, user)
+    if cached is not None:
+        return to_raw(cached)
+    core_v1 = get_user_core_v1(user)
+    try:
+        return _raw(core_v1.read_namespaced_pod, name, namespace)
+    except Exception as e:
+        logger.exception(f"Error while fetching pod {namespace}:{name}")
+        return None
+
+
 def get_deployment_pods(deployment, user):
     """
     Gets a list of pod API objects belonging to a deployment API object.
     """
-    core_v1 = get_user_core_v1(user)
     ns = deployment.metadata.namespace
     selector = deployment.spec.selector  # V1LabelSelector
+    informer = get_synced_informer('pods')
+    if informer and user.has_namespace(ns):
+        return informer.list(ns, labels=selector.match_labels)
+    core_v1 = get_user_core_v1(user)
     selector_str = ",".join([k + '=' + v for k, v in selector.match_labels.items()])
     try:
         return core_v1.list_namespaced_pod(namespace=ns, label_selector=selector_str).items
@@ -522,11 +824,8 @@ def get_ingress_hosts():
     Returns the list of host names used in ingresses accross all namespaces,
     or None on error.
     """
-    net_v1 = get_portal_net_v1()
     try:
-        ings = net_v1.list_ingress_for_all_namespaces()
-        host_list = [rule.host for ing in ings.items for rule in ing.spec.rules]
-        return host_list
+        return [rule.host for ing in iter_ingresses() for rule in ing.spec.rules]
 
     except Exception:
         logger.exception("Error while fetching all ingresses from Kubernetes")
@@ -540,6 +839,9 @@ def get_ingresses():
     This operation is performed by portal backend admins, which may not have
     enough permissions. It is also non-destructive, so we run it with portal permissions.
     """
+    cached = _from_informer('ingresses', None, None)
+    if cached is not None:
+        return cached
     net_v1 = get_portal_net_v1()
     try:
         return net_v1.list_ingress_for_all_namespaces().items
@@ -548,10 +850,21 @@ def get_ingresses():
         return None
 
 
+def iter_ingresses():
+    """
+    Generator for all ingresses in the cluster, fetched in chunks.
+    Raises an exception on error.
+    """
+    return _iter_cluster('ingresses', get_portal_net_v1().list_ingress_for_all_namespaces)
+
+
 def get_namespaced_ingress(namespace: str, name: str, user):
     """
     Get ingress in the cluster.
     """
+    cached = _get_from_informer('ingresses', namespace, name, user)
+    if cached is not None:
+        return cached
     net_v1 = get_user_net_v1(user)
     return net_v1.read_namespaced_ingress(name, namespace)
 
@@ -560,6 +873,9 @@ def get_namespaced_ingresses(namespace: str, user):
     """
     Get all ingresses for a specific Kubernetes namespace in the cluster.
     """
+    cached = _from_informer('ingresses', namespace, user)
+    if cached is not None:
+        return cached
     net_v1 = get_user_net_v1(user)
     try:
         return net_v1.list_namespaced_ingress(namespace).items
@@ -574,24 +890,24 @@ def get_namespaced_ingresses_json(namespace: str, user):
     Error handling is supposed to happen on the caller side.
     """
     net_v1 = get_user_net_v1(user)
-    ings = net_v1.list_namespaced_ingress(namespace)
+    ings = _raw(net_v1.list_namespaced_ingress, namespace)
     stripped_ings = []
-    for ing in ings.items:
-        stripped_ing = {'name': ing.metadata.name,
-                        'creation_timestamp': ing.metadata.creation_timestamp,
-                        'annotations': ing.metadata.annotations,
+    for ing in ings['items']:
+        stripped_ing = {'name': ing['metadata']['name'],
+                        'creation_timestamp': parse_datetime(ing['metadata']['creationTimestamp']),
+                        'annotations': ing['metadata'].get('annotations'),
                         }
-        if ing.spec.tls:
+        if ing['spec'].get('tls'):
             stripped_ing['tls'] = True
         else:
             stripped_ing['tls'] = False
         rules = {}
-        for rule in ing.spec.rules:
-            rules[rule.host] = {}
-            for path_setting in rule.http.paths:
-                rules[rule.host][path_setting.path] = {}
-                rules[rule.host][path_setting.path]['service_name'] = path_setting.backend.service_name
-                rules[rule.host][path_setting.path]['service_port'] = path_setting.backend.service_port
+        for rule in ing['spec'].get('rules') or []:
+            rules[rule.get('host')] = {}
+            for path_setting in rule['http']['paths']:
+                rules[rule.get('host')][path_setting.get('path')] = {}
+                rules[rule.get('host')][path_setting.get('path')]['service_name'] = path_setting['backend'].get('serviceName')
+                rules[rule.get('host')][path_setting.get('path')]['service_port'] = path_setting['backend'].get('servicePort')
         stripped_ing['rules'] = rules
         stripped_ings.append(stripped_ing)
     return stripped_ings
@@ -655,6 +971,9 @@ def get_services():
     This operation is performed by portal backend admins, which may not have
     enough permissions. It is also non-destructive, so we run it with portal permissions.
     """
+    cached = _from_informer('services', None, None)
+    if cached is not None:
+        return cached
     core_v1 = get_portal_core_v1()
     try:
         return core_v1.list_service_for_all_namespaces().items
@@ -663,10 +982,21 @@ def get_services():
         return None
 
 
+def iter_services():
+    """
+    Generator for all services in the cluster, fetched in chunks.
+    Raises an exception on error.
+    """
+    return _iter_cluster('services', get_portal_core_v1().list_service_for_all_namespaces)
+
+
 def get_namespaced_service(namespace: str, name: str, user):
     """
     Get service in the cluster.
     """
+    cached = _get_from_informer('services', namespace, name, user)
+    if cached is not None:
+        return cached
     core_v1 = get_user_core_v1(user)
     try:
         return core_v1.read_namespaced_service(name, namespace)
@@ -679,6 +1009,9 @@ def get_namespaced_services(namespace: str, user):
     """
     Get all services for a specific Kubernetes namespace in the cluster.
     """
+    cached = _from_informer('services', namespace, user)
+    if cached is not None:
+        return cached
     core_v1 = get_user_core_v1(user)
     try:
         return core_v1.list_namespaced_service(namespace).items
@@ -693,20 +1026,20 @@ def get_namespaced_services_json(namespace: str, user):
     """
     core_v1 = get_user_core_v1(user)
     try:
-        services = core_v1.list_namespaced_service(namespace)
+        services = _raw(core_v1.list_namespaced_service, namespace)
         stripped_services = []
-        for svc in services.items:
-            if svc.spec.selector:
-                selector = [{'key': k, 'value': v} for k, v in svc.spec.selector.items()]
+        for svc in services['items']:
+            if svc['spec'].get('selector'):
+                selector = [{'key': k, 'value': v} for k, v in svc['spec']['selector'].items()]
             else:
                 selector = None
-            stripped_svc = {'name': svc.metadata.name,
-                            'type': svc.spec.type,
+            stripped_svc = {'name': svc['metadata']['name'],
+                            'type': svc['spec'].get('type'),
                             'selector': selector,
-                            'creation_timestamp': svc.metadata.creation_timestamp}
+                            'creation_timestamp': parse_datetime(svc['metadata']['creationTimestamp'])}
             ports = []
-            for port in svc.spec.ports:
-                ports.append({"port": port.port, "protocol": port.protocol})
+            for port in svc['spec'].get('ports') or []:
+                ports.append({"port": port.get('port'), "protocol": port.get('protocol')})
             stripped_svc["ports"] = ports
             stripped_services.append(stripped_svc)
         return stripped_services
@@ -745,40 +1078,52 @@ def get_apiserver():
         return core_v1.api_client.configuration.host
 
 
-def get_kubernetes_version():
-    core_v1 = get_portal_core_v1()
-    pods = core_v1.list_namespaced_pod("kube-system").items
-    for pod in pods:
-        for container in pod.spec.containers:
-            if 'kube-proxy' in container.image:
-                return container.image.split(":")[1]
-    logger.error(f"Kubernetes version not identifiable, list of pods in 'kube-system': {pods}.")
-    return None
+_version_lock = threading.Lock()
+_version = {'value': None, 'checked': None}
 
 
-def get_number_of_pods():
-    core_v1 = get_portal_core_v1()
-    return len(core_v1.list_pod_for_all_namespaces().items)
+def cached_kubernetes_version():
+    """
+    Returns a tuple of the cached Kubernetes version (or None) and
+    the information if it must be checked against the API server again.
+    """
+    with _version_lock:
+        checked = _version['checked']
+        due = checked is None or time.monotonic() - checked >= VERSION_CHECK_INTERVAL
+        return _version['value'], due
 
 
-def get_number_of_nodes():
-    core_v1 = get_portal_core_v1()
-    return len(core_v1.list_node().items)
+def remember_kubernetes_version(version):
+    # While the version is unknown, the next call checks again
+    if version is None:
+        return
+    with _version_lock:
+        _version['value'] = version
+        _version['checked'] = time.monotonic()
 
 
-def get_number_of_cpus():
-    core_v1 = get_portal_core_v1()
-    nodes = core_v1.list_node().items
+def cpus_from_nodes(nodes):
     return sum([int(node.status.capacity['cpu']) for node in nodes])
 
 
-def get_memory_sum():
-    core_v1 = get_portal_core_v1()
-    nodes = core_v1.list_node().items
+def memory_from_nodes(nodes):
     mems = [int(node.status.capacity['memory'][:-2]) for node in nodes]
     return sum(mems) / 1000000  # in GiBytes
 
 
-def get_number_of_volumes():
-    core_v1 = get_portal_core_v1()
-    return len(core_v1.list_persistent_volume().items)
+def get_kubernetes_version():
+    """
+    Returns the version of the API server (e.g. 'v1.19.2'), as reported by its /version endpoint.
+    The result is cached for the lifetime of the process and checked again every VERSION_CHECK_INTERVAL
+    seconds. When the check fails, the last known version is returned. While no version is known,
+    every call checks again.
+    """
+    version, due = cached_kubernetes_version()
+    if not due:
+        return version
+    try:
+        version = client.VersionApi(get_portal_api_client()).get_code().git_version
+    except Exception:
+        logger.exception("Error while fetching the Kubernetes version")
+    remember_kubernetes_version(version)
+    return version
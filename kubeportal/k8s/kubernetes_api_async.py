@@ -0,0 +1,311 @@
+"""
+    Asynchronous counterpart of kubernetes_api, based on kubernetes_asyncio.
+
+    Independent API server calls (e.g. for the cluster statistics) can be
+    issued concurrently here, instead of waiting for one after another.
+    All calls share one aiohttp connection pool per process, and get the
+    same timeouts, retries and circuit breaker as the synchronous calls
+    (see kubeportal.k8s.resilience).
+
+    The coroutines run on a background event loop thread, so that the
+    synchronous WSGI code paths can use them through run() and
+    run_concurrently(), without creating a new event loop (and new
+    TLS connections) for every request.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from kubernetes_asyncio import client, config
+from kubernetes_asyncio.config.incluster_config import SERVICE_TOKEN_FILENAME
+from kubernetes_asyncio.config.kube_config import KUBE_CONFIG_DEFAULT_LOCATION
+
+from kubeportal.k8s.clients import CREDENTIALS_CHECK_INTERVAL, _file_fingerprint
+from kubeportal.k8s.resilience import AsyncResilientApiClient
+from kubeportal.k8s.kubernetes_api import (cpus_from_nodes, memory_from_nodes, count_from_page, METADATA_LIST_ACCEPT,
+                                           cached_kubernetes_version, remember_kubernetes_version)
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+# Maximum time (in seconds) a synchronous caller waits for a coroutine.
+RUN_TIMEOUT = 60
+
+
+async def _load_portal_configuration():
+    """
+    Load the credentials of the running Kubeportal software into a new
+    configuration object.
+
+    Returns a tuple of the configuration and the file it was loaded from,
+    or (None, None) on error.
+    """
+    try:
+        # Kubeportal runs as pod in Kubernetes
+        # The async library only supports setting the default configuration here,
+        # which is not used anywhere else
+        config.load_incluster_config()
+        return client.Configuration.get_default_copy(), SERVICE_TOKEN_FILENAME
+    except Exception:
+        try:
+            # There is a ~/.kube/config file available
+            configuration = client.Configuration()
+            await config.load_kube_config(client_configuration=configuration)
+            return configuration, os.path.expanduser(KUBE_CONFIG_DEFAULT_LOCATION)
+        except Exception:
+            logger.error("Could not load Kubernetes configuration with async helpers.")
+            return None, None
+
+
+class _PortalSession:
+    """
+    The shared ApiClient with portal credentials, bound to one event loop.
+    Only to be used from coroutines running on that loop.
+    """
+
+    def __init__(self):
+        self._api_client = None
+        self._source = None
+        self._fingerprint = None
+        self._last_check = 0
+        self._lock = None
+
+    async def _credentials_changed(self):
+        now = time.monotonic()
+        if now - self._last_check < CREDENTIALS_CHECK_INTERVAL:
+            return False
+        self._last_check = now
+        return _file_fingerprint(self._source) != self._fingerprint
+
+    async def get_api_client(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._api_client is not None and await self._credentials_changed():
+                logger.info("Kubernetes credentials of the portal changed, re-creating async API client.")
+                await self._api_client.close()
+                self._api_client = None
+            if self._api_client is None:
+                configuration, self._source = await _load_portal_configuration()
+                if configuration is None:
+                    raise RuntimeError("No Kubernetes configuration available.")
+                self._fingerprint = _file_fingerprint(self._source)
+                self._last_check = time.monotonic()
+                self._api_client = AsyncResilientApiClient(configuration)
+            return self._api_client
+
+    async def close(self):
+        if self._api_client is not None:
+            await self._api_client.close()
+            self._api_client = None
+
+
+class _EventLoopThread:
+    """
+    A daemon thread running an event loop for the synchronous facade.
+    Like the client registry, it is re-created after a fork.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._thread = None
+        self.session = None
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._loop = asyncio.new_event_loop()
+            self.session = _PortalSession()
+            self._thread = threading.Thread(target=self._loop.run_forever,
+                                            name='kubeportal-async-k8s',
+                                            daemon=True)
+            self._thread.start()
+
+    def run(self, coroutine, timeout=RUN_TIMEOUT):
+        self._ensure_running()
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        return future.result(timeout)
+
+    def stop(self):
+        with self._lock:
+            if self._pid != os.getpid() or self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self.session.close(), self._loop).result(RUN_TIMEOUT)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._pid = None
+
+
+_loop_thread = _EventLoopThread()
+
+
+### Synchronous facade
+
+def run(coroutine, timeout=RUN_TIMEOUT):
+    """
+    Runs the given coroutine on the background event loop and returns its result.
+    Exceptions are raised in the calling thread.
+    """
+    return _loop_thread.run(coroutine, timeout)
+
+
+def run_concurrently(*coroutines, timeout=RUN_TIMEOUT):
+    """
+    Runs the given coroutines concurrently and returns the list of results,
+    in the same order. If one of them fails, its exception is raised.
+    """
+    async def _gather():
+        return await asyncio.gather(*coroutines)
+    return run(_gather(), timeout)
+
+
+def shutdown():
+    """
+    Closes the connection pool and stops the background event loop.
+    """
+    _loop_thread.stop()
+
+
+### Helper functions for accessing the Kubernetes API server with
+### permissions of the running portal software
+
+async def get_portal_api_client():
+    return await _loop_thread.session.get_api_client()
+
+
+async def get_portal_core_v1():
+    return client.CoreV1Api(await get_portal_api_client())
+
+
+async def get_portal_version_api():
+    return client.VersionApi(await get_portal_api_client())
+
+
+async def _list_metadata_page(api_client, path, limit, _continue=None):
+    """
+    Fetches one page of a list call as PartialObjectMetadataList,
+    see kubernetes_api._list_metadata_page().
+    """
+    query_params = [('limit', limit)]
+    if _continue:
+        query_params.append(('continue', _continue))
+    response = await api_client.call_api(path, 'GET',
+                                         query_params=query_params,
+                                         header_params={'Accept': METADATA_LIST_ACCEPT},
+                                         auth_settings=['BearerToken'],
+                                         _return_http_data_only=True,
+                                         _preload_content=False)
+    try:
+        return json.loads(await response.read())
+    finally:
+        response.release()
+
+
+async def _count_objects(path):
+    """
+    Counts the objects behind the given list API path.
+    Only a single object is fetched when the API server reports the number
+    of remaining items, otherwise the metadata is paged through.
+    """
+    api_client = await get_portal_api_client()
+    count = count_from_page(await _list_metadata_page(api_client, path, limit=1))
+    _continue = None
+    while count is None or _continue:
+        page = await _list_metadata_page(api_client, path, settings.LIST_PAGE_SIZE, _continue)
+        count = (count or 0) + len(page.get('items') or [])
+        _continue = page['metadata'].get('continue')
+    return count
+
+
+### Statistics
+
+async def get_apiserver():
+    if settings.API_SERVER_EXTERNAL:
+        return settings.API_SERVER_EXTERNAL
+    else:
+        api_client = await get_portal_api_client()
+        return api_client.configuration.host
+
+
+async def get_kubernetes_version():
+    """
+    Returns the version of the API server, shares the cache
+    with kubernetes_api.get_kubernetes_version().
+    """
+    version, due = cached_kubernetes_version()
+    if not due:
+        return version
+    try:
+        version_api = await get_portal_version_api()
+        version = (await version_api.get_code()).git_version
+    except Exception:
+        logger.exception("Error while fetching the Kubernetes version")
+    remember_kubernetes_version(version)
+    return version
+
+
+async def get_number_of_pods():
+    return await _count_objects('/api/v1/pods')
+
+
+async def get_number_of_nodes():
+    core_v1 = await get_portal_core_v1()
+    return len((await core_v1.list_node()).items)
+
+
+async def get_number_of_volumes():
+    return await _count_objects('/api/v1/persistentvolumes')
+
+
+async def get_node_statistics():
+    """
+    Returns the number of nodes, CPUs and main memory from a single node list.
+    """
+    core_v1 = await get_portal_core_v1()
+    nodes = (await core_v1.list_node()).items
+    return len(nodes), cpus_from_nodes(nodes), memory_from_nodes(nodes)
+
+
+async def get_cluster_stats():
+    """
+    Fetches all cluster statistics concurrently.
+
+    Returns a dictionary. Values that could not be fetched are None,
+    the problem is put into the log file.
+    """
+    results = await asyncio.gather(get_kubernetes_version(),
+                                   get_apiserver(),
+                                   get_node_statistics(),
+                                   get_number_of_pods(),
+                                   get_number_of_volumes(),
+                                   return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Failed to fetch Kubernetes statistics: {result}")
+    version, apiserver, nodes, pods, volumes = [None if isinstance(result, Exception) else result
+                                                for result in results]
+    node_count, cpus, memory = nodes if nodes else (None, None, None)
+    return {'k8s_version': version,
+            'k8s_apiserver_url': apiserver,
+            'k8s_node_count': node_count,
+            'k8s_cpu_count': cpus,
+            'k8s_mem_sum': memory,
+            'k8s_pod_count': pods,
+            'k8s_volume_count': volumes}
+
+
+def fetch_cluster_stats():
+    """
+    Synchronous variant of get_cluster_stats().
+    """
+    return run(get_cluster_stats())
@@ -0,0 +1,336 @@
+"""
+    Timeouts, retries and a circuit breaker for all API server calls.
+
+    Every request of the generated Kubernetes client goes through
+    ApiClient.call_api(). The ResilientApiClient below wraps this method:
+
+    - Requests without an explicit timeout get one, depending on the method.
+    - Reads (GET) are retried with jittered exponential backoff when the
+      API server is unavailable. Writes are never retried.
+    - A circuit breaker counts such failures. When the error rate crosses
+      KUBEPORTAL_API_BREAKER_ERROR_RATE, calls fail fast for the cooldown
+      period instead of blocking the worker. Reads are then answered with
+      the last good result for the same request, if there is one. Only reads
+      of single namespaces or objects are kept for this, cluster-wide lists
+      and secrets never stay in memory.
+
+    Watch requests are long-running by design and bypass all of this.
+
+    The AsyncResilientApiClient does the same for kubernetes_asyncio, used
+    by kubeportal.k8s.kubernetes_api_async, and shares the circuit breaker.
+    It keeps no stale results, since it only reads cluster-wide data.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+import aiohttp
+import urllib3
+from django.conf import settings
+from kubernetes import client
+from kubernetes_asyncio import client as async_client
+
+from kubeportal import metrics
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+# Timeout (in seconds) for establishing the connection to the API server.
+CONNECT_TIMEOUT = 3
+
+# Base delay (in seconds) for the backoff between retries.
+RETRY_BASE_DELAY = 0.2
+
+# Number of recent calls the breaker uses for computing the error rate,
+# and the minimum number of calls before it can open.
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 5
+
+# Number of last good read results kept for stale answers.
+STALE_CACHE_SIZE = 512
+
+
+class CircuitOpenError(client.rest.ApiException):
+    """
+    Raised instead of calling the API server while the circuit breaker is open.
+    """
+
+    def __init__(self):
+        super().__init__(status=503, reason="Kubernetes API server unavailable (circuit breaker open)")
+
+
+def is_outage(exception):
+    """
+    Tells if an exception indicates an unavailable or overloaded API server.
+    Client errors, such as 404 or 409, are valid answers of a healthy server.
+    """
+    if isinstance(exception, (client.rest.ApiException, async_client.rest.ApiException)):
+        return exception.status == 0 or exception.status == 429 or exception.status >= 500
+    return isinstance(exception, (urllib3.exceptions.HTTPError, aiohttp.ClientError,
+                                  asyncio.TimeoutError, OSError))
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker with the classic closed, open and half-open states.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._results = deque(maxlen=BREAKER_WINDOW)
+        self._opened_at = None
+        self._probing = False
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self):
+        """
+        Tells if a call may go to the API server.
+        After the cooldown period, a single probe call is let through.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= settings.API_BREAKER_COOLDOWN:
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Kubernetes API server is reachable again, closing circuit breaker.")
+                self._state = self.CLOSED
+                self._results.clear()
+            self._results.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            self._results.append(False)
+            if self._state == self.HALF_OPEN:
+                self._open()
+            elif self._state == self.CLOSED and len(self._results) >= BREAKER_MIN_CALLS:
+                if self._error_rate() >= settings.API_BREAKER_ERROR_RATE:
+                    self._open()
+
+    def _open(self):
+        logger.error(f"Kubernetes API server failing, opening circuit breaker for {settings.API_BREAKER_COOLDOWN} seconds.")
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self.trips += 1
+
+    def _error_rate(self):
+        if not self._results:
+            return 0.0
+        return self._results.count(False) / len(self._results)
+
+    def reset(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._results.clear()
+            self._opened_at = None
+            self._probing = False
+            self.rejected = 0
+            self.trips = 0
+
+    def state(self):
+        """
+        Returns the breaker state for monitoring, as dictionary.
+        """
+        with self._lock:
+            return {'state': self._state,
+                    'error_rate': round(self._error_rate(), 2),
+                    'recent_calls': len(self._results),
+                    'open_for': round(time.monotonic() - self._opened_at, 1) if self._state != self.CLOSED else None,
+                    'trips': self.trips,
+                    'rejected_calls': self.rejected}
+
+
+def keeps_stale_result(resource_path):
+    """
+    Tells if the result of a read request may be kept for stale answers.
+    Cluster-wide lists, such as informer relists, would be large, and
+    secrets contain the tokens of all service accounts.
+    """
+    if '/secrets' in resource_path:
+        return False
+    return '{namespace}' in resource_path or '{name}' in resource_path
+
+
+class StaleCache:
+    """
+    Bounded LRU store of the last good result per read request.
+    """
+
+    def __init__(self, max_size=STALE_CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._max_size = max_size
+        self.served = 0
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            found = key in self._entries
+            metrics.cache_access('stale_results', found)
+            if found:
+                self.served += 1
+                return True, self._entries[key]
+            return False, None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'served': self.served}
+
+
+breaker = CircuitBreaker()
+stale_results = StaleCache()
+
+
+class ResilientApiClient(client.ApiClient):
+    """
+    ApiClient with timeouts, retries and circuit breaker, see module documentation.
+    """
+
+    def _stale_key(self, resource_path, method, path_params, query_params, response_type):
+        # The credentials are part of the key, so that users never see results fetched for others
+        return (self.configuration.host,
+                self.configuration.api_key.get('authorization'),
+                method, resource_path,
+                tuple(sorted((path_params or {}).items())),
+                tuple(query_params or []),
+                response_type)
+
+    def call_api(self, resource_path, method,
+                 path_params=None, query_params=None, header_params=None,
+                 body=None, post_params=None, files=None,
+                 response_type=None, auth_settings=None, async_req=None,
+                 _return_http_data_only=None, collection_formats=None,
+                 _preload_content=True, _request_timeout=None, _host=None):
+        def call():
+            return super(ResilientApiClient, self).call_api(
+                resource_path, method, path_params, query_params, header_params,
+                body, post_params, files, response_type, auth_settings, async_req,
+                _return_http_data_only, collection_formats, _preload_content,
+                _request_timeout, _host)
+
+        if async_req or any(key == 'watch' and value for key, value in query_params or []):
+            return call()
+
+        def timed_call():
+            with metrics.timed_api_call(method):
+                return call()
+
+        is_read = method == 'GET'
+        if _request_timeout is None:
+            read_timeout = settings.API_READ_TIMEOUT if is_read else settings.API_WRITE_TIMEOUT
+            _request_timeout = (CONNECT_TIMEOUT, read_timeout)
+        # Pages behind a continue token are not worth keeping, the token expires anyway
+        cacheable = is_read and _preload_content and keeps_stale_result(resource_path) \
+            and not any(key == 'continue' for key, _ in query_params or [])
+        stale_key = self._stale_key(resource_path, method, path_params, query_params,
+                                    response_type) if cacheable else None
+        attempts = 1 + settings.API_READ_RETRIES if is_read else 1
+
+        for attempt in range(attempts):
+            if not breaker.allow():
+                metrics.k8s_api_calls.labels(metrics.api_function(), method, 'rejected').inc()
+                return self._stale_or_raise(stale_key, CircuitOpenError())
+            try:
+                result = timed_call()
+            except Exception as e:
+                if not is_outage(e):
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if attempt + 1 < attempts:
+                    delay = random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt)
+                    logger.warning(f"{method} {resource_path} failed ({e.__class__.__name__}), retrying in {delay:.2f} seconds.")
+                    time.sleep(delay)
+                    continue
+                return self._stale_or_raise(stale_key, e)
+            breaker.record_success()
+            if cacheable:
+                stale_results.put(stale_key, result)
+            return result
+
+    def _stale_or_raise(self, stale_key, exception):
+        if stale_key is not None:
+            found, result = stale_results.get(stale_key)
+            if found:
+                logger.warning(f"Kubernetes API server unavailable, serving stale result for {stale_key[3]}.")
+                return result
+        raise exception
+
+
+class AsyncResilientApiClient(async_client.ApiClient):
+    """
+    kubernetes_asyncio ApiClient with timeouts, retries and circuit breaker,
+    see module documentation.
+    """
+
+    async def call_api(self, resource_path, method,
+                       path_params=None, query_params=None, header_params=None,
+                       body=None, post_params=None, files=None,
+                       response_type=None, auth_settings=None, async_req=None,
+                       _return_http_data_only=None, collection_formats=None,
+                       _preload_content=True, _request_timeout=None, _host=None):
+        async def call():
+            return await super(AsyncResilientApiClient, self).call_api(
+                resource_path, method, path_params, query_params, header_params,
+                body, post_params, files, response_type, auth_settings, async_req,
+                _return_http_data_only, collection_formats, _preload_content,
+                _request_timeout, _host)
+
+        if any(key == 'watch' and value for key, value in query_params or []):
+            return await call()
+
+        is_read = method == 'GET'
+        if _request_timeout is None:
+            read_timeout = settings.API_READ_TIMEOUT if is_read else settings.API_WRITE_TIMEOUT
+            _request_timeout = aiohttp.ClientTimeout(connect=CONNECT_TIMEOUT, sock_read=read_timeout)
+        attempts = 1 + settings.API_READ_RETRIES if is_read else 1
+
+        for attempt in range(attempts):
+            if not breaker.allow():
+                metrics.k8s_api_calls.labels(metrics.api_function(), method, 'rejected').inc()
+                raise CircuitOpenError()
+            try:
+                with metrics.timed_api_call(method):
+                    result = await call()
+            except Exception as e:
+                if not is_outage(e):
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if attempt + 1 < attempts:
+                    delay = random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt)
+                    logger.warning(f"{method} {resource_path} failed ({e.__class__.__name__}), retrying in {delay:.2f} seconds.")
+                    await asyncio.sleep(delay)
+                    continue
+                raise
+            breaker.record_success()
+            return result
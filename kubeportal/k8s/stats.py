@@ -0,0 +1,77 @@
+"""
+    Snapshot of the cluster statistics, kept in the Django cache.
+
+    All statistics are collected in one pass (see kubernetes_api_async.get_cluster_stats())
+    and stored together with their collection time. Readers get the stored snapshot
+    immediately. When it is older than KUBEPORTAL_STATS_REFRESH_INTERVAL, a background
+    thread collects a new one, so that only the very first reader waits for the cluster.
+
+    The 'refresh_cluster_stats' management command does the same on a schedule,
+    e.g. from a cron job. The portal workers only see its snapshots when they
+    share the cache with it, so this needs a KUBEPORTAL_CACHE_BACKEND other than
+    the default per-process memory cache.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from kubeportal import metrics
+from kubeportal.k8s import kubernetes_api_async as api_async
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+CACHE_KEY = 'kubeportal-cluster-stats'
+REFRESH_LOCK_KEY = 'kubeportal-cluster-stats-refresh'
+
+# Names of the statistics in the snapshot, equal to the API info slugs.
+STATS = ['k8s_version', 'k8s_apiserver_url', 'k8s_node_count', 'k8s_cpu_count',
+         'k8s_mem_sum', 'k8s_pod_count', 'k8s_volume_count']
+
+
+def refresh():
+    """
+    Collects all cluster statistics and stores them as new snapshot.
+    Returns the snapshot dictionary.
+    """
+    start = time.monotonic()
+    snapshot = {'stats': api_async.fetch_cluster_stats(),
+                'timestamp': time.time()}
+    # Keep outdated snapshots for a while, they are still better than waiting
+    cache.set(CACHE_KEY, snapshot, timeout=max(settings.STATS_REFRESH_INTERVAL * 10, 600))
+    logger.debug(f"Collected cluster statistics in {time.monotonic() - start:.2f} seconds.")
+    return snapshot
+
+
+def _refresh_in_background():
+    # Only one refresh at a time, as far as the cache backend is shared
+    if not cache.add(REFRESH_LOCK_KEY, True, timeout=api_async.RUN_TIMEOUT):
+        return
+
+    def run():
+        try:
+            refresh()
+        except Exception:
+            logger.exception("Refreshing the cluster statistics failed.")
+        finally:
+            cache.delete(REFRESH_LOCK_KEY)
+
+    threading.Thread(target=run, name='kubeportal-stats-refresh', daemon=True).start()
+
+
+def get_snapshot():
+    """
+    Returns a tuple of the statistics dictionary and its age in seconds.
+    """
+    snapshot = cache.get(CACHE_KEY)
+    metrics.cache_access('cluster_stats', snapshot is not None)
+    if snapshot is None:
+        snapshot = refresh()
+    age = max(0, int(time.time() - snapshot['timestamp']))
+    if age >= settings.STATS_REFRESH_INTERVAL:
+        _refresh_in_background()
+    return snapshot['stats'], age
@@ -0,0 +1,95 @@
+"""
+    Synchronization as background job, so that the admin interface does not
+    have to wait for it.
+
+    The job takes its own SyncLease (see kubeportal.k8s.sync_scheduler), so that
+    only one job runs across all worker processes and replicas. The lease row
+    also holds the progress and the outcome, so every worker can show them.
+    When a worker dies during the job, its lease expires after JOB_LEASE_DURATION
+    seconds, and a new job can be started.
+"""
+
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from kubeportal.k8s import k8s_sync
+from kubeportal.k8s.sync_scheduler import acquire_lease, holder_identity, LeaseHeartbeat
+from kubeportal.models.synclease import SyncLease
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+JOB_LEASE_NAME = 'k8s-sync-job'
+
+# Seconds after which the lease of a job that is no longer renewed expires.
+JOB_LEASE_DURATION = 60
+
+# Minimum seconds between two progress updates in the database within one phase.
+PROGRESS_INTERVAL = 1
+
+
+def get_job():
+    """
+    Returns the state of the current or last synchronization job as dictionary, or None.
+    """
+    lease = SyncLease.objects.filter(name=JOB_LEASE_NAME).first()
+    if lease is None or lease.last_run is None:
+        return None
+    running = lease.holder is not None and lease.expires > timezone.now()
+    finished = None
+    if lease.last_duration is not None:
+        finished = lease.last_run + timedelta(seconds=lease.last_duration)
+    return {'state': 'running' if running else 'finished',
+            'phase': lease.phase, 'done': lease.done, 'total': lease.total,
+            'started': lease.last_run, 'finished': finished,
+            'result': bool(lease.last_result)}
+
+
+def _progress_writer():
+    last = {'phase': None, 'written': 0}
+
+    def progress(phase, done, total):
+        now = time.monotonic()
+        if phase == last['phase'] and done != total and now - last['written'] < PROGRESS_INTERVAL:
+            return
+        last.update(phase=phase, written=now)
+        SyncLease.objects.filter(name=JOB_LEASE_NAME).update(phase=phase, done=done, total=total)
+
+    return progress
+
+
+def _run(holder):
+    start = timezone.now()
+    result = False
+    try:
+        with LeaseHeartbeat(holder, JOB_LEASE_DURATION, JOB_LEASE_NAME):
+            result = k8s_sync.sync(progress=_progress_writer())
+    except Exception:
+        logger.exception("Synchronization job failed.")
+    finally:
+        SyncLease.objects.filter(name=JOB_LEASE_NAME, holder=holder).update(
+            holder=None, expires=None, last_result=result,
+            last_duration=(timezone.now() - start).total_seconds())
+        connection.close()
+
+
+def start_job():
+    """
+    Starts the synchronization in a background thread.
+    Returns False when a job is already running.
+    """
+    # Unique per job, so that a second start in the same process does not renew the lease
+    holder = f"{holder_identity()}:{uuid.uuid4().hex[:8]}"
+    if not acquire_lease(holder, JOB_LEASE_DURATION, JOB_LEASE_NAME):
+        return False
+    SyncLease.objects.filter(name=JOB_LEASE_NAME).update(
+        last_run=timezone.now(), last_holder=holder, last_result=None, last_duration=None,
+        phase=None, done=0, total=None)
+    threading.Thread(target=_run, args=(holder,), name='kubeportal-sync-job', daemon=True).start()
+    return True
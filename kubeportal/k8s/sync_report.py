@@ -0,0 +1,37 @@
+"""
+    Timing and database query counting for the phases of the Kubernetes synchronization.
+"""
+
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+from kubeportal import metrics
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+
+@contextmanager
+def sync_phase(name):
+    """
+    Context manager that logs duration and number of database queries of a sync phase.
+    Yields a dictionary, the phase can add its own counters for the log message.
+    """
+    report = {'queries': 0}
+
+    def count_query(execute, sql, params, many, context):
+        report['queries'] += 1
+        return execute(sql, params, many, context)
+
+    start = time.monotonic()
+    try:
+        with connection.execute_wrapper(count_query):
+            yield report
+    finally:
+        duration = time.monotonic() - start
+        metrics.sync_phase_duration.labels(name).observe(duration)
+        details = ', '.join(f"{key}: {value}" for key, value in report.items())
+        logger.info(f"Sync phase '{name}' finished in {duration:.2f} seconds ({details}).")
@@ -0,0 +1,155 @@
+"""
+    Periodic background synchronization, for deployments with multiple portal replicas.
+
+    Every portal process runs the scheduler thread when KUBEPORTAL_SYNC_INTERVAL
+    is set. Before each run, the thread tries to acquire a lease in the database,
+    with a single conditional UPDATE. Only the process holding the lease synchronizes.
+    It keeps the lease by renewing it on every run, and from a heartbeat thread while
+    a run takes longer. When the leading replica dies, another one takes over after
+    the lease expired.
+"""
+
+import os
+import random
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Q
+from django.utils import timezone
+
+from kubeportal.k8s import k8s_sync
+from kubeportal.models.synclease import SyncLease
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+LEASE_NAME = 'k8s-sync'
+
+
+def holder_identity():
+    """
+    Identifies this process across all replicas. The host name is the pod name in Kubernetes.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def acquire_lease(holder, duration, name=LEASE_NAME):
+    """
+    Acquires or renews the lease with the given name for the given holder. Returns True on success.
+    """
+    SyncLease.objects.get_or_create(name=name)
+    now = timezone.now()
+    acquired = SyncLease.objects.filter(name=name) \
+        .filter(Q(holder=holder) | Q(holder=None) | Q(expires__lt=now)) \
+        .update(holder=holder, expires=now + timedelta(seconds=duration))
+    return acquired == 1
+
+
+class LeaseHeartbeat:
+    """
+    Context manager that renews a held lease in a background thread,
+    so that it does not expire while the job is still running.
+    """
+
+    def __init__(self, holder, duration, name=LEASE_NAME):
+        self.holder = holder
+        self.duration = duration
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='kubeportal-lease-heartbeat', daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.duration / 3):
+                if not acquire_lease(self.holder, self.duration, self.name):
+                    logger.warning(f"Lost the lease '{self.name}' while running, another replica may run concurrently.")
+        except Exception:
+            logger.exception(f"Renewing the lease '{self.name}' failed.")
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def run_once(holder=None, interval=None):
+    """
+    Synchronizes, if this process holds the lease.
+    Returns the sync result, or None when another replica is the leader.
+    """
+    holder = holder or holder_identity()
+    interval = interval or settings.SYNC_INTERVAL
+    # The leader keeps the lease over some missed intervals, to avoid flapping
+    duration = 3 * interval
+    if not acquire_lease(holder, duration):
+        return None
+    start = timezone.now()
+    try:
+        with LeaseHeartbeat(holder, duration):
+            result = k8s_sync.sync()
+    except Exception:
+        logger.exception("Scheduled synchronization with Kubernetes failed.")
+        result = False
+    # The lease period starts again at the end of the run
+    acquire_lease(holder, duration)
+    SyncLease.objects.filter(name=LEASE_NAME).update(
+        last_run=start, last_result=result, last_holder=holder,
+        last_duration=(timezone.now() - start).total_seconds())
+    return result
+
+
+def get_state():
+    """
+    Returns the SyncLease object with the information about the last scheduled run, or None.
+    """
+    return SyncLease.objects.filter(name=LEASE_NAME).first()
+
+
+class SyncScheduler:
+    """
+    Background thread that calls run_once() every KUBEPORTAL_SYNC_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        """
+        Starts the thread, if enabled and not running in this process.
+        """
+        if settings.SYNC_INTERVAL <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='kubeportal-sync-scheduler', daemon=True)
+            self._thread.start()
+            logger.info(f"Started background synchronization every {settings.SYNC_INTERVAL} seconds.")
+
+    def _run(self):
+        holder = holder_identity()
+        while True:
+            # Replicas started together should not compete in lockstep
+            time.sleep(settings.SYNC_INTERVAL * random.uniform(0.9, 1.1))
+            try:
+                close_old_connections()
+                run_once(holder)
+            except Exception:
+                logger.exception("Scheduled synchronization with Kubernetes failed.")
+
+
+scheduler = SyncScheduler()
@@ -0,0 +1,202 @@
+"""
+    In-process store for the login tokens of Kubernetes service accounts.
+
+    Fetching a token needs two API server calls (service account, then secret).
+    The store keeps the decoded tokens per (namespace, service account name).
+    A background watch on service account token secrets refreshes or drops
+    entries when the secrets change, so that warm lookups need no API call.
+    When the watch is not running, entries expire after TOKEN_CACHE_TTL seconds.
+"""
+
+import os
+import random
+import threading
+import time
+from base64 import b64decode
+
+from django.conf import settings
+from kubernetes import client, watch
+
+from kubeportal import metrics
+from kubeportal.k8s.clients import portal_clients
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+TOKEN_SECRET_TYPE = 'kubernetes.io/service-account-token'
+SERVICE_ACCOUNT_ANNOTATION = 'kubernetes.io/service-account.name'
+
+# Server-side timeout of a single watch request, the watch is restarted afterwards.
+WATCH_TIMEOUT = 300
+
+
+def _decode_token(secret):
+    if not secret.data or 'token' not in secret.data:
+        return None
+    return b64decode(secret.data['token']).decode()
+
+
+def fetch_token(namespace, name):
+    """
+    Fetches the token of a service account from the API server.
+    Returns a tuple of secret name and decoded token.
+    """
+    core_v1 = portal_clients.get_api('core_v1')
+    service_account = core_v1.read_namespaced_service_account(name=name, namespace=namespace)
+    secret_name = service_account.secrets[0].name
+    secret = core_v1.read_namespaced_secret(name=secret_name, namespace=namespace)
+    return secret_name, _decode_token(secret)
+
+
+class TokenStore:
+    """
+    Thread-safe cache of service account tokens, kept up to date by a secret watch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._watch_thread = None
+        self._watch_pid = None
+        self._watch_healthy = False
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, namespace, name):
+        """
+        Returns the decoded token for the given service account.
+        Raises an exception when the token cannot be fetched from the API server.
+        """
+        key = (namespace, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                secret_name, token, fetched = entry
+                watched = self._watch_healthy and self._watch_pid == os.getpid()
+                if watched or time.monotonic() - fetched < settings.TOKEN_CACHE_TTL:
+                    self.hits += 1
+                    metrics.cache_access('tokens', True)
+                    return token
+            self.misses += 1
+        metrics.cache_access('tokens', False)
+
+        secret_name, token = fetch_token(namespace, name)
+        with self._lock:
+            self._entries[key] = (secret_name, token, time.monotonic())
+        # The cluster is reachable, so the watch makes sense now
+        self.start_watch()
+        return token
+
+    def invalidate(self, namespace, name):
+        with self._lock:
+            self._entries.pop((namespace, name), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'watch_healthy': self._watch_healthy}
+
+    def handle_event(self, event_type, secret):
+        """
+        Applies a watch event for a service account token secret to the store.
+        Only secrets that back a cached entry are considered, new service accounts
+        are fetched on first use.
+        """
+        annotations = secret.metadata.annotations or {}
+        service_account_name = annotations.get(SERVICE_ACCOUNT_ANNOTATION)
+        if not service_account_name:
+            return
+        key = (secret.metadata.namespace, service_account_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != secret.metadata.name:
+                return
+            if event_type == 'DELETED':
+                logger.debug(f"Token secret {secret.metadata.name} for service account {key} was deleted.")
+                del self._entries[key]
+            else:
+                token = _decode_token(secret)
+                if token != entry[1]:
+                    logger.debug(f"Token secret {secret.metadata.name} for service account {key} was rotated.")
+                self._entries[key] = (secret.metadata.name, token, time.monotonic())
+
+    def start_watch(self):
+        """
+        Starts the background watch thread, if it is not running in this process.
+        """
+        if not settings.TOKEN_CACHE_WATCH:
+            return
+        with self._lock:
+            if self._watch_pid == os.getpid() and self._watch_thread.is_alive():
+                return
+            self._watch_pid = os.getpid()
+            self._watch_thread = threading.Thread(target=self._watch_loop,
+                                                  name='kubeportal-token-watch',
+                                                  daemon=True)
+            self._watch_thread.start()
+
+    def _set_healthy(self, healthy):
+        with self._lock:
+            self._watch_healthy = healthy
+
+    def _resync(self, core_v1):
+        """
+        Lists all token secrets, applies them to the store and
+        returns the resource version to continue watching from.
+        """
+        secret_list = core_v1.list_secret_for_all_namespaces(
+            field_selector=f'type={TOKEN_SECRET_TYPE}')
+        cached_secrets = set()
+        for secret in secret_list.items:
+            self.handle_event('MODIFIED', secret)
+            cached_secrets.add((secret.metadata.namespace, secret.metadata.name))
+        # Drop entries whose secret vanished while we were not watching
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if (key[0], entry[0]) not in cached_secrets:
+                    del self._entries[key]
+        return secret_list.metadata.resource_version
+
+    def _watch_loop(self):
+        backoff = 1
+        resource_version = None
+        while True:
+            try:
+                core_v1 = portal_clients.get_api('core_v1')
+                if resource_version is None:
+                    resource_version = self._resync(core_v1)
+                    self._set_healthy(True)
+                w = watch.Watch()
+                for event in w.stream(core_v1.list_secret_for_all_namespaces,
+                                      field_selector=f'type={TOKEN_SECRET_TYPE}',
+                                      resource_version=resource_version,
+                                      timeout_seconds=WATCH_TIMEOUT):
+                    self.handle_event(event['type'], event['object'])
+                    resource_version = event['object'].metadata.resource_version
+                backoff = 1
+            except client.rest.ApiException as e:
+                self._set_healthy(False)
+                if e.status == 410:
+                    logger.debug("Token secret watch expired, listing secrets again.")
+                    resource_version = None
+                    continue
+                logger.error(f"Token secret watch failed with status {e.status}, retrying in {backoff} seconds.")
+                resource_version = None
+                time.sleep(backoff + random.random())
+                backoff = min(backoff * 2, 60)
+            except Exception:
+                self._set_healthy(False)
+                logger.exception(f"Token secret watch failed, retrying in {backoff} seconds.")
+                resource_version = None
+                time.sleep(backoff + random.random())
+                backoff = min(backoff * 2, 60)
+
+
+token_store = TokenStore()
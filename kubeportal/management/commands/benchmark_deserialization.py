@@ -0,0 +1,72 @@
+import time
+from datetime import datetime, timezone
+
+import orjson
+from django.core.management.base import BaseCommand
+from kubernetes import client
+
+from kubeportal.api.views.pods import PodSerializer
+
+
+def make_pod_list(count):
+    """
+    Creates a JSON pod list, as the API server would send it.
+    """
+    pods = []
+    for i in range(count):
+        pods.append(client.V1Pod(
+            metadata=client.V1ObjectMeta(name=f"pod-{i}", namespace="benchmark", uid=f"uid-{i}",
+                                         labels={'app': 'benchmark', 'index': str(i)},
+                                         creation_timestamp=datetime(2021, 1, 1, tzinfo=timezone.utc)),
+            spec=client.V1PodSpec(
+                containers=[client.V1Container(
+                    name="web", image="nginx:latest",
+                    env=[client.V1EnvVar(name=f"VAR_{j}", value=str(j)) for j in range(10)],
+                    volume_mounts=[client.V1VolumeMount(name="data", mount_path="/data"),
+                                   client.V1VolumeMount(name="config", mount_path="/etc/config")])],
+                volumes=[client.V1Volume(name="data", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name="data")),
+                         client.V1Volume(name="config", config_map=client.V1ConfigMapVolumeSource(name="config"))]),
+            status=client.V1PodStatus(phase="Running", host_ip="10.0.0.1",
+                                      start_time=datetime(2021, 1, 1, tzinfo=timezone.utc))))
+    pod_list = client.V1PodList(api_version="v1", kind="PodList", items=pods, metadata=client.V1ListMeta())
+    return orjson.dumps(client.ApiClient().sanitize_for_serialization(pod_list))
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class Command(BaseCommand):
+    '''
+        Compare the model deserialization of the Kubernetes client library
+        with the raw JSON path of kubernetes_api, on a large pod list.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pods', type=int, default=5000)
+        parser.add_argument('--rounds', type=int, default=3)
+
+    def handle(self, *args, **options):
+        data = make_pod_list(options['pods'])
+        api_client = client.ApiClient()
+        print(f"Pod list with {options['pods']} pods, {len(data) / 1024 / 1024:.1f} MB of JSON.")
+
+        for name, parse, serialize in [
+            ("Kubernetes models",
+             lambda: api_client.deserialize(_Response(data), 'V1PodList').items,
+             PodSerializer.create_from_k8s_pod),
+            ("Raw JSON",
+             lambda: orjson.loads(data)['items'],
+             PodSerializer.create_from_k8s_pod_dict)]:
+            parse_times, serialize_times = [], []
+            for _ in range(options['rounds']):
+                start = time.perf_counter()
+                pods = parse()
+                parsed = time.perf_counter()
+                for pod in pods:
+                    serialize(pod).data
+                parse_times.append(parsed - start)
+                serialize_times.append(time.perf_counter() - parsed)
+            print(f"{name:<20} parsing: {min(parse_times) * 1000:8.1f} ms, "
+                  f"serializing: {min(serialize_times) * 1000:8.1f} ms")
@@ -0,0 +1,67 @@
+import time
+import uuid
+from importlib import import_module
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, HASH_SESSION_KEY, BACKEND_SESSION_KEY
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+from kubeportal import access
+from kubeportal.models import User
+from kubeportal.models.webapplication import WebApplication
+from kubeportal.subauth_app import SubAuthApplication
+
+
+def _requests_per_second(application, environ, seconds):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        response = application(dict(environ), lambda status, headers: None)
+        if hasattr(response, 'close'):
+            response.close()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    '''
+        Compare the requests per second of the sub-authentication endpoint
+        with the full Django stack and with the fast path of kubeportal.subauth_app.
+        A temporary user and web application are created and removed afterwards.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        name = f"benchmark-{uuid.uuid4().hex[:8]}"
+        user = User.objects.create(username=name)
+        webapp = WebApplication.objects.create(name=name, can_subauth=True)
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        try:
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.save()
+            # No API server involved, both variants answer from the decision cache
+            access.store_subauth_decision(str(user.pk), webapp.pk, True, 'ok', 'benchmark-token',
+                                          user.get_session_auth_hash())
+
+            environ = {'PATH_INFO': f'/subauthreq/{webapp.pk}/',
+                       'REQUEST_METHOD': 'GET',
+                       'HTTP_HOST': next((host for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost'),
+                       'HTTP_COOKIE': f'{settings.SESSION_COOKIE_NAME}={session.session_key}'}
+            setup_testing_defaults(environ)
+
+            django_application = get_wsgi_application()
+            results = [("Django stack", _requests_per_second(django_application, environ, options['seconds'])),
+                       ("Fast path", _requests_per_second(SubAuthApplication(django_application), environ,
+                                                          options['seconds']))]
+            for title, rate in results:
+                print(f"{title:<20} {rate:10.0f} requests/second")
+        finally:
+            session.delete()
+            webapp.delete()
+            user.delete()
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from kubeportal import access
+from kubeportal.models.webapplicationaccess import WebApplicationAccess
+
+
+class Command(BaseCommand):
+    '''
+        Rebuild the materialized access of users to web applications
+        from the group memberships, and verify that both match.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify-only', action='store_true',
+                            help="Only report differences, do not rebuild the table.")
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            WebApplicationAccess.rebuild()
+            access.invalidate_all()
+            print(f"Rebuilt web application access with {WebApplicationAccess.objects.count()} entries.")
+
+        missing, extra = WebApplicationAccess.verify()
+        for user_pk, webapp_pk in sorted(missing):
+            print(f"Missing access of user {user_pk} to web application {webapp_pk}.")
+        for user_pk, webapp_pk in sorted(extra):
+            print(f"Wrong access of user {user_pk} to web application {webapp_pk}.")
+        if missing or extra:
+            raise CommandError(f"Web application access is inconsistent: {len(missing)} entries missing, "
+                               f"{len(extra)} wrong.")
+        print("Web application access is consistent with the group memberships.")
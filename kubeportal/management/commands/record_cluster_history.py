@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from kubeportal.k8s import stats as cluster_stats
+from kubeportal.models.clusterstatistic import ClusterStatistic
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+
+class Command(BaseCommand):
+    '''
+        Record the current cluster statistics in the history table,
+        and roll up old points into hourly and daily averages.
+        Runs once, or repeatedly with the given interval.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Seconds between two records. Record only once when not given.")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                snapshot = cluster_stats.refresh()
+                point = ClusterStatistic.record(snapshot['stats'])
+                ClusterStatistic.downsample()
+                print(f"Recorded cluster statistics from {point.timestamp}.")
+            except Exception:
+                logger.exception("Recording the cluster statistics failed.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from kubeportal.k8s import stats as cluster_stats
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',
+                'django.core.cache.backends.dummy.DummyCache')
+
+
+class Command(BaseCommand):
+    '''
+        Collect the cluster statistics and store them in the cache,
+        once or repeatedly with the given interval. Only useful with
+        a cache backend that is shared with the portal workers.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Seconds between two refreshes. Refresh only once when not given.")
+
+    def handle(self, *args, **options):
+        if settings.CACHES['default']['BACKEND'] in LOCAL_CACHES:
+            logger.warning("The cache is not shared with the portal workers, they will not see these statistics.")
+        while True:
+            try:
+                snapshot = cluster_stats.refresh()
+                print(f"Cluster statistics refreshed: {snapshot['stats']}")
+            except Exception:
+                logger.exception("Refreshing the cluster statistics failed.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,20 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from kubeportal.k8s import k8s_sync
+
+
+class Command(BaseCommand):
+    '''
+        Keep namespaces and service accounts in sync with the cluster
+        by watching them, until the command is stopped.
+    '''
+
+    def handle(self, *args, **option):
+        threads = [threading.Thread(target=k8s_sync.watch, args=(kind,), name=f'kubeportal-watch-{kind}', daemon=True)
+                   for kind in k8s_sync.WATCHES.keys()]
+        for thread in threads:
+            thread.start()
+        print(f"Watching {', '.join(k8s_sync.WATCHES.keys())} ...")
+        for thread in threads:
+            thread.join()
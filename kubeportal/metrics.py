@@ -0,0 +1,119 @@
+"""
+    Prometheus metrics of the portal, exposed in text format under /metrics/.
+
+    Updating a metric is only a locked counter increment, so that the
+    instrumentation can stay enabled in production.
+
+    With multiple uwsgi worker processes, every process has its own metric values.
+    Set the PROMETHEUS_MULTIPROC_DIR environment variable to an empty, writable
+    directory (before the portal starts) to let the workers share their values
+    through this directory. The /metrics/ endpoint then reports the sum over all
+    worker processes. The directory must be cleaned on every restart of uwsgi.
+"""
+
+import os
+import sys
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+from prometheus_client import CONTENT_TYPE_LATEST
+
+KUBERNETES_API_MODULES = ('kubeportal.k8s.kubernetes_api', 'kubeportal.k8s.kubernetes_api_async')
+
+request_duration = Histogram(
+    'kubeportal_request_duration_seconds',
+    'Duration of portal HTTP requests, per URL name.',
+    ['view', 'method', 'status'])
+
+k8s_api_duration = Histogram(
+    'kubeportal_k8s_api_duration_seconds',
+    'Duration of Kubernetes API server calls, per kubernetes_api function.',
+    ['function', 'method'])
+
+k8s_api_calls = Counter(
+    'kubeportal_k8s_api_calls_total',
+    'Kubernetes API server calls, per kubernetes_api function and outcome.',
+    ['function', 'method', 'outcome'])
+
+cache_requests = Counter(
+    'kubeportal_cache_requests_total',
+    'Lookups in the portal caches, per cache and result.',
+    ['cache', 'result'])
+
+sync_duration = Histogram(
+    'kubeportal_k8s_sync_duration_seconds',
+    'Duration of the synchronization between portal database and Kubernetes.',
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+
+sync_phase_duration = Histogram(
+    'kubeportal_k8s_sync_phase_duration_seconds',
+    'Duration of the single phases of the synchronization, see kubeportal.k8s.sync_report.',
+    ['phase'],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+
+sync_runs = Counter(
+    'kubeportal_k8s_sync_total',
+    'Synchronization runs between portal database and Kubernetes, per result.',
+    ['result'])
+
+subauth_decisions = Counter(
+    'kubeportal_subauth_decisions_total',
+    'Decisions of the sub-authentication endpoint, per result and reason.',
+    ['result', 'reason'])
+
+
+def api_function():
+    """
+    Returns the name of the kubernetes_api (or kubernetes_api_async) function
+    that caused the currently running API server call, by inspecting the call stack.
+    Private helpers are skipped in favour of their public caller.
+    """
+    frame = sys._getframe(1)
+    helper = None
+    while frame is not None:
+        if frame.f_globals.get('__name__') in KUBERNETES_API_MODULES:
+            name = frame.f_code.co_name
+            if not name.startswith('_'):
+                return name
+            helper = helper or name
+        frame = frame.f_back
+    return helper or 'other'
+
+
+def cache_access(cache, hit):
+    cache_requests.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+class timed_api_call:
+    """
+    Context manager for measuring a Kubernetes API server call.
+    The outcome is 'error' when the block raises an exception.
+    """
+
+    def __init__(self, method):
+        self.method = method
+        self.outcome = 'success'
+
+    def __enter__(self):
+        self.function = api_function()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.outcome == 'success':
+            self.outcome = 'error'
+        k8s_api_duration.labels(self.function, self.method).observe(time.perf_counter() - self.start)
+        k8s_api_calls.labels(self.function, self.method, self.outcome).inc()
+        return False
+
+
+def exposition():
+    """
+    Returns content type and text of the current metric values.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ or 'prometheus_multiproc_dir' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return CONTENT_TYPE_LATEST, generate_latest(registry)
@@ -2,8 +2,10 @@ from django.http import Http404
 from django.shortcuts import redirect
 from django.urls import reverse
 from kubeportal import settings
+from kubeportal import metrics
 from rest_framework.permissions import IsAuthenticated
 import logging
+import time
 
 logger = logging.getLogger('KubePortal')
 
@@ -33,6 +35,27 @@ class HideAdminForNonStaffMiddleware:
         return self.get_response(request)
 
 
+class MetricsMiddleware:
+    '''
+    Measures the duration of every request for the Prometheus metrics.
+
+    The URL name is used as label, not the path, so that the number of
+    time series stays small. Requests for unknown URLs are counted as 'unresolved'.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unresolved'
+        metrics.request_duration.labels(view, request.method, f"{response.status_code // 100}xx") \
+            .observe(time.perf_counter() - start)
+        return response
+
+
 class CorsMiddleware:
     '''
     After spending endless hours fighting CORS with Kat-Hi,
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kubeportal', '0012_approval_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClusterStatistic',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('resolution', models.CharField(choices=[('raw', 'raw'), ('hour', 'hourly'), ('day', 'daily')], default='raw', max_length=4)),
+                ('samples', models.IntegerField(default=1, help_text='Number of raw points this point stands for.')),
+                ('node_count', models.IntegerField(null=True)),
+                ('cpu_count', models.IntegerField(null=True)),
+                ('mem_sum', models.FloatField(null=True)),
+                ('pod_count', models.IntegerField(null=True)),
+                ('volume_count', models.IntegerField(null=True)),
+            ],
+            options={
+                'ordering': ['timestamp'],
+                'unique_together': {('resolution', 'timestamp')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kubeportal', '0013_cluster_statistic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KubernetesWatchState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, unique=True)),
+                ('resource_version', models.CharField(max_length=50, null=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kubeportal', '0014_kubernetes_watch_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncLease',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('holder', models.CharField(help_text='Identity of the process holding the lease.', max_length=255, null=True)),
+                ('expires', models.DateTimeField(null=True)),
+                ('last_run', models.DateTimeField(null=True)),
+                ('last_duration', models.FloatField(help_text='Duration of the last run in seconds.', null=True)),
+                ('last_result', models.BooleanField(null=True)),
+                ('last_holder', models.CharField(max_length=255, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def _duplicate_groups(model, *fields):
+    """
+    Yields lists of records sharing the same values in the given fields, oldest first.
+    """
+    duplicates = model.objects.exclude(**{f'{field}__isnull': True for field in fields}) \
+        .values(*fields).annotate(count=Count('id')).filter(count__gt=1)
+    for values in duplicates:
+        yield list(model.objects.filter(**{field: values[field] for field in fields}).order_by('pk'))
+
+
+def _merge(group, repoint):
+    """
+    Keeps the oldest record of the group, and deletes the others after
+    pointing their dependent records to the kept one.
+    """
+    keeper, duplicates = group[0], group[1:]
+    if keeper.uid is None:
+        keeper.uid = next((record.uid for record in duplicates if record.uid), None)
+    for record in duplicates:
+        repoint(record, keeper)
+        record.delete()
+    keeper.save()
+
+
+def remove_duplicates(apps, schema_editor):
+    # We can't import the models directly as they may be a newer
+    # version than this migration expects. We use the historical version.
+    KubernetesNamespace = apps.get_model('kubeportal', 'KubernetesNamespace')
+    KubernetesServiceAccount = apps.get_model('kubeportal', 'KubernetesServiceAccount')
+    User = apps.get_model('kubeportal', 'User')
+
+    def repoint_namespace(old, new):
+        KubernetesServiceAccount.objects.filter(namespace=old).update(namespace=new)
+
+    def repoint_service_account(old, new):
+        User.objects.filter(service_account=old).update(service_account=new)
+
+    for fields in [('uid',), ('name',)]:
+        for group in _duplicate_groups(KubernetesNamespace, *fields):
+            _merge(group, repoint_namespace)
+    # Merging namespaces may have produced more duplicated service accounts
+    for fields in [('uid',), ('namespace', 'name')]:
+        for group in _duplicate_groups(KubernetesServiceAccount, *fields):
+            _merge(group, repoint_service_account)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kubeportal', '0015_sync_lease'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+    ]
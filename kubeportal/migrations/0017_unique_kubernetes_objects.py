@@ -0,0 +1,32 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kubeportal', '0016_remove_duplicate_kubernetes_objects'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='kubernetesnamespace',
+            name='name',
+            field=models.CharField(help_text="Lower case alphanumeric characters or '-', and must start and end with an alphanumeric character (e.g. 'my-name', or '123-abc').", max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='kubernetesnamespace',
+            name='uid',
+            field=models.CharField(editable=False, max_length=50, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='kubernetesserviceaccount',
+            name='uid',
+            field=models.CharField(editable=False, max_length=50, null=True, unique=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='kubernetesserviceaccount',
+            unique_together={('namespace', 'name')},
+        ),
+    ]
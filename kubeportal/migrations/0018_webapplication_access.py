@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_access(apps, schema_editor):
+    # We can't import the models directly as they may be a newer
+    # version than this migration expects. We use the historical version.
+    WebApplication = apps.get_model('kubeportal', 'WebApplication')
+    WebApplicationAccess = apps.get_model('kubeportal', 'WebApplicationAccess')
+    pairs = WebApplication.objects.filter(portal_groups__members__isnull=False) \
+        .values_list('portal_groups__members__pk', 'pk').order_by().distinct()
+    WebApplicationAccess.objects.bulk_create([WebApplicationAccess(user_id=user_pk, webapp_id=webapp_pk)
+                                              for user_pk, webapp_pk in pairs], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kubeportal', '0017_unique_kubernetes_objects'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebApplicationAccess',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webapp_access', to=settings.AUTH_USER_MODEL)),
+                ('webapp', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_access', to='kubeportal.WebApplication')),
+            ],
+            options={
+                'unique_together': {('user', 'webapp')},
+            },
+        ),
+        migrations.RunPython(fill_access, migrations.RunPython.noop),
+    ]
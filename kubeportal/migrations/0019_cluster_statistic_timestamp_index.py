@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kubeportal', '0018_webapplication_access'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clusterstatistic',
+            index=models.Index(fields=['timestamp'], name='clusterstat_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kubeportal', '0019_cluster_statistic_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='synclease',
+            name='done',
+            field=models.IntegerField(default=0, help_text='Number of processed items in the current phase.'),
+        ),
+        migrations.AddField(
+            model_name='synclease',
+            name='phase',
+            field=models.CharField(help_text='Phase the running job is in.', max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='synclease',
+            name='total',
+            field=models.IntegerField(help_text='Number of items in the current phase, if known.', null=True),
+        ),
+    ]
@@ -133,13 +133,13 @@ class User(AbstractUser):
     def web_applications(self, include_invisible):
         """
         Returns a querset for the list of web applications allowed for this
-        user.
+        user, based on the materialized access table (see WebApplicationAccess).
         """
         from kubeportal.models.webapplication import WebApplication
         if include_invisible:
-            return WebApplication.objects.filter(portal_groups__members__pk=self.pk).distinct()
+            return WebApplication.objects.filter(user_access__user_id=self.pk)
         else:
-            return WebApplication.objects.filter(portal_groups__members__pk=self.pk, link_show=True).distinct()
+            return WebApplication.objects.filter(user_access__user_id=self.pk, link_show=True)
 
     def k8s_pods(self):
         """
@@ -183,8 +183,8 @@ class User(AbstractUser):
 
 
     def can_subauth(self, webapp):
-        user_groups_with_this_app = self.portal_groups.filter(can_web_applications__in=[webapp.pk])
-        allowed = user_groups_with_this_app.count() > 0
+        from kubeportal.models.webapplicationaccess import WebApplicationAccess
+        allowed = WebApplicationAccess.objects.filter(user_id=self.pk, webapp_id=webapp.pk).exists()
         if allowed:
             # Prevent event storm
             # logger.debug("Subauth allowed for app {} with user {} due to membership in groups".format(webapp, self))
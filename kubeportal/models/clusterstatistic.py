@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, TruncDay, TruncHour
+from django.utils import timezone
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+RAW = 'raw'
+HOUR = 'hour'
+DAY = 'day'
+
+# Raw points older than this are rolled up into hourly points,
+# hourly points older than this into daily ones.
+RAW_RETENTION = timedelta(days=2)
+HOUR_RETENTION = timedelta(days=90)
+
+# Statistic slug in the snapshot, and the according model field
+STAT_FIELDS = {'k8s_node_count': 'node_count',
+               'k8s_cpu_count': 'cpu_count',
+               'k8s_mem_sum': 'mem_sum',
+               'k8s_pod_count': 'pod_count',
+               'k8s_volume_count': 'volume_count'}
+
+TRUNC = {HOUR: TruncHour, DAY: TruncDay}
+
+
+def _weighted_averages():
+    """
+    Aggregates for the averages of all statistic fields, weighted by the
+    number of raw points each point stands for. Missing values are skipped.
+    """
+    return {field: ExpressionWrapper(
+                Cast(Sum(F(field) * F('samples'), output_field=FloatField()), FloatField()) /
+                Sum('samples', filter=Q(**{f'{field}__isnull': False})),
+                output_field=FloatField())
+            for field in STAT_FIELDS.values()}
+
+
+class ClusterStatistic(models.Model):
+    """
+    A point in the history of the cluster statistics.
+
+    Raw points are recorded from the statistics snapshot and later
+    rolled up into hourly and daily averages (see downsample()).
+    """
+    timestamp = models.DateTimeField()
+    resolution = models.CharField(max_length=4, default=RAW,
+                                  choices=[(RAW, 'raw'), (HOUR, 'hourly'), (DAY, 'daily')])
+    samples = models.IntegerField(default=1, help_text="Number of raw points this point stands for.")
+    node_count = models.IntegerField(null=True)
+    cpu_count = models.IntegerField(null=True)
+    mem_sum = models.FloatField(null=True)
+    pod_count = models.IntegerField(null=True)
+    volume_count = models.IntegerField(null=True)
+
+    class Meta:
+        unique_together = [('resolution', 'timestamp')]
+        # For the range queries over all resolutions in history()
+        indexes = [models.Index(fields=['timestamp'], name='clusterstat_timestamp_idx')]
+        ordering = ['timestamp']
+
+    def __str__(self):
+        return f"Cluster statistics ({self.resolution}) from {self.timestamp}"
+
+    @classmethod
+    def record(cls, stats, timestamp=None):
+        """
+        Stores the given statistics dictionary, as produced by kubeportal.k8s.stats, as raw point.
+        """
+        values = {field: stats.get(slug) for slug, field in STAT_FIELDS.items()}
+        return cls.objects.update_or_create(resolution=RAW, timestamp=timestamp or timezone.now(),
+                                            defaults=values)[0]
+
+    @classmethod
+    def _roll_up(cls, source, target, before):
+        """
+        Replaces all points of the source resolution in complete target
+        intervals before the given time by one averaged point per interval,
+        weighted by the number of samples.
+        Aggregation happens in the database.
+        """
+        trunc = TRUNC[target]
+        # Only complete intervals are rolled up
+        before = _truncate(before, target)
+        old_points = cls.objects.filter(resolution=source, timestamp__lt=before)
+        buckets = old_points.annotate(bucket=trunc('timestamp')).values('bucket') \
+            .annotate(total_samples=Sum('samples'), **_weighted_averages()) \
+            .order_by('bucket')
+        with transaction.atomic():
+            created = 0
+            for bucket in buckets:
+                timestamp = bucket.pop('bucket')
+                bucket['samples'] = bucket.pop('total_samples')
+                cls.objects.update_or_create(resolution=target, timestamp=timestamp, defaults=bucket)
+                created += 1
+            deleted, _ = old_points.delete()
+        if deleted:
+            logger.debug(f"Rolled up {deleted} {source} cluster statistics into {created} {target} points.")
+
+    @classmethod
+    def downsample(cls, now=None):
+        """
+        Rolls up old raw points into hourly ones, and old hourly points into daily ones.
+        """
+        now = now or timezone.now()
+        cls._roll_up(RAW, HOUR, now - RAW_RETENTION)
+        cls._roll_up(HOUR, DAY, now - HOUR_RETENTION)
+
+    @classmethod
+    def history(cls, start, end, resolution):
+        """
+        Returns the points between start and end as list of dictionaries.
+
+        For hourly or daily resolution, the finer points in the range
+        are averaged per interval by the database, weighted by their samples.
+        """
+        points = cls.objects.filter(timestamp__gte=start, timestamp__lte=end)
+        fields = list(STAT_FIELDS.values())
+        if resolution == RAW:
+            return list(points.filter(resolution=RAW).values('timestamp', *fields))
+        if resolution == HOUR:
+            points = points.filter(resolution__in=[RAW, HOUR])
+        buckets = points.annotate(bucket=TRUNC[resolution]('timestamp')).values('bucket') \
+            .annotate(**_weighted_averages()).order_by('bucket')
+        return [{'timestamp': bucket.pop('bucket'), **bucket} for bucket in buckets]
+
+
+def _truncate(timestamp, resolution):
+    # The database truncates in the current time zone, so do we
+    timestamp = timezone.localtime(timestamp).replace(minute=0, second=0, microsecond=0)
+    if resolution == DAY:
+        timestamp = timestamp.replace(hour=0)
+    return timestamp
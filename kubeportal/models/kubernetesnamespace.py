@@ -1,7 +1,8 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Count
 from kubeportal.k8s import kubernetes_api as api
+from kubeportal.k8s.sync_report import sync_phase
 import logging
 import re
 
@@ -16,9 +17,9 @@ class KubernetesNamespace(models.Model):
     A replication of namespaces known to the API server.
     """
     name = models.CharField(
-        max_length=100,
+        max_length=100, unique=True,
         help_text="Lower case alphanumeric characters or '-', and must start and end with an alphanumeric character (e.g. 'my-name', or '123-abc').")
-    uid = models.CharField(max_length=50, null=True, editable=False)
+    uid = models.CharField(max_length=50, null=True, unique=True, editable=False)
     visible = models.BooleanField(
         default=True, help_text='Visibility in admin interface. Can only be configured by a superuser.')
 
@@ -43,17 +44,8 @@ class KubernetesNamespace(models.Model):
         Returns a list of namespaces without pods.
         """
         visible_namespaces = cls.objects.filter(visible=True)
-        namespaces_without_pods = []
-        pod_list = api.get_pods()
-        for ns in visible_namespaces:
-            ns_has_pods = False
-            for pod in pod_list:
-                if pod.metadata.namespace == ns.name:
-                    ns_has_pods = True
-                    break
-            if not ns_has_pods:
-                namespaces_without_pods.append(ns)
-        return namespaces_without_pods
+        namespaces_with_pods = {pod.metadata.namespace for pod in api.iter_pods()}
+        return [ns for ns in visible_namespaces if ns.name not in namespaces_with_pods]
 
     def get_pod_uids(self):
         """
@@ -91,55 +83,126 @@ class KubernetesNamespace(models.Model):
         """
         Scans the Kubernetes cluster for namespaces that have no representation
         as KubernetesNamespace object, and creates the latter accordingly.
+
+        The check is a set difference of the cluster and portal UIDs,
+        so the database is queried once, regardless of the number of namespaces.
         """
         try:
-            k8s_ns_list = api.get_namespaces()
-            if k8s_ns_list:
-                for k8s_ns in k8s_ns_list:
-                    k8s_ns_name, k8s_ns_uid = k8s_ns.metadata.name, k8s_ns.metadata.uid
-                    # First calling exists(), and creating it in case, is faster than get_or_create() 
-                    # but may impose an extremely small danger of race conditions.
-                    # We trade performance for reliability here. 
-                    if not cls.objects.filter(name=k8s_ns_name, uid=k8s_ns_uid).exists():
+            with sync_phase("namespaces missing in portal") as report:
+                k8s_namespaces = {k8s_ns.metadata.uid: k8s_ns.metadata.name for k8s_ns in api.iter_namespaces()}
+                portal_namespaces = cls.objects.values_list('pk', 'name', 'uid')
+                portal_uids = {uid for pk, name, uid in portal_namespaces if uid}
+                portal_pks = {name: pk for pk, name, uid in portal_namespaces}
+                new_objs, adopted = [], {}
+                for k8s_ns_uid in k8s_namespaces.keys() - portal_uids:
+                    k8s_ns_name = k8s_namespaces[k8s_ns_uid]
+                    if k8s_ns_name in portal_pks:
+                        # Created in the portal, or re-created in the cluster under the same name
+                        logger.info(f"Found Kubernetes namespace {k8s_ns_name} with new UID, updating record.")
+                        adopted[portal_pks[k8s_ns_name]] = k8s_ns_uid
+                    else:
                         logger.info(f"Found new Kubernetes namespace {k8s_ns_name}, creating record.")
-                        new_obj = cls(name=k8s_ns_name, uid=k8s_ns_uid)
-                        if k8s_ns_name in HIDDEN_NAMESPACES:
-                            new_obj.visible = False
-                        else:
-                            new_obj.visible = True
-                        new_obj.save()
-            return  True
+                        new_objs.append(cls(name=k8s_ns_name, uid=k8s_ns_uid,
+                                            visible=k8s_ns_name not in HIDDEN_NAMESPACES))
+                if new_objs or adopted:
+                    with transaction.atomic():
+                        for pk, uid in adopted.items():
+                            cls.objects.filter(pk=pk).update(uid=uid)
+                        cls.objects.bulk_create(new_objs)
+                report['created'] = len(new_objs)
+                report['updated'] = len(adopted)
+            return True
         except Exception as e:
             logger.exception(f"Syncing new cluster namespaces into the portal failed.")
             return False
 
 
     @classmethod
-    def create_missing_in_cluster(cls):
+    def create_missing_in_cluster(cls, progress=None):
         """
         Scans the portal database for namespaces that have no representation
         in the Kubernetes cluster, and creates the latter accordingly.
+
+        The optional progress function is called with phase name, number
+        of processed and total number of namespaces to be created.
         """
         try:
-            # Create a list of cluster namespace UIDs that already exist
-            k8s_ns_uid_list = [k8s_ns.metadata.uid for k8s_ns in api.get_namespaces()]
-
-            # Scan portal namespace entries
-            for portal_ns in cls.objects.all():
-                if portal_ns.uid:
-                    # Portal namespace records with UID must be given in K8S, or they are stale und should be deleted
-                    if portal_ns.uid not in k8s_ns_uid_list:
-                        logger.warning(f"Removing stale portal record for Kubernetes namespace '{portal_ns.name}'")
-                        portal_ns.delete()
-                else:
-                    # Portal namespace records without UID are new and should be created in K8S
-                    logger.debug(f"Namespace record {portal_ns.name} has no UID, creating it in Kubernetes ...")
-                    portal_ns.create_in_cluster() # ignore success, continue sync in any case
+            with sync_phase("namespaces missing in cluster") as report:
+                # Create a set of cluster namespace UIDs that already exist
+                k8s_ns_uids = {k8s_ns.metadata.uid for k8s_ns in api.iter_namespaces()}
+                portal_namespaces = dict(cls.objects.exclude(uid=None).values_list('uid', 'name'))
+
+                # Portal namespace records with UID must be given in K8S, or they are stale und should be deleted
+                stale_uids = portal_namespaces.keys() - k8s_ns_uids
+                for uid in stale_uids:
+                    logger.warning(f"Removing stale portal record for Kubernetes namespace '{portal_namespaces[uid]}'")
+                if stale_uids:
+                    with transaction.atomic():
+                        cls.objects.filter(uid__in=stale_uids).delete()
+                report['deleted'] = len(stale_uids)
+
+                # Portal namespace records without UID are new and should be created in K8S
+                report['created'], report['failed'] = cls._create_all_in_cluster(
+                    cls.objects.filter(uid=None), progress)
             return True
         except Exception as e:
             logger.exception(f"Syncing new portal namespaces into the cluster failed.")
             return False
 
+    @classmethod
+    def _create_all_in_cluster(cls, new_namespaces, progress=None):
+        """
+        Creates the given namespace records in the cluster, with parallel API calls.
+        Database updates happen in the calling thread.
+        Returns the number of created and failed namespaces. Failures are logged.
+        """
+        prepared = []
+        failed = 0
+        # Names taken by this batch, the database does not know them yet
+        claimed = set()
+        for portal_ns in new_namespaces:
+            logger.debug(f"Namespace record {portal_ns.name} has no UID, creating it in Kubernetes ...")
+            if not portal_ns._sanitize_name():
+                failed += 1
+            elif portal_ns.name in claimed:
+                logger.error(f"Could not create namespace in the cluster, sanitized name '{portal_ns.name}' "
+                             f"is already used by another new namespace.")
+                failed += 1
+            else:
+                claimed.add(portal_ns.name)
+                prepared.append((portal_ns,))
+
+        created = 0
+        for (portal_ns,), k8s_ns, error in api.call_in_parallel(lambda ns: api.create_k8s_ns(ns.name), prepared):
+            if error:
+                logger.error(f"Creation of portal namespace {portal_ns.name} in cluster failed: {error}")
+                failed += 1
+            else:
+                portal_ns.uid = k8s_ns.metadata.uid
+                portal_ns.save()
+                created += 1
+            if progress:
+                progress("namespaces", created + failed, len(prepared))
+        return created, failed
+
+
+    def _sanitize_name(self):
+        """
+        Replaces the namespace name with a valid DNS name, K8S allows nothing else.
+        Returns False when this is not possible.
+        """
+        sanitized_name = re.sub('[^a-zA-Z0-9]', '', self.name).lower()
+        if sanitized_name != self.name:
+            logger.warning(
+                f"Given name '{self.name}' for Kubernetes namespace is invalid, replacing it with '{sanitized_name}'")
+            if not KubernetesNamespace.objects.filter(name=sanitized_name).exists():
+                self.name = sanitized_name
+            else:
+                logger.error(
+                    f"Could not create namespace in the cluster, sanitized name '{sanitized_name}' already exists.")
+                return False
+        return True
+
 
     def create_in_cluster(self):
         """
@@ -149,18 +212,9 @@ class KubernetesNamespace(models.Model):
         """
         logger.debug(f"Creating namespace '{self.name}' in cluster ...")
         try:
-            sanitized_name = re.sub('[^a-zA-Z0-9]', '', self.name).lower()
-            if sanitized_name != self.name:
-                logger.warning(
-                    f"Given name '{self.name}' for Kubernetes namespace is invalid, replacing it with '{sanitized_name}'")
-                if sanitized_name not in KubernetesNamespace.objects.all():
-                    self.name = sanitized_name
-                else:
-                    logger.error(
-                        f"Could not create namespace in the cluster, sanitized name '{sanitized_name}' already exists.")
-                    return False
-
-            created_k8s_ns = api.create_k8s_ns(sanitized_name)
+            if not self._sanitize_name():
+                return False
+            created_k8s_ns = api.create_k8s_ns(self.name)
             self.uid = created_k8s_ns.metadata.uid
             self.save()
             return True
@@ -204,11 +258,3 @@ class KubernetesNamespace(models.Model):
             logger.debug(f"Could not find namespace {k8s_ns_name} in portal, triggering sync before next attempt.")
             cls.create_missing_in_portal()
             return cls.objects.get(name=k8s_ns_name)
-        except cls.MultipleObjectsReturned:
-            # We saw that happen in practice, reasons are still unclear.
-            logger.error(f"Portal database entries for namespace {k8s_ns_name} are duplicated. Deleting all but the oldest one...")
-            while cls.objects.filter(name=k8s_ns_name).count() > 1:
-                candidate = cls.objects.filter(name=k8s_ns_name).order_by('-pk')[0]
-                logger.error(f"Deleting record {candidate.pk}. Impacted service accounts: {candidate.service_accounts}")
-                candidate.delete()
-            return cls.objects.get(name=k8s_ns_name)
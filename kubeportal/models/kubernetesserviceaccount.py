@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 
 from kubeportal.models.kubernetesnamespace import KubernetesNamespace
 from kubeportal.k8s import kubernetes_api as api
+from kubeportal.k8s.sync_report import sync_phase
 
 import logging
 
@@ -14,10 +15,13 @@ class KubernetesServiceAccount(models.Model):
     """
     name = models.CharField(
         max_length=100, help_text="Lower case alphanumeric characters or '-', and must start and end with an alphanumeric character (e.g. 'my-name', or '123-abc').")
-    uid = models.CharField(max_length=50, null=True, editable=False)
+    uid = models.CharField(max_length=50, null=True, unique=True, editable=False)
     namespace = models.ForeignKey(
         KubernetesNamespace, related_name="service_accounts", on_delete=models.CASCADE)
 
+    class Meta:
+        unique_together = [('namespace', 'name')]
+
     def is_synced(self):
         return self.uid is not None
 
@@ -32,49 +36,101 @@ class KubernetesServiceAccount(models.Model):
         """
         Scans the Kubernetes cluster for service accounts that have no representation
         as KubernetesServiceAccount object, and creates the latter accordingly.
+
+        The check is a set difference of the cluster and portal UIDs,
+        so the database is queried once, regardless of the number of service accounts.
         """
         try:
-            k8s_svca_list = api.get_service_accounts()
-            if k8s_svca_list:
-                for k8s_svca in k8s_svca_list:
-                    # First calling exists(), and creating it in case, is faster than get_or_create() 
-                    # but may impose an extremely small danger of race conditions.
-                    # We trade performance for reliability here. 
-                    if not cls.objects.filter(name=k8s_svca.metadata.name, uid=k8s_svca.metadata.uid).exists():
-                        logger.info(f"Found new Kubernetes service account {k8s_svca.metadata.name}, creating record.")
-                        ns = KubernetesNamespace.get_or_sync(k8s_svca.metadata.namespace)
-                        new_obj = cls(name=k8s_svca.metadata.name, uid=k8s_svca.metadata.uid, namespace=ns)
-                        new_obj.save()
-            return  True
+            with sync_phase("service accounts missing in portal") as report:
+                k8s_svcas = {k8s_svca.metadata.uid: (k8s_svca.metadata.namespace, k8s_svca.metadata.name)
+                             for k8s_svca in api.iter_service_accounts()}
+                portal_svcas = cls.objects.values_list('pk', 'namespace_id', 'name', 'uid')
+                portal_uids = {uid for pk, namespace_id, name, uid in portal_svcas if uid}
+                portal_pks = {(namespace_id, name): pk for pk, namespace_id, name, uid in portal_svcas}
+                new_uids = k8s_svcas.keys() - portal_uids
+
+                namespaces = cls._namespace_pks() if new_uids else {}
+                if any(k8s_svcas[uid][0] not in namespaces for uid in new_uids):
+                    logger.debug("Some namespaces of new service accounts are not in the portal, triggering namespace sync.")
+                    KubernetesNamespace.create_missing_in_portal()
+                    namespaces = cls._namespace_pks()
+
+                new_objs, adopted = [], {}
+                for uid in new_uids:
+                    namespace, name = k8s_svcas[uid]
+                    if namespace not in namespaces:
+                        logger.error(f"Namespace {namespace} of new service account {name} is unknown, skipping it.")
+                        continue
+                    key = (namespaces[namespace], name)
+                    if key in portal_pks:
+                        # Created in the portal, or re-created in the cluster under the same name
+                        logger.info(f"Found Kubernetes service account {name} with new UID, updating record.")
+                        adopted[portal_pks[key]] = uid
+                    else:
+                        logger.info(f"Found new Kubernetes service account {name}, creating record.")
+                        new_objs.append(cls(name=name, uid=uid, namespace_id=namespaces[namespace]))
+                if new_objs or adopted:
+                    with transaction.atomic():
+                        for pk, uid in adopted.items():
+                            cls.objects.filter(pk=pk).update(uid=uid)
+                        cls.objects.bulk_create(new_objs)
+                report['created'] = len(new_objs)
+                report['updated'] = len(adopted)
+            return True
         except Exception as e:
             logger.exception(f"Syncing new cluster service accounts into the portal failed.")
             return False
 
+    @staticmethod
+    def _namespace_pks():
+        """
+        Returns a dictionary of namespace names and primary keys of their portal records.
+        """
+        return dict(KubernetesNamespace.objects.values_list('name', 'pk'))
+
 
     @classmethod
-    def create_missing_in_cluster(cls):
+    def create_missing_in_cluster(cls, progress=None):
         """
         Scans the portal database for service accounts that have no representation
         in the Kubernetes cluster, and creates the latter accordingly.
+
+        The optional progress function is called with phase name, number
+        of processed and total number of service accounts to be created.
         """
         try:
-            # Create a list of cluster service account UIDs that already exist
-            k8s_svca_uid_list = [k8s_svca.metadata.uid for k8s_svca in api.get_service_accounts()]
-
-            # Scan portal service account entries
-            for portal_svca in cls.objects.all():
-                if portal_svca.uid:
-                    # Portal records with UID must be given in K8S, or they are stale und should be deleted
-                    if portal_svca.uid not in k8s_svca_uid_list:
-                        logger.warning(f"Removing stale service account record '{portal_svca.namespace.name}:{portal_svca.name}'")
-                        portal_svca.delete()
-                else:
-                    # Portal records without UID are new and should be created in K8S
-                    logger.debug(f"Service account record '{portal_svca.namespace.name}:{portal_svca.name}' has no UID, creating it in the cluster ...")
-                    portal_svca.create_in_cluster()
+            with sync_phase("service accounts missing in cluster") as report:
+                # Create a set of cluster service account UIDs that already exist
+                k8s_svca_uids = {k8s_svca.metadata.uid for k8s_svca in api.iter_service_accounts()}
+                portal_svcas = {uid: f"{namespace}:{name}" for uid, namespace, name in
+                                cls.objects.exclude(uid=None).values_list('uid', 'namespace__name', 'name')}
+
+                # Portal records with UID must be given in K8S, or they are stale und should be deleted
+                stale_uids = portal_svcas.keys() - k8s_svca_uids
+                for uid in stale_uids:
+                    logger.warning(f"Removing stale service account record '{portal_svcas[uid]}'")
+                if stale_uids:
+                    with transaction.atomic():
+                        cls.objects.filter(uid__in=stale_uids).delete()
+                report['deleted'] = len(stale_uids)
+
+                # Portal records without UID are new and should be created in K8S, with parallel API calls
+                new_svcas = [(portal_svca,) for portal_svca in cls.objects.filter(uid=None).select_related('namespace')]
+                report['created'] = report['failed'] = 0
+                for (portal_svca,), k8s_svca, error in api.call_in_parallel(
+                        lambda svca: api.create_k8s_svca(namespace=svca.namespace.name, name=svca.name), new_svcas):
+                    if error:
+                        logger.error(f"Creation of service account '{portal_svca}' in cluster failed: {error}")
+                        report['failed'] += 1
+                    else:
+                        portal_svca.uid = k8s_svca.metadata.uid
+                        portal_svca.save()
+                        report['created'] += 1
+                    if progress:
+                        progress("service accounts", report['created'] + report['failed'], len(new_svcas))
             return True
         except Exception as e:
-            logger.exception(f"Syncing new portal namespaces into the cluster failed.")
+            logger.exception(f"Syncing new portal service accounts into the cluster failed.")
             return False
 
 
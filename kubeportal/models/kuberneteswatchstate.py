@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class KubernetesWatchState(models.Model):
+    """
+    The last resource version seen by the watch of a resource type,
+    so that a restarted watch can resume where it stopped.
+    """
+    kind = models.CharField(max_length=50, unique=True)
+    resource_version = models.CharField(max_length=50, null=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Watch state for {self.kind}"
@@ -0,0 +1,22 @@
+from django.db import models
+
+
+class SyncLease(models.Model):
+    """
+    Database lease for electing the one portal replica that runs a background job,
+    together with the progress of the current and the outcome of the last run.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    holder = models.CharField(max_length=255, null=True,
+                              help_text="Identity of the process holding the lease.")
+    expires = models.DateTimeField(null=True)
+    last_run = models.DateTimeField(null=True)
+    last_duration = models.FloatField(null=True, help_text="Duration of the last run in seconds.")
+    last_result = models.BooleanField(null=True)
+    last_holder = models.CharField(max_length=255, null=True)
+    phase = models.CharField(max_length=100, null=True, help_text="Phase the running job is in.")
+    done = models.IntegerField(default=0, help_text="Number of processed items in the current phase.")
+    total = models.IntegerField(null=True, help_text="Number of items in the current phase, if known.")
+
+    def __str__(self):
+        return f"Lease for {self.name}"
@@ -0,0 +1,106 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models, transaction
+
+from kubeportal.models.webapplication import WebApplication
+
+import logging
+
+logger = logging.getLogger('KubePortal')
+
+# Maximum number of users in one IN clause, below the SQLite variable limit
+CHUNK_SIZE = 500
+
+
+def _chunks(pks):
+    pks = sorted(pks)
+    for start in range(0, len(pks), CHUNK_SIZE):
+        yield pks[start:start + CHUNK_SIZE]
+
+
+def _granted_pairs(user_pks=None):
+    """
+    Returns the set of (user pk, web application pk) pairs that the
+    group memberships currently allow, optionally only for the given users.
+    """
+    # One filter() call, so that values_list() uses the same join
+    if user_pks is None:
+        filters = [{'portal_groups__members__isnull': False}]
+    else:
+        filters = [{'portal_groups__members__pk__in': chunk} for chunk in _chunks(user_pks)]
+    pairs = set()
+    for kwargs in filters:
+        pairs.update(WebApplication.objects.filter(**kwargs)
+                     .values_list('portal_groups__members__pk', 'pk').order_by().distinct())
+    return pairs
+
+
+class WebApplicationAccess(models.Model):
+    """
+    Materialized access of a user to a web application.
+
+    Access is granted through the web applications of the user's groups.
+    This table contains one row per allowed (user, web application) pair,
+    so that access checks need no join over the group relations. It is
+    maintained by the signal handlers in kubeportal/signals.py, and can be
+    rebuilt with the 'rebuild_webapp_access' management command.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='webapp_access')
+    webapp = models.ForeignKey(WebApplication, on_delete=models.CASCADE, related_name='user_access')
+
+    class Meta:
+        unique_together = [('user', 'webapp')]
+
+    def __str__(self):
+        return f"Access of user {self.user_id} to web application {self.webapp_id}"
+
+    @classmethod
+    def _apply(cls, expected, existing):
+        missing = expected - existing
+        extra = existing - expected
+        if not missing and not extra:
+            return
+        with transaction.atomic():
+            extra_users = defaultdict(set)
+            for user_pk, webapp_pk in extra:
+                extra_users[webapp_pk].add(user_pk)
+            for webapp_pk, user_pks in extra_users.items():
+                for chunk in _chunks(user_pks):
+                    cls.objects.filter(webapp_id=webapp_pk, user_id__in=chunk).delete()
+            cls.objects.bulk_create([cls(user_id=user_pk, webapp_id=webapp_pk) for user_pk, webapp_pk in missing],
+                                    ignore_conflicts=True, batch_size=CHUNK_SIZE)
+        logger.debug(f"Web application access: {len(missing)} pairs added, {len(extra)} removed.")
+
+    @classmethod
+    def refresh(cls, user_pks):
+        """
+        Brings the rows of the given users in line with their group memberships.
+        """
+        user_pks = set(user_pks)
+        if not user_pks:
+            return
+        existing = set()
+        for chunk in _chunks(user_pks):
+            existing.update(cls.objects.filter(user_id__in=chunk).values_list('user_id', 'webapp_id'))
+        cls._apply(_granted_pairs(user_pks), existing)
+
+    @classmethod
+    def verify(cls):
+        """
+        Compares the whole table with the group memberships.
+        Returns a tuple of the sets of missing and extra (user pk, web application pk) pairs.
+        """
+        expected = _granted_pairs()
+        existing = set(cls.objects.values_list('user_id', 'webapp_id'))
+        return expected - existing, existing - expected
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Recreates the whole table from the group memberships.
+        """
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([cls(user_id=user_pk, webapp_id=webapp_pk)
+                                     for user_pk, webapp_pk in _granted_pairs()], batch_size=1000)
@@ -1,15 +1,15 @@
 from django.core.exceptions import PermissionDenied
 import logging
 
+from kubeportal import access
+
 logger = logging.getLogger('KubePortal')
 
 
 def permission_check(user, client):
-    for group in user.portal_groups.all():
-        for app in group.can_web_applications.all():
-            if app.oidc_client == client:
-                logger.debug("Access for user {0} through client {1} accepted".format(user, client))
-                return None   # allowed
+    if client.pk in access.allowed_oidc_clients(user):
+        logger.debug("Access for user {0} through client {1} accepted".format(user, client))
+        return None   # allowed
     logger.debug("Access for user {0} through client {1} denied".format(user, client))
     raise PermissionDenied    # not allowed
 
@@ -13,11 +13,17 @@ class Common(Configuration):
 
     SECRET_KEY = get_secret_key()
 
-    CACHES = {
-        'default': {
-            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+    CACHE_BACKEND = values.Value('django.core.cache.backends.locmem.LocMemCache', environ_prefix='KUBEPORTAL')
+    CACHE_LOCATION = values.Value('', environ_prefix='KUBEPORTAL')
+
+    @property
+    def CACHES(self):
+        return {
+            'default': {
+                'BACKEND': self.CACHE_BACKEND,
+                'LOCATION': self.CACHE_LOCATION
+            }
         }
-    }
 
     INSTALLED_APPS = [
         'django.contrib.sites',
@@ -47,6 +53,7 @@ class Common(Configuration):
     ]
 
     MIDDLEWARE = [
+        'kubeportal.middleware.MetricsMiddleware',
         'silk.middleware.SilkyMiddleware',
         'kubeportal.middleware.CorsMiddleware',
         'django.middleware.csrf.CsrfViewMiddleware',
@@ -169,6 +176,16 @@ class Common(Configuration):
     }
     OIDC_IDTOKEN_INCLUDE_CLAIMS = True  # include user email etc. in token
     SESSION_COOKIE_DOMAIN = values.Value(None, environ_prefix='KUBEPORTAL')
+
+    @property
+    def SESSION_ENGINE(self):
+        # Reading sessions from the cache (see kubeportal.subauth_app) is only safe when
+        # all worker processes share it, otherwise a logout would reach only one of them
+        if self.CACHES['default']['BACKEND'] in ('django.core.cache.backends.locmem.LocMemCache',
+                                                 'django.core.cache.backends.dummy.DummyCache'):
+            return 'django.contrib.sessions.backends.db'
+        return 'django.contrib.sessions.backends.cached_db'
+
     NAMESPACE_CLUSTERROLES = values.ListValue([], environ_prefix='KUBEPORTAL')
 
     API_SERVER_EXTERNAL = values.Value(None, environ_prefix='KUBEPORTAL')
@@ -192,6 +209,23 @@ class Common(Configuration):
 
     LAST_LOGIN_MONTHS_AGO = values.Value(12, environ_prefix='KUBEPORTAL')
 
+    USER_CLIENT_CACHE_SIZE = values.IntegerValue(500, environ_prefix='KUBEPORTAL')
+    USER_CLIENT_CACHE_TTL = values.IntegerValue(300, environ_prefix='KUBEPORTAL')
+    TOKEN_CACHE_TTL = values.IntegerValue(600, environ_prefix='KUBEPORTAL')
+    TOKEN_CACHE_WATCH = values.BooleanValue(True, environ_prefix='KUBEPORTAL')
+    INFORMERS_ENABLED = values.BooleanValue(False, environ_prefix='KUBEPORTAL')
+    LIST_PAGE_SIZE = values.IntegerValue(500, environ_prefix='KUBEPORTAL')
+    API_READ_TIMEOUT = values.IntegerValue(10, environ_prefix='KUBEPORTAL')
+    API_WRITE_TIMEOUT = values.IntegerValue(30, environ_prefix='KUBEPORTAL')
+    API_READ_RETRIES = values.IntegerValue(2, environ_prefix='KUBEPORTAL')
+    API_BREAKER_ERROR_RATE = values.FloatValue(0.5, environ_prefix='KUBEPORTAL')
+    API_BREAKER_COOLDOWN = values.IntegerValue(30, environ_prefix='KUBEPORTAL')
+    STATS_REFRESH_INTERVAL = values.IntegerValue(60, environ_prefix='KUBEPORTAL')
+    SYNC_INTERVAL = values.IntegerValue(0, environ_prefix='KUBEPORTAL')
+    SYNC_CREATE_WORKERS = values.IntegerValue(8, environ_prefix='KUBEPORTAL')
+    SUBAUTH_CACHE_TTL = values.IntegerValue(60, environ_prefix='KUBEPORTAL')
+    SUBAUTH_TICKET_LIFETIME = values.IntegerValue(0, environ_prefix='KUBEPORTAL')
+
     TINYMCE_DEFAULT_CONFIG = {'statusbar': False, 'menubar': False, 'plugins': ['link', 'lists' ],
                               'toolbar': 'undo redo | cut copy paste | bold italic subscript superscript | removeformat | bullist numlist | link unlink'}
 
@@ -1,11 +1,20 @@
-from django.db.models.signals import post_save, m2m_changed
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import Permission
+from django.contrib.auth.signals import user_logged_out
 
 import logging
 
+from oidc_provider.models import Client
+
+from kubeportal import access
 from kubeportal.models.portalgroup import PortalGroup
+from kubeportal.models.kubernetesnamespace import KubernetesNamespace
+from kubeportal.models.kubernetesserviceaccount import KubernetesServiceAccount
+from kubeportal.models.webapplication import WebApplication
+from kubeportal.models.webapplicationaccess import WebApplicationAccess
 from kubeportal.models import User
+from kubeportal.k8s.clients import user_clients
 
 logger = logging.getLogger('KubePortal')
 
@@ -37,6 +46,31 @@ def _set_staff_status(user):
         all_perms = Permission.objects.all()
         user.user_permissions.add(*all_perms)
 
+@receiver(pre_save, sender=User)
+def handle_user_pre_change(sender, instance, raw, **kwargs):
+    '''
+    Drop the cached Kubernetes API client of a user when the service account
+    or the approval state changes. The cache is keyed by the service account UID,
+    so the old service account must be determined before the change is stored.
+    '''
+    if raw or instance.pk is None:
+        return
+    old = User.objects.filter(pk=instance.pk).values('service_account_id', 'service_account__uid', 'state').first()
+    if old is None:
+        return
+    if old['service_account_id'] != instance.service_account_id or old['state'] != instance.state:
+        logger.debug(f"Kubernetes access of user {instance} changed, dropping cached API client.")
+        user_clients.evict(old['service_account__uid'])
+
+
+@receiver(post_delete, sender=KubernetesServiceAccount)
+def handle_service_account_delete(sender, instance, **kwargs):
+    '''
+    Drop the cached Kubernetes API client for a removed service account.
+    '''
+    user_clients.evict(instance.uid)
+
+
 @receiver(post_save, sender=User)
 def handle_user_change(sender, instance, created, **kwargs):
     '''
@@ -97,3 +131,116 @@ def handle_group_change(sender, instance, created, **kwargs):
         for user in instance.members.all():
             _set_staff_status(user)
 
+
+
+@receiver(m2m_changed, sender=User.portal_groups.through)
+def handle_group_members_webapp_access(instance, action, pk_set, reverse, **kwargs):
+    '''
+    Update the materialized web application access of users joining or leaving groups.
+    '''
+    if action in ["post_add", "post_remove"]:
+        WebApplicationAccess.refresh(pk_set if reverse else [instance.pk])
+    elif action == "post_clear":
+        if reverse:
+            # The former members are gone, but still have their access rows
+            WebApplicationAccess.refresh(WebApplicationAccess.objects.filter(
+                webapp__in=instance.can_web_applications.all()).values_list('user_id', flat=True))
+        else:
+            WebApplicationAccess.refresh([instance.pk])
+
+
+@receiver(m2m_changed, sender=PortalGroup.can_web_applications.through)
+def handle_group_webapps_webapp_access(instance, action, pk_set, reverse, **kwargs):
+    '''
+    Update the materialized web application access when web applications are assigned to groups.
+    '''
+    if action in ["post_add", "post_remove"]:
+        if reverse:
+            users = User.objects.filter(portal_groups__pk__in=pk_set)
+        else:
+            users = instance.members.all()
+        WebApplicationAccess.refresh(users.values_list('pk', flat=True))
+    elif action == "post_clear":
+        if reverse:
+            users = WebApplicationAccess.objects.filter(webapp=instance).values_list('user_id', flat=True)
+        else:
+            users = instance.members.values_list('pk', flat=True)
+        WebApplicationAccess.refresh(users)
+
+
+@receiver(pre_delete, sender=PortalGroup)
+def handle_group_delete_webapp_access(sender, instance, **kwargs):
+    '''
+    Remember the members of a deleted group, the relation is gone afterwards.
+    '''
+    instance._former_member_pks = list(instance.members.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=PortalGroup)
+def handle_group_deleted_webapp_access(sender, instance, **kwargs):
+    '''
+    Update the materialized web application access of the members of a deleted group.
+    '''
+    WebApplicationAccess.refresh(getattr(instance, '_former_member_pks', []))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def handle_user_access_change(sender, instance, **kwargs):
+    '''
+    Drop the cached access decisions of a changed user,
+    e.g. because of a new service account or approval state.
+    '''
+    access.invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def handle_user_logout(sender, user, **kwargs):
+    '''
+    Revoke the sub-authentication tickets of a user that logged out.
+    '''
+    if user is not None:
+        access.invalidate_user(user.pk)
+
+
+@receiver(m2m_changed, sender=User.portal_groups.through)
+def handle_group_members_access_change(instance, action, pk_set, reverse, **kwargs):
+    '''
+    Drop the cached access decisions of users joining or leaving groups.
+    '''
+    if action not in ["post_add", "post_remove", "post_clear"]:
+        return
+    if not reverse:
+        access.invalidate_user(instance.pk)
+    elif pk_set:
+        for user_pk in pk_set:
+            access.invalidate_user(user_pk)
+    else:
+        # Cleared group, the former members are unknown
+        access.invalidate_all()
+
+
+@receiver(m2m_changed, sender=PortalGroup.can_web_applications.through)
+def handle_group_webapps_change(action, **kwargs):
+    '''
+    Drop all cached access decisions when web applications are assigned to groups.
+    '''
+    if action in ["post_add", "post_remove", "post_clear"]:
+        access.invalidate_all()
+
+
+@receiver(post_save, sender=PortalGroup)
+@receiver(post_delete, sender=PortalGroup)
+@receiver(post_save, sender=WebApplication)
+@receiver(post_delete, sender=WebApplication)
+@receiver(post_save, sender=KubernetesServiceAccount)
+@receiver(post_delete, sender=KubernetesServiceAccount)
+@receiver(post_delete, sender=KubernetesNamespace)
+@receiver(post_delete, sender=Client)
+def handle_access_change(sender, instance, **kwargs):
+    '''
+    Drop all cached sub-authentication decisions and OIDC client sets when groups,
+    web applications, OIDC clients or service accounts change.
+    This is rare, so there is no need to be more specific.
+    '''
+    access.invalidate_all()
@@ -0,0 +1,85 @@
+"""
+    Fast path for the sub-authentication endpoint.
+
+    Ingress-nginx calls /subauthreq/<webapp_pk>/ for every single request to
+    a protected web application. This WSGI application answers these calls
+    directly from a ticket cookie, or from the session store and the decision
+    cache (see kubeportal.access), without URL resolution and the Django
+    middleware stack.
+
+    Everything it cannot answer from the caches, such as a first request or
+    an unknown session, is passed on to the regular Django application. The
+    SubAuthRequestView there makes the decision and fills the cache.
+"""
+
+import re
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, HASH_SESSION_KEY
+from django.db import close_old_connections
+from django.http import parse_cookie
+
+from kubeportal import access, metrics
+
+PATH = re.compile(r'^/subauthreq/(?P<webapp_pk>[0-9]+)/$')
+
+
+class SubAuthApplication:
+    """
+    WSGI application that wraps the Django application.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.session_store = import_module(settings.SESSION_ENGINE).SessionStore
+
+    def _cached_decision(self, cookies, webapp_pk):
+        session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+        if not session_key:
+            return None
+        # One primary key lookup, or none with a shared cache for the sessions
+        close_old_connections()
+        try:
+            session = self.session_store(session_key)
+            user_id = session.get(SESSION_KEY)
+            if user_id is None:
+                return None
+            decision = access.get_subauth_decision(user_id, webapp_pk)
+            if decision and decision['session_hash'] == session.get(HASH_SESSION_KEY):
+                return decision
+            return None
+        finally:
+            close_old_connections()
+
+    def __call__(self, environ, start_response):
+        match = PATH.match(environ.get('PATH_INFO', ''))
+        if not match or environ.get('REQUEST_METHOD') != 'GET':
+            return self.application(environ, start_response)
+
+        start = time.perf_counter()
+        webapp_pk = int(match.group('webapp_pk'))
+        cookies = parse_cookie(environ.get('HTTP_COOKIE', ''))
+        token = access.ticket_token(cookies.get(access.TICKET_COOKIE_NAME), webapp_pk)
+        if token:
+            decision = {'allowed': True, 'reason': 'ticket', 'token': token}
+        else:
+            decision = self._cached_decision(cookies, webapp_pk)
+        if decision is None:
+            return self.application(environ, start_response)
+
+        metrics.subauth_decisions.labels('allowed' if decision['allowed'] else 'denied',
+                                         decision['reason']).inc()
+        if decision['allowed']:
+            status = '200 OK'
+            headers = [('Authorization', 'Bearer ' + decision['token'])]
+        else:
+            # 401 is the expected fail code in ingress-nginx
+            status = '401 Unauthorized'
+            headers = []
+        headers += [('Content-Type', 'text/html; charset=utf-8'), ('Content-Length', '0')]
+        start_response(status, headers)
+        metrics.request_duration.labels('subauthreq', 'GET', status[0] + 'xx') \
+            .observe(time.perf_counter() - start)
+        return [b'']
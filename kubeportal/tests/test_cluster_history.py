@@ -0,0 +1,98 @@
+"""
+Tests for the history of the cluster statistics.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from django.conf import settings as django_settings
+from django.core.management import call_command
+from django.utils import timezone
+
+from kubeportal.models import clusterstatistic
+from kubeportal.models.clusterstatistic import ClusterStatistic
+
+NOW = datetime(2021, 3, 10, 12, 30, tzinfo=timezone.utc)
+
+
+def _record(timestamp, pods):
+    ClusterStatistic.record({'k8s_node_count': 2, 'k8s_pod_count': pods}, timestamp=timestamp)
+
+
+@pytest.mark.django_db
+def test_downsample():
+    old = NOW - timedelta(days=3)
+    old_hour = old.replace(minute=0)
+    _record(old_hour + timedelta(minutes=10), 10)
+    _record(old_hour + timedelta(minutes=20), 20)
+    _record(old_hour + timedelta(hours=1), 30)
+    _record(NOW - timedelta(hours=1), 40)
+    ClusterStatistic.downsample(now=NOW)
+
+    hourly = ClusterStatistic.objects.filter(resolution=clusterstatistic.HOUR)
+    assert [(p.timestamp, p.pod_count, p.samples) for p in hourly] == \
+        [(old_hour, 15, 2), (old_hour + timedelta(hours=1), 30, 1)]
+    assert ClusterStatistic.objects.filter(resolution=clusterstatistic.RAW).count() == 1
+
+    # Much later, the hourly points become one daily point
+    ClusterStatistic.downsample(now=NOW + timedelta(days=100))
+    daily = ClusterStatistic.objects.filter(resolution=clusterstatistic.DAY)
+    assert [(p.timestamp, p.samples) for p in daily] == \
+        [(old_hour.replace(hour=0), 3), (NOW.replace(hour=0, minute=0), 1)]
+    assert ClusterStatistic.objects.exclude(resolution=clusterstatistic.DAY).count() == 0
+
+
+@pytest.mark.django_db
+def test_history():
+    for minute in range(0, 60, 10):
+        _record(NOW.replace(minute=minute), minute)
+    raw = ClusterStatistic.history(NOW - timedelta(hours=1), NOW, clusterstatistic.RAW)
+    assert [point['pod_count'] for point in raw] == [0, 10, 20, 30]
+    hourly = ClusterStatistic.history(NOW - timedelta(days=1), NOW + timedelta(hours=1), clusterstatistic.HOUR)
+    assert hourly == [{'timestamp': NOW.replace(minute=0), 'node_count': 2, 'cpu_count': None,
+                       'mem_sum': None, 'pod_count': 25, 'volume_count': None}]
+
+
+@pytest.mark.django_db
+def test_averages_weighted_by_samples():
+    day = NOW.replace(hour=0, minute=0)
+    ClusterStatistic.objects.create(resolution=clusterstatistic.HOUR, timestamp=day + timedelta(hours=1),
+                                    samples=4, pod_count=10)
+    _record(day + timedelta(hours=5), 40)
+    daily = ClusterStatistic.history(day, day + timedelta(hours=23), clusterstatistic.DAY)
+    assert daily[0]['pod_count'] == 16
+
+    ClusterStatistic.objects.create(resolution=clusterstatistic.HOUR, timestamp=day + timedelta(hours=2),
+                                    samples=1, pod_count=40, node_count=4)
+    ClusterStatistic.downsample(now=day + timedelta(days=100))
+    point = ClusterStatistic.objects.get(resolution=clusterstatistic.DAY)
+    assert point.samples == 6
+    assert point.pod_count == 20
+    # Points without a value do not count for its average
+    assert point.node_count == 3
+
+
+@pytest.mark.django_db
+def test_history_view(api_client):
+    _record(timezone.now() - timedelta(minutes=5), 7)
+    response = api_client.get(f'/api/{django_settings.API_VERSION}/infos/history/')
+    assert response.status_code == 200
+    data = response.json()
+    assert data['resolution'] == clusterstatistic.RAW
+    assert [point['pod_count'] for point in data['points']] == [7]
+
+    response = api_client.get(f'/api/{django_settings.API_VERSION}/infos/history/?start=2020-01-01T00:00:00Z')
+    assert response.json()['resolution'] == clusterstatistic.DAY
+
+    response = api_client.get(f'/api/{django_settings.API_VERSION}/infos/history/?resolution=minute')
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_record_command(mocker):
+    mocker.patch('kubeportal.k8s.stats.api_async.fetch_cluster_stats',
+                 return_value={'k8s_node_count': 3, 'k8s_pod_count': 12})
+    call_command('record_cluster_history')
+    point = ClusterStatistic.objects.get()
+    assert point.node_count == 3
+    assert point.pod_count == 12
@@ -62,3 +62,36 @@ def test_token_auth(admin_user, rf):
         token.access_token)
     response = userinfo(request)
     assert response.status_code == 200
+
+
+def test_permission_check_queries(admin_user, django_assert_num_queries):
+    client = create_oidc_client()
+    for i in range(10):
+        app = WebApplication(name=f"Test Web App {i}", oidc_client=create_oidc_client() if i else client)
+        app.save()
+        create_group(member=admin_user, app=app)
+
+    # One query for all groups, the allowed client set is cached afterwards
+    with django_assert_num_queries(1):
+        security.permission_check(admin_user, client)
+    with django_assert_num_queries(0):
+        security.permission_check(admin_user, client)
+
+
+def test_permission_check_invalidated(admin_user):
+    client = create_oidc_client()
+    app = WebApplication(name="Test Web App", oidc_client=client)
+    app.save()
+    group = create_group(member=admin_user, app=app)
+    security.permission_check(admin_user, client)
+
+    group.members.remove(admin_user)
+    with pytest.raises(PermissionDenied):
+        security.permission_check(admin_user, client)
+
+    group.members.add(admin_user)
+    security.permission_check(admin_user, client)
+    app.oidc_client = None
+    app.save()
+    with pytest.raises(PermissionDenied):
+        security.permission_check(admin_user, client)
@@ -0,0 +1,134 @@
+"""
+Tests for the asynchronous Kubernetes access layer.
+"""
+
+import asyncio
+import time
+
+import aiohttp
+import pytest
+from kubernetes_asyncio import client
+
+from kubeportal.k8s import kubernetes_api_async as api_async
+from kubeportal.k8s import resilience
+from kubeportal.k8s.resilience import AsyncResilientApiClient, CircuitOpenError, breaker
+
+
+def _node(cpus, memory):
+    return client.V1Node(status=client.V1NodeStatus(capacity={'cpu': cpus, 'memory': memory}))
+
+
+@pytest.fixture
+def fake_apis(mocker, settings):
+    settings.API_SERVER_EXTERNAL = "https://k8s.example.com"
+    core_v1 = mocker.MagicMock()
+    core_v1.list_node = mocker.AsyncMock(return_value=client.V1NodeList(
+        items=[_node("4", "8000000Ki"), _node("2", "4000000Ki")]))
+    version_api = mocker.MagicMock()
+    version_api.get_code = mocker.AsyncMock(return_value=client.VersionInfo(
+        git_version="v1.19.2", build_date="", compiler="", git_commit="", git_tree_state="",
+        go_version="", major="1", minor="19", platform="linux/amd64"))
+    mocker.patch('kubeportal.k8s.kubernetes_api._version', {'value': None, 'checked': None})
+
+    async def get_portal_core_v1():
+        return core_v1
+
+    async def get_portal_api_client():
+        return None
+
+    async def get_portal_version_api():
+        return version_api
+
+    async def list_metadata_page(api_client, path, limit, _continue=None):
+        if path == '/api/v1/persistentvolumes':
+            raise client.rest.ApiException(status=403)
+        return {'metadata': {'continue': 'abc', 'remainingItemCount': 2},
+                'items': [{'metadata': {'name': 'a', 'namespace': 'default'}}]}
+
+    mocker.patch('kubeportal.k8s.kubernetes_api_async.get_portal_core_v1', get_portal_core_v1)
+    mocker.patch('kubeportal.k8s.kubernetes_api_async.get_portal_api_client', get_portal_api_client)
+    mocker.patch('kubeportal.k8s.kubernetes_api_async.get_portal_version_api', get_portal_version_api)
+    mocker.patch('kubeportal.k8s.kubernetes_api_async._list_metadata_page', list_metadata_page)
+    return {'core_v1': core_v1, 'version': version_api}
+
+
+def test_cluster_stats(fake_apis):
+    stats = api_async.fetch_cluster_stats()
+    assert stats == {'k8s_version': 'v1.19.2',
+                     'k8s_apiserver_url': 'https://k8s.example.com',
+                     'k8s_node_count': 2,
+                     'k8s_cpu_count': 6,
+                     'k8s_mem_sum': 12.0,
+                     'k8s_pod_count': 3,
+                     'k8s_volume_count': None}
+    fake_apis['core_v1'].list_node.assert_awaited_once()
+    # The version is cached
+    api_async.fetch_cluster_stats()
+    fake_apis['version'].get_code.assert_awaited_once()
+
+
+def test_run_concurrently():
+    async def slow(value):
+        await asyncio.sleep(0.2)
+        return value
+
+    start = time.monotonic()
+    assert api_async.run_concurrently(slow(1), slow(2), slow(3)) == [1, 2, 3]
+    assert time.monotonic() - start < 0.5
+
+
+def test_run_raises():
+    async def broken():
+        raise ValueError("broken")
+
+    with pytest.raises(ValueError):
+        api_async.run(broken())
+
+
+@pytest.fixture
+def upstream(mocker, settings):
+    """
+    Replaces the actual HTTP call of the async Kubernetes client library.
+    """
+    settings.API_READ_RETRIES = 1
+    settings.API_READ_TIMEOUT = 7
+    settings.API_BREAKER_ERROR_RATE = 0.5
+    settings.API_BREAKER_COOLDOWN = 30
+    mocker.patch('kubeportal.k8s.resilience.RETRY_BASE_DELAY', 0)
+    breaker.reset()
+    yield mocker.patch.object(client.ApiClient, 'call_api', mocker.AsyncMock())
+    breaker.reset()
+
+
+def _read_nodes():
+    async def read():
+        api_client = AsyncResilientApiClient(client.Configuration())
+        try:
+            return await api_client.call_api('/api/v1/nodes', 'GET', query_params=[])
+        finally:
+            await api_client.close()
+    return api_async.run(read())
+
+
+def test_resilient_call(upstream):
+    upstream.side_effect = [aiohttp.ServerDisconnectedError(), "result"]
+    assert _read_nodes() == "result"
+    assert upstream.await_count == 2
+    timeout = upstream.call_args[0][14]
+    assert (timeout.connect, timeout.sock_read) == (resilience.CONNECT_TIMEOUT, 7)
+
+
+def test_resilient_call_breaker(upstream):
+    upstream.side_effect = client.rest.ApiException(status=503)
+    for _ in range(2):
+        with pytest.raises(client.rest.ApiException):
+            _read_nodes()
+    # The fifth failure opens the breaker, the retry is rejected
+    with pytest.raises(CircuitOpenError):
+        _read_nodes()
+    assert breaker.state()['state'] == breaker.OPEN
+    # Fails fast, without blocking on the API server
+    with pytest.raises(CircuitOpenError):
+        _read_nodes()
+    assert upstream.await_count == 5
+    assert breaker.state()['rejected_calls'] == 2
@@ -0,0 +1,144 @@
+"""
+Tests for the pooled Kubernetes API clients.
+"""
+
+import pytest
+from kubernetes import client
+
+from kubeportal.k8s import kubernetes_api as api
+from kubeportal.k8s.clients import PortalClientRegistry, UserClientCache, portal_clients, user_clients
+from kubeportal.models.kubernetesnamespace import KubernetesNamespace
+from kubeportal.models.kubernetesserviceaccount import KubernetesServiceAccount
+
+
+@pytest.fixture
+def fake_portal_configuration(mocker):
+    configuration = client.Configuration()
+    configuration.host = "https://k8s.example.com"
+    loader = mocker.patch('kubeportal.k8s.clients._load_portal_configuration',
+                          return_value=(configuration, None))
+    portal_clients.reload()
+    yield loader
+    portal_clients.reload()
+
+
+def test_portal_client_reused(fake_portal_configuration):
+    assert api.get_portal_core_v1() is api.get_portal_core_v1()
+    assert api.get_portal_core_v1().api_client is api.get_portal_core_v1().api_client
+    assert api.get_portal_apps_v1().api_client is not api.get_portal_core_v1().api_client
+    assert api.get_portal_configuration().host == "https://k8s.example.com"
+    fake_portal_configuration.assert_called_once()
+
+
+def test_portal_client_reload_on_rotation(fake_portal_configuration, mocker):
+    registry = PortalClientRegistry()
+    first = registry.get_api('core_v1')
+    mocker.patch('kubeportal.k8s.clients.CREDENTIALS_CHECK_INTERVAL', 0)
+    mocker.patch('kubeportal.k8s.clients._file_fingerprint', return_value=('token', 2, 0))
+    second = registry.get_api('core_v1')
+    assert first is not second
+    assert fake_portal_configuration.call_count == 2
+
+
+def test_portal_client_pool_stats(fake_portal_configuration):
+    api.get_portal_core_v1()
+    api.get_portal_net_v1()
+    stats = api.get_portal_pool_stats()
+    assert stats['configuration_loads'] == 1
+    assert set(stats['groups'].keys()) == {'core_v1', 'net_v1'}
+    assert stats['groups']['core_v1']['connections'] == 0
+
+
+def test_user_client_cache_lru(settings):
+    settings.USER_CLIENT_CACHE_SIZE = 2
+    cache = UserClientCache()
+    a = cache.get('a', object)
+    assert cache.get('a', object) is a
+    cache.get('b', object)
+    cache.get('a', object)
+    cache.get('c', object)   # evicts 'b', which was least recently used
+    assert cache.get('a', object) is a
+    stats = cache.stats()
+    assert stats['size'] == 2
+    assert stats['hits'] == 3
+    assert stats['misses'] == 3
+    assert stats['evictions'] == 1
+
+
+def test_user_client_cache_ttl(settings):
+    settings.USER_CLIENT_CACHE_TTL = 0
+    cache = UserClientCache()
+    a = cache.get('a', object)
+    assert cache.get('a', object) is not a
+    assert cache.stats()['misses'] == 2
+
+
+def test_user_client_cache_evicted_while_building():
+    cache = UserClientCache()
+
+    def factory():
+        # E.g. the service account token changes meanwhile
+        cache.evict('a')
+        return object()
+
+    a = cache.get('a', factory)
+    assert cache.get('a', object) is not a
+    assert cache.stats()['size'] == 1
+
+    def clearing_factory():
+        cache.clear()
+        return object()
+
+    cache.get('b', clearing_factory)
+    assert cache.stats()['size'] == 0
+
+
+@pytest.mark.django_db
+def test_user_client_cache_evicted_on_user_change(admin_user):
+    ns = KubernetesNamespace(name="cachetest", uid="ns-uid")
+    ns.save()
+    svca = KubernetesServiceAccount(name="default", uid="svca-uid", namespace=ns)
+    svca.save()
+    admin_user.service_account = svca
+    admin_user.state = admin_user.ACCESS_APPROVED
+    admin_user.save()
+    user_clients.clear()
+    cached = user_clients.get("svca-uid", object)
+
+    admin_user.first_name = "Unrelated change"
+    admin_user.save()
+    assert user_clients.get("svca-uid", object) is cached
+
+    admin_user.state = admin_user.ACCESS_REJECTED
+    admin_user.save()
+    assert user_clients.get("svca-uid", object) is not cached
+    user_clients.clear()
+
+
+def test_kubernetes_version_cached(mocker):
+    mocker.patch('kubeportal.k8s.kubernetes_api._version', {'value': None, 'checked': None})
+    mocker.patch('kubeportal.k8s.kubernetes_api.get_portal_api_client')
+    version_api = mocker.patch('kubeportal.k8s.kubernetes_api.client.VersionApi').return_value
+    version_api.get_code.return_value.git_version = "v1.19.2"
+    assert api.get_kubernetes_version() == "v1.19.2"
+    assert api.get_kubernetes_version() == "v1.19.2"
+    version_api.get_code.assert_called_once()
+
+    # Revalidation failures keep the last known version
+    mocker.patch('kubeportal.k8s.kubernetes_api.VERSION_CHECK_INTERVAL', 0)
+    version_api.get_code.side_effect = client.rest.ApiException(status=503)
+    assert api.get_kubernetes_version() == "v1.19.2"
+    assert version_api.get_code.call_count == 2
+
+
+def test_kubernetes_version_retried_while_unknown(mocker):
+    mocker.patch('kubeportal.k8s.kubernetes_api._version', {'value': None, 'checked': None})
+    mocker.patch('kubeportal.k8s.kubernetes_api.get_portal_api_client')
+    version_api = mocker.patch('kubeportal.k8s.kubernetes_api.client.VersionApi').return_value
+    version_api.get_code.side_effect = client.rest.ApiException(status=503)
+    assert api.get_kubernetes_version() is None
+
+    version_api.get_code.side_effect = None
+    version_api.get_code.return_value.git_version = "v1.19.2"
+    assert api.get_kubernetes_version() == "v1.19.2"
+    assert version_api.get_code.call_count == 2
@@ -0,0 +1,75 @@
+"""
+Tests for the in-memory mirror of cluster resources.
+"""
+
+import pytest
+from kubernetes import client
+
+from kubeportal.k8s import kubernetes_api as api
+from kubeportal.k8s.informer import Informer, INFORMERS
+from kubeportal.models.kubernetesnamespace import KubernetesNamespace
+from kubeportal.models.kubernetesserviceaccount import KubernetesServiceAccount
+
+
+def _pod(namespace, name, labels=None, resource_version="1"):
+    return client.V1Pod(metadata=client.V1ObjectMeta(namespace=namespace, name=name, labels=labels,
+                                                     resource_version=resource_version))
+
+
+def test_informer_indexes():
+    informer = Informer('pods', 'core_v1', 'list_pod_for_all_namespaces')
+    informer.replace([_pod("ns1", "b", {'app': 'web'}),
+                      _pod("ns1", "a", {'app': 'db'}),
+                      _pod("ns2", "c", {'app': 'web', 'tier': 'front'})], "10")
+    assert [p.metadata.name for p in informer.list()] == ["a", "b", "c"]
+    assert [p.metadata.name for p in informer.list("ns1")] == ["a", "b"]
+    assert [p.metadata.name for p in informer.list(labels={'app': 'web'})] == ["b", "c"]
+    assert [p.metadata.name for p in informer.list("ns2", labels={'app': 'web', 'tier': 'front'})] == ["c"]
+    assert informer.list("ns3") == []
+    assert informer.get("ns1", "a").metadata.labels == {'app': 'db'}
+
+
+def test_informer_events():
+    informer = Informer('pods', 'core_v1', 'list_pod_for_all_namespaces')
+    informer.replace([_pod("ns1", "a", {'app': 'web'})], "10")
+    informer.handle_event('MODIFIED', _pod("ns1", "a", {'app': 'db'}, "11"))
+    assert informer.list(labels={'app': 'web'}) == []
+    assert len(informer.list(labels={'app': 'db'})) == 1
+    informer.handle_event('ADDED', _pod("ns1", "b", None, "12"))
+    assert len(informer.list("ns1")) == 2
+    informer.handle_event('DELETED', _pod("ns1", "a", {'app': 'db'}, "13"))
+    assert [p.metadata.name for p in informer.list()] == ["b"]
+    assert informer.list(labels={'app': 'db'}) == []
+    assert informer._resource_version == "13"
+
+
+@pytest.fixture
+def synced_pod_informer(settings, mocker):
+    settings.INFORMERS_ENABLED = True
+    informer = INFORMERS['pods']
+    mocker.patch.object(informer, 'start')
+    mocker.patch.object(informer, 'is_synced', return_value=True)
+    informer.replace([_pod("cachetest", "a"), _pod("other", "b")], "1")
+    yield informer
+    informer.replace([], None)
+    informer._synced = False
+
+
+@pytest.mark.django_db
+def test_informer_serves_user_namespace(synced_pod_informer, admin_user, mocker):
+    ns = KubernetesNamespace(name="cachetest", uid="ns-uid")
+    ns.save()
+    svca = KubernetesServiceAccount(name="default", uid="svca-uid", namespace=ns)
+    svca.save()
+    admin_user.service_account = svca
+    admin_user.save()
+    user_api = mocker.patch('kubeportal.k8s.kubernetes_api.get_user_core_v1')
+
+    assert [p.metadata.name for p in api.get_namespaced_pods("cachetest", admin_user)] == ["a"]
+    assert api.get_namespaced_pod("cachetest", "a", admin_user).metadata.name == "a"
+    assert [p.metadata.name for p in api.get_pods()] == ["a", "b"]
+    user_api.assert_not_called()
+
+    # Foreign namespaces are not served from the cache
+    api.get_namespaced_pods("other", admin_user)
+    user_api.assert_called_once()
@@ -0,0 +1,138 @@
+"""
+Tests for the chunked listing and counting of cluster resources.
+"""
+
+import json
+
+import pytest
+from django.conf import settings as django_settings
+from kubernetes import client
+
+from kubeportal.k8s import kubernetes_api as api
+from kubeportal.k8s import kubernetes_api_async as api_async
+from kubeportal.models.kubernetesnamespace import KubernetesNamespace
+from kubeportal.models.kubernetesserviceaccount import KubernetesServiceAccount
+
+
+def _pod(namespace, name):
+    return client.V1Pod(metadata=client.V1ObjectMeta(namespace=namespace, name=name))
+
+
+def _fake_list_function(pods, calls):
+    def list_function(limit, _continue=None):
+        calls.append((limit, _continue))
+        start = int(_continue or 0)
+        end = start + limit
+        next_token = str(end) if end < len(pods) else None
+        return client.V1PodList(items=pods[start:end],
+                                metadata=client.V1ListMeta(_continue=next_token))
+    return list_function
+
+
+def test_paginate(settings):
+    settings.LIST_PAGE_SIZE = 2
+    pods = [_pod("ns", str(i)) for i in range(5)]
+    calls = []
+    result = api._paginate(_fake_list_function(pods, calls))
+    assert calls == []   # nothing fetched before the consumer asks for it
+    assert [pod.metadata.name for pod in result] == ["0", "1", "2", "3", "4"]
+    assert calls == [(2, None), (2, "2"), (2, "4")]
+
+
+def test_paginate_error(settings):
+    settings.LIST_PAGE_SIZE = 2
+
+    def broken_list_function(limit, _continue=None):
+        if _continue:
+            raise client.rest.ApiException(status=410)
+        return client.V1PodList(items=[_pod("ns", "a"), _pod("ns", "b")],
+                                metadata=client.V1ListMeta(_continue="2"))
+
+    with pytest.raises(client.rest.ApiException):
+        list(api._paginate(broken_list_function))
+
+
+@pytest.mark.django_db
+def test_namespaces_without_pods(mocker):
+    KubernetesNamespace(name="busy", uid="busy-uid").save()
+    KubernetesNamespace(name="idle", uid="idle-uid").save()
+    mocker.patch('kubeportal.k8s.kubernetes_api.iter_pods',
+                 return_value=iter([_pod("busy", "a"), _pod("busy", "b")]))
+    assert [ns.name for ns in KubernetesNamespace.without_pods()] == ["idle"]
+
+
+def _metadata_page(names, _continue=None, remaining=None):
+    metadata = {}
+    if _continue:
+        metadata['continue'] = _continue
+    if remaining is not None:
+        metadata['remainingItemCount'] = remaining
+    return {'kind': 'PartialObjectMetadataList',
+            'metadata': metadata,
+            'items': [{'metadata': {'namespace': 'ns', 'name': name}} for name in names]}
+
+
+@pytest.fixture
+def count_objects(mocker):
+    """
+    Runs kubernetes_api_async._count_objects() with the given fake page fetch function.
+    """
+    async def get_portal_api_client():
+        return None
+
+    mocker.patch('kubeportal.k8s.kubernetes_api_async.get_portal_api_client', get_portal_api_client)
+
+    def count(path, fetch):
+        async def list_metadata_page(api_client, path, limit, _continue=None):
+            return fetch(api_client, path, limit, _continue)
+
+        mocker.patch('kubeportal.k8s.kubernetes_api_async._list_metadata_page', list_metadata_page)
+        return api_async.run(api_async._count_objects(path))
+    return count
+
+
+def test_count_with_remaining_item_count(count_objects):
+    calls = []
+
+    def fetch(api_client, path, limit, _continue=None):
+        calls.append((path, limit))
+        return _metadata_page(["a"], "next", 41)
+
+    assert count_objects('/api/v1/pods', fetch) == 42
+    assert calls == [('/api/v1/pods', 1)]
+
+
+def test_count_without_remaining_item_count(count_objects, settings):
+    settings.LIST_PAGE_SIZE = 2
+
+    def fetch(api_client, path, limit, _continue=None):
+        if limit == 1:
+            return _metadata_page(["a"], "1")
+        if not _continue:
+            return _metadata_page(["a", "b"], "2")
+        return _metadata_page(["c"])
+
+    assert count_objects('/api/v1/pods', fetch) == 3
+
+
+def test_count_empty(count_objects):
+    assert count_objects('/api/v1/persistentvolumes', lambda *args: _metadata_page([])) == 0
+
+
+@pytest.mark.django_db
+def test_pod_urls_from_metadata(api_client, admin_user, mocker):
+    ns = KubernetesNamespace(name="metatest", uid="ns-uid")
+    ns.save()
+    svca = KubernetesServiceAccount(name="default", uid="svca-uid", namespace=ns)
+    svca.save()
+    admin_user.service_account = svca
+    admin_user.save()
+    mocker.patch('kubeportal.k8s.kubernetes_api.get_user_api_client')
+    fetch = mocker.patch('kubeportal.k8s.kubernetes_api._list_metadata_page',
+                         return_value=_metadata_page(["a", "b"]))
+
+    response = api_client.get(f'/api/{django_settings.API_VERSION}/namespaces/metatest/pods/')
+    assert response.status_code == 200
+    pod_urls = json.loads(response.content)['pod_urls']
+    assert [url.rsplit('/', 2)[-2] for url in pod_urls] == ["metatest_a", "metatest_b"]
+    assert fetch.call_args[0][1] == '/api/v1/namespaces/metatest/pods'
@@ -0,0 +1,53 @@
+"""
+Tests for the raw JSON access to the Kubernetes API.
+"""
+
+from datetime import datetime, timezone
+
+import orjson
+from kubernetes import client
+
+from kubeportal.api.views.pods import PodSerializer
+from kubeportal.k8s import kubernetes_api as api
+from kubeportal.management.commands.benchmark_deserialization import make_pod_list
+
+
+def test_pod_serializer_raw_matches_models():
+    data = make_pod_list(2)
+    models = client.ApiClient().deserialize(type('Response', (), {'data': data}), 'V1PodList').items
+    raw = orjson.loads(data)['items']
+    for model, pod in zip(models, raw):
+        assert PodSerializer.create_from_k8s_pod(model).data == PodSerializer.create_from_k8s_pod_dict(pod).data
+    volumes = PodSerializer.create_from_k8s_pod_dict(raw[0]).data['containers'][0]['volume_mounts']
+    assert volumes[0]['volume']['type'] == 'persistent volume claim'
+
+
+def test_pod_serializer_raw_volume_types():
+    pod = client.V1Pod(
+        metadata=client.V1ObjectMeta(name="pod", namespace="test", uid="uid",
+                                     creation_timestamp=datetime(2021, 1, 1, tzinfo=timezone.utc)),
+        spec=client.V1PodSpec(
+            containers=[client.V1Container(
+                name="web", image="nginx:latest",
+                volume_mounts=[client.V1VolumeMount(name="info", mount_path="/etc/info"),
+                               client.V1VolumeMount(name="scratch", mount_path="/tmp")])],
+            volumes=[client.V1Volume(name="info", downward_api=client.V1DownwardAPIVolumeSource(items=[])),
+                     client.V1Volume(name="scratch", empty_dir=client.V1EmptyDirVolumeSource())]),
+        status=client.V1PodStatus(phase="Running", start_time=datetime(2021, 1, 1, tzinfo=timezone.utc)))
+    raw = orjson.loads(orjson.dumps(client.ApiClient().sanitize_for_serialization(pod)))
+    assert PodSerializer.create_from_k8s_pod(pod).data == PodSerializer.create_from_k8s_pod_dict(raw).data
+    volumes = PodSerializer.create_from_k8s_pod_dict(raw).data['containers'][0]['volume_mounts']
+    assert [volume['volume']['type'] for volume in volumes] == ['downward api', 'empty dir']
+
+
+def test_services_json(mocker):
+    service_list = {'items': [{'metadata': {'name': 'web', 'creationTimestamp': '2021-01-01T00:00:00Z'},
+                               'spec': {'type': 'ClusterIP', 'selector': {'app': 'web'},
+                                        'ports': [{'port': 80, 'protocol': 'TCP', 'targetPort': 8080}]}}]}
+    core_v1 = mocker.patch('kubeportal.k8s.kubernetes_api.get_user_core_v1').return_value
+    core_v1.list_namespaced_service.return_value.data = orjson.dumps(service_list)
+    services = api.get_namespaced_services_json("default", None)
+    core_v1.list_namespaced_service.assert_called_once_with("default", _preload_content=False)
+    assert services[0]['selector'] == [{'key': 'app', 'value': 'web'}]
+    assert services[0]['ports'] == [{'port': 80, 'protocol': 'TCP'}]
+    assert services[0]['creation_timestamp'].year == 2021
@@ -0,0 +1,140 @@
+"""
+Tests for timeouts, retries and circuit breaker of API server calls.
+"""
+
+import json
+
+import pytest
+import urllib3
+from kubernetes import client
+
+from kubeportal.k8s import resilience
+from kubeportal.k8s.resilience import ResilientApiClient, CircuitOpenError, breaker, stale_results
+
+
+@pytest.fixture
+def upstream(mocker, settings):
+    """
+    Replaces the actual HTTP call of the Kubernetes client library.
+    """
+    settings.API_READ_RETRIES = 2
+    settings.API_BREAKER_ERROR_RATE = 0.5
+    settings.API_BREAKER_COOLDOWN = 30
+    mocker.patch('kubeportal.k8s.resilience.time.sleep')
+    breaker.reset()
+    stale_results.clear()
+    yield mocker.patch.object(client.ApiClient, 'call_api')
+    breaker.reset()
+    stale_results.clear()
+
+
+def _read(api_client, name="a"):
+    return api_client.call_api('/api/v1/namespaces/{namespace}/pods/{name}', 'GET',
+                               {'namespace': 'default', 'name': name}, [])
+
+
+def test_timeout_applied(upstream, settings):
+    settings.API_READ_TIMEOUT = 7
+    settings.API_WRITE_TIMEOUT = 9
+    api_client = ResilientApiClient()
+    _read(api_client)
+    assert upstream.call_args[0][14] == (resilience.CONNECT_TIMEOUT, 7)
+    api_client.call_api('/api/v1/namespaces', 'POST')
+    assert upstream.call_args[0][14] == (resilience.CONNECT_TIMEOUT, 9)
+    api_client.call_api('/api/v1/namespaces', 'GET', _request_timeout=1)
+    assert upstream.call_args[0][14] == 1
+
+
+def test_read_retried(upstream):
+    upstream.side_effect = [urllib3.exceptions.ReadTimeoutError(None, None, "timeout"), "result"]
+    assert _read(ResilientApiClient()) == "result"
+    assert upstream.call_count == 2
+
+
+def test_write_not_retried(upstream):
+    upstream.side_effect = client.rest.ApiException(status=502)
+    with pytest.raises(client.rest.ApiException):
+        ResilientApiClient().call_api('/api/v1/namespaces', 'POST')
+    assert upstream.call_count == 1
+
+
+def test_client_errors_not_retried(upstream):
+    upstream.side_effect = client.rest.ApiException(status=404)
+    with pytest.raises(client.rest.ApiException):
+        _read(ResilientApiClient())
+    assert upstream.call_count == 1
+    assert breaker.state()['error_rate'] == 0
+
+
+def test_breaker_opens_and_serves_stale(upstream, mocker):
+    api_client = ResilientApiClient()
+    upstream.return_value = "good"
+    _read(api_client)
+
+    upstream.side_effect = client.rest.ApiException(status=503)
+    with pytest.raises(client.rest.ApiException):
+        _read(api_client, "b")
+    # The last good result is served when the API server fails
+    assert _read(api_client) == "good"
+    assert breaker.state()['state'] == breaker.OPEN
+
+    # Open breaker fails fast, without calling the API server
+    calls = upstream.call_count
+    with pytest.raises(CircuitOpenError):
+        _read(api_client, "b")
+    assert _read(api_client) == "good"
+    assert upstream.call_count == calls
+    assert breaker.state()['rejected_calls'] == 3
+
+    # After the cooldown, a successful probe closes the breaker
+    mocker.patch('kubeportal.k8s.resilience.time.monotonic', return_value=10 ** 9)
+    upstream.side_effect = None
+    upstream.return_value = "fresh"
+    assert _read(api_client) == "fresh"
+    assert breaker.state()['state'] == breaker.CLOSED
+
+
+def test_watch_bypasses_breaker(upstream):
+    upstream.side_effect = client.rest.ApiException(status=503)
+    with pytest.raises(client.rest.ApiException):
+        ResilientApiClient().call_api('/api/v1/pods', 'GET', {}, [('watch', True)])
+    assert upstream.call_count == 1
+    assert upstream.call_args[0][14] is None
+
+
+def test_stale_results_per_user(upstream):
+    first = client.Configuration()
+    first.api_key['authorization'] = 'Bearer first'
+    second = client.Configuration()
+    second.api_key['authorization'] = 'Bearer second'
+    upstream.return_value = "for first"
+    _read(ResilientApiClient(first))
+    upstream.side_effect = client.rest.ApiException(status=500)
+    with pytest.raises(client.rest.ApiException):
+        _read(ResilientApiClient(second))
+
+
+def test_large_and_secret_reads_not_kept(upstream):
+    api_client = ResilientApiClient()
+    upstream.return_value = "result"
+    api_client.call_api('/api/v1/pods', 'GET', {}, [])
+    api_client.call_api('/api/v1/secrets', 'GET', {}, [])
+    api_client.call_api('/api/v1/namespaces/{namespace}/secrets/{name}', 'GET',
+                        {'namespace': 'default', 'name': 'token'}, [])
+    assert stale_results.stats()['size'] == 0
+    _read(api_client)
+    assert stale_results.stats()['size'] == 1
+
+    # Without a kept result, the failure is passed on
+    upstream.side_effect = client.rest.ApiException(status=503)
+    with pytest.raises(client.rest.ApiException):
+        api_client.call_api('/api/v1/pods', 'GET', {}, [])
+
+
+@pytest.mark.django_db
+def test_health_view(client, upstream):
+    response = client.get('/health/')
+    assert response.status_code == 200
+    data = json.loads(response.content)
+    assert data['api_breaker']['state'] == 'closed'
+    assert 'stale_results' in data['api_breaker']
@@ -0,0 +1,90 @@
+"""
+Tests for the cluster statistics snapshot.
+"""
+
+import pytest
+from django.conf import settings as django_settings
+from django.core.management import call_command
+
+from kubeportal.k8s import stats as cluster_stats
+
+STATS = {'k8s_version': 'v1.19.2',
+         'k8s_apiserver_url': 'https://k8s.example.com',
+         'k8s_node_count': 2,
+         'k8s_cpu_count': 6,
+         'k8s_mem_sum': 12.0,
+         'k8s_pod_count': 3,
+         'k8s_volume_count': 1}
+
+
+@pytest.fixture
+def fetch(mocker):
+    return mocker.patch('kubeportal.k8s.stats.api_async.fetch_cluster_stats', return_value=STATS)
+
+
+def test_snapshot_cached(fetch):
+    assert cluster_stats.get_snapshot() == (STATS, 0)
+    assert cluster_stats.get_snapshot() == (STATS, 0)
+    fetch.assert_called_once()
+
+
+def test_snapshot_refreshed_in_background(fetch, mocker, settings):
+    settings.STATS_REFRESH_INTERVAL = 60
+    cluster_stats.get_snapshot()
+    background = mocker.patch('kubeportal.k8s.stats._refresh_in_background')
+    mocker.patch('kubeportal.k8s.stats.time.time', return_value=cluster_stats.time.time() + 61)
+    stats, age = cluster_stats.get_snapshot()
+    assert age >= 61
+    background.assert_called_once()
+    fetch.assert_called_once()
+
+
+def test_refresh_command(fetch):
+    call_command('refresh_cluster_stats')
+    fetch.assert_called_once()
+    cluster_stats.get_snapshot()
+    fetch.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_info_detail_age(api_client, fetch):
+    response = api_client.get(f'/api/{django_settings.API_VERSION}/infos/k8s_cpu_count/')
+    assert response.status_code == 200
+    assert response.json() == {'k8s_cpu_count': 6}
+    assert response.headers['Age'] == '0'
+
+
+@pytest.mark.django_db
+def test_stats_view_age(admin_client, fetch):
+    response = admin_client.get('/stats/')
+    assert response.status_code == 200
+    assert response.context['snapshot_age'] == 0
+    assert response['Age'] == '0'
+
+
+@pytest.mark.django_db
+def test_info_batch(api_client, fetch, mocker):
+    mocker.patch.dict(cluster_stats.api_async.fetch_cluster_stats.return_value, {'k8s_pod_count': None})
+    response = api_client.get(f'/api/{django_settings.API_VERSION}/infos/batch/?slugs=k8s_cpu_count,k8s_pod_count,portal_user_count,foo')
+    assert response.status_code == 200
+    data = response.json()
+    assert data['infos'] == {'k8s_cpu_count': 6, 'k8s_pod_count': None, 'portal_user_count': 1}
+    assert set(data['errors'].keys()) == {'k8s_pod_count', 'foo'}
+    assert response.headers['Age'] == '0'
+    fetch.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_info_batch_all(api_client, fetch):
+    response = api_client.get(f'/api/{django_settings.API_VERSION}/infos/batch/')
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data['infos'].keys()) == set(cluster_stats.STATS) | {'portal_user_count', 'portal_version'}
+    assert data['errors'] == {}
+    fetch.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_info_batch_denied(api_client_anon):
+    response = api_client_anon.get(f'/api/{django_settings.API_VERSION}/infos/batch/')
+    assert response.status_code == 401
@@ -0,0 +1,229 @@
+"""
+Tests for the set-based synchronization of namespaces and service accounts.
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from kubernetes import client
+
+from kubeportal.k8s import k8s_sync, sync_jobs
+from kubeportal.models.kubernetesnamespace import KubernetesNamespace
+from kubeportal.models.kubernetesserviceaccount import KubernetesServiceAccount
+from kubeportal.models import User as KubeportalUser
+from kubeportal.models.kuberneteswatchstate import KubernetesWatchState
+from kubeportal.models.synclease import SyncLease
+
+
+def _ns(name):
+    return client.V1Namespace(metadata=client.V1ObjectMeta(name=name, uid=f"{name}-uid"))
+
+
+def _svca(namespace, name):
+    return client.V1ServiceAccount(metadata=client.V1ObjectMeta(namespace=namespace, name=name,
+                                                                uid=f"{namespace}-{name}-uid"))
+
+
+@pytest.fixture
+def cluster(mocker):
+    namespaces = [_ns(f"ns{i}") for i in range(50)] + [_ns("kube-system")]
+    svcas = [_svca(ns.metadata.name, "default") for ns in namespaces]
+    mocker.patch('kubeportal.k8s.kubernetes_api.iter_namespaces', side_effect=lambda: iter(namespaces))
+    mocker.patch('kubeportal.k8s.kubernetes_api.iter_service_accounts', side_effect=lambda: iter(svcas))
+    create_ns = mocker.patch('kubeportal.k8s.kubernetes_api.create_k8s_ns')
+    return namespaces, svcas, create_ns
+
+
+@pytest.mark.django_db
+def test_create_missing_in_portal(cluster, django_assert_max_num_queries):
+    # The service account sync creates the missing namespaces on its own
+    with django_assert_max_num_queries(10):
+        assert KubernetesServiceAccount.create_missing_in_portal()
+    assert KubernetesNamespace.objects.count() == 51
+    assert not KubernetesNamespace.objects.get(name="kube-system").visible
+    assert KubernetesServiceAccount.objects.filter(namespace__name="ns7", name="default").exists()
+
+    # Nothing new in the second run
+    with django_assert_max_num_queries(2):
+        assert KubernetesNamespace.create_missing_in_portal()
+        assert KubernetesServiceAccount.create_missing_in_portal()
+    assert KubernetesNamespace.objects.count() == 51
+    assert KubernetesServiceAccount.objects.count() == 51
+
+
+@pytest.mark.django_db
+def test_create_missing_in_cluster(cluster, django_assert_max_num_queries):
+    namespaces, svcas, create_ns = cluster
+    stale = KubernetesNamespace(name="gone", uid="gone-uid")
+    stale.save()
+    KubernetesServiceAccount(name="default", uid="gone-default-uid", namespace=stale).save()
+    KubernetesNamespace.create_missing_in_portal()
+    with django_assert_max_num_queries(12):
+        assert KubernetesNamespace.create_missing_in_cluster()
+    assert not KubernetesNamespace.objects.filter(name="gone").exists()
+    assert not KubernetesServiceAccount.objects.filter(uid="gone-default-uid").exists()
+    create_ns.assert_not_called()
+
+    # Portal records without UID are created in the cluster
+    create_ns.return_value = _ns("new")
+    KubernetesNamespace(name="new").save()
+    assert KubernetesNamespace.create_missing_in_cluster()
+    create_ns.assert_called_once_with("new")
+    assert KubernetesNamespace.objects.get(name="new").uid == "new-uid"
+
+
+@pytest.mark.django_db
+def test_sync(cluster):
+    assert k8s_sync.sync()
+    assert KubernetesServiceAccount.objects.count() == 51
+
+
+def _event(event_type, obj, resource_version):
+    obj.metadata.resource_version = resource_version
+    return {'type': event_type, 'object': obj}
+
+
+@pytest.fixture
+def fake_watch(mocker):
+    mocker.patch('kubeportal.k8s.k8s_sync.api.get_portal_core_v1')
+    return mocker.patch('kubeportal.k8s.k8s_sync.k8s_watch.Watch').return_value
+
+
+@pytest.mark.django_db
+def test_watch_applies_events(cluster, fake_watch, mocker):
+    relist = mocker.patch('kubeportal.k8s.k8s_sync._relist', return_value="100")
+    gone = KubernetesNamespace(name="gone", uid="gone-uid")
+    gone.save()
+    fake_watch.stream.return_value = iter([_event('ADDED', _ns("fresh"), "101"),
+                                           _event('DELETED', _ns("gone"), "102"),
+                                           _event('BOOKMARK', _ns(""), "105")])
+    k8s_sync.watch_once('namespaces')
+    relist.assert_called_once_with('namespaces')
+    assert fake_watch.stream.call_args[1]['resource_version'] == "100"
+    assert KubernetesNamespace.objects.filter(name="fresh").exists()
+    assert not KubernetesNamespace.objects.filter(name="gone").exists()
+    assert KubernetesWatchState.objects.get(kind='namespaces').resource_version == "105"
+
+    # The next watch resumes without listing again
+    fake_watch.stream.return_value = iter([_event('ADDED', _svca("fresh", "default"), "106")])
+    k8s_sync.watch_once('serviceaccounts')
+    relist.assert_called_with('serviceaccounts')
+    k8s_sync.watch_once('namespaces')
+    assert relist.call_count == 2
+    assert fake_watch.stream.call_args[1]['resource_version'] == "105"
+    assert KubernetesServiceAccount.objects.get(uid="fresh-default-uid").namespace.name == "fresh"
+
+
+@pytest.mark.django_db
+def test_watch_expired(fake_watch, mocker):
+    relist = mocker.patch('kubeportal.k8s.k8s_sync._relist')
+    KubernetesWatchState(kind='namespaces', resource_version="5").save()
+    fake_watch.stream.side_effect = client.rest.ApiException(status=410)
+    k8s_sync.watch_once('namespaces')
+    relist.assert_not_called()
+    assert KubernetesWatchState.objects.get(kind='namespaces').resource_version is None
+
+
+@pytest.mark.django_db
+def test_parallel_creation(cluster, settings):
+    settings.SYNC_CREATE_WORKERS = 4
+    namespaces, svcas, create_ns = cluster
+    create_ns.side_effect = lambda name: _ns(name) if name != "broken" else _raise()
+    for name in ["new1", "new2", "new3", "broken"]:
+        KubernetesNamespace(name=name).save()
+    progress = []
+    assert KubernetesNamespace.create_missing_in_cluster(lambda *args: progress.append(args))
+    assert set(KubernetesNamespace.objects.filter(uid=None).values_list('name', flat=True)) == {"broken"}
+    assert KubernetesNamespace.objects.get(name="new2").uid == "new2-uid"
+    assert progress[-1] == ("namespaces", 4, 4)
+
+
+@pytest.mark.django_db
+def test_parallel_creation_same_sanitized_name(cluster):
+    namespaces, svcas, create_ns = cluster
+    create_ns.side_effect = lambda name: _ns(name)
+    KubernetesNamespace(name="my-team").save()
+    KubernetesNamespace(name="my_team").save()
+    assert KubernetesNamespace.create_missing_in_cluster()
+    create_ns.assert_called_once_with("myteam")
+    assert KubernetesNamespace.objects.get(name="myteam").uid == "myteam-uid"
+    assert KubernetesNamespace.objects.filter(uid=None).count() == 1
+
+
+def _raise():
+    raise client.rest.ApiException(status=500)
+
+
+@pytest.mark.django_db
+def test_sync_job(admin_client, cluster, mocker):
+    thread = mocker.patch('kubeportal.k8s.sync_jobs.threading.Thread')
+    response = admin_client.post('/admin/sync/')
+    assert response.status_code == 302
+    thread.return_value.start.assert_called_once()
+    response = admin_client.get('/admin/sync/status/')
+    assert b"Synchronization is running" in response.content
+
+    # Only one job at a time, also from other processes
+    assert not sync_jobs.start_job()
+
+    # Run the job in this thread
+    mocker.patch('kubeportal.k8s.sync_jobs.connection')
+    thread.call_args[1]['target'](*thread.call_args[1]['args'])
+    response = admin_client.get('/admin/sync/status/')
+    assert b"finished successfully" in response.content
+    assert KubernetesServiceAccount.objects.count() == 51
+    assert sync_jobs.start_job()
+
+
+@pytest.mark.django_db
+def test_sync_job_dead_worker(mocker):
+    mocker.patch('kubeportal.k8s.sync_jobs.threading.Thread')
+    assert sync_jobs.start_job()
+    assert sync_jobs.get_job()['state'] == 'running'
+    # The worker died, its lease is no longer renewed
+    SyncLease.objects.filter(name=sync_jobs.JOB_LEASE_NAME).update(expires=timezone.now() - timedelta(seconds=1))
+    job = sync_jobs.get_job()
+    assert job['state'] == 'finished'
+    assert not job['result']
+    assert sync_jobs.start_job()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_duplicate_removal_migration():
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    before = [('kubeportal', '0015_sync_lease')]
+    after = [('kubeportal', '0017_unique_kubernetes_objects')]
+    executor = MigrationExecutor(connection)
+    executor.migrate(before)
+    apps = executor.loader.project_state(before).apps
+    Namespace = apps.get_model('kubeportal', 'KubernetesNamespace')
+    ServiceAccount = apps.get_model('kubeportal', 'KubernetesServiceAccount')
+    User = apps.get_model('kubeportal', 'User')
+
+    first = Namespace.objects.create(name="dup", uid=None)
+    second = Namespace.objects.create(name="dup", uid="dup-uid")
+    svca_first = ServiceAccount.objects.create(name="default", uid="sa-uid", namespace=first)
+    svca_second = ServiceAccount.objects.create(name="default", uid=None, namespace=second)
+    user = User.objects.create(username="dupuser", service_account=svca_second)
+
+    executor = MigrationExecutor(connection)
+    executor.migrate(after)
+    namespace = KubernetesNamespace.objects.get(name="dup")
+    assert namespace.pk == first.pk
+    assert namespace.uid == "dup-uid"
+    svca = KubernetesServiceAccount.objects.get(namespace=namespace, name="default")
+    assert svca.pk == svca_first.pk
+    assert KubeportalUser.objects.get(pk=user.pk).service_account_id == svca.pk
+
+
+@pytest.mark.django_db
+def test_recreated_namespace_adopted(cluster):
+    KubernetesNamespace(name="ns3", uid="old-uid").save()
+    KubernetesNamespace(name="ns4").save()
+    assert KubernetesNamespace.create_missing_in_portal()
+    assert KubernetesNamespace.objects.get(name="ns3").uid == "ns3-uid"
+    assert KubernetesNamespace.objects.get(name="ns4").uid == "ns4-uid"
+    assert KubernetesNamespace.objects.count() == 51
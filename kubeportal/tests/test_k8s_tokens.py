@@ -0,0 +1,56 @@
+"""
+Tests for the service account token store.
+"""
+
+from base64 import b64encode
+
+import pytest
+from kubernetes import client
+
+from kubeportal.k8s.tokens import TokenStore, SERVICE_ACCOUNT_ANNOTATION
+
+
+def _token_secret(name, token):
+    return client.V1Secret(
+        metadata=client.V1ObjectMeta(name=name, namespace="default",
+                                     annotations={SERVICE_ACCOUNT_ANNOTATION: "default"}),
+        data={'token': b64encode(token.encode()).decode()})
+
+
+@pytest.fixture
+def store(settings, mocker):
+    settings.TOKEN_CACHE_WATCH = False
+    mocker.patch('kubeportal.k8s.tokens.fetch_token', return_value=("default-token-abc", "first"))
+    return TokenStore()
+
+
+def test_token_store_cached(store):
+    assert store.get("default", "default") == "first"
+    assert store.get("default", "default") == "first"
+    assert store.stats()['hits'] == 1
+    assert store.stats()['misses'] == 1
+
+
+def test_token_store_expiry(store, settings):
+    settings.TOKEN_CACHE_TTL = 0
+    store.get("default", "default")
+    store.get("default", "default")
+    assert store.stats()['misses'] == 2
+
+
+def test_token_store_rotation(store):
+    store.get("default", "default")
+    store.handle_event('MODIFIED', _token_secret("default-token-abc", "second"))
+    assert store.get("default", "default") == "second"
+    # Events for other secrets of the same service account are ignored
+    store.handle_event('MODIFIED', _token_secret("default-token-xyz", "third"))
+    assert store.get("default", "default") == "second"
+    assert store.stats()['misses'] == 1
+
+
+def test_token_store_secret_deleted(store):
+    store.get("default", "default")
+    store.handle_event('DELETED', _token_secret("default-token-abc", "first"))
+    assert store.stats()['size'] == 0
+    store.get("default", "default")
+    assert store.stats()['misses'] == 2
@@ -0,0 +1,58 @@
+"""
+Tests for the Prometheus metrics.
+"""
+
+import pytest
+from kubernetes import client
+from prometheus_client import REGISTRY
+
+from kubeportal import metrics
+from kubeportal.k8s import kubernetes_api as api
+from kubeportal.k8s.resilience import ResilientApiClient, breaker
+from kubeportal.models.webapplication import WebApplication
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.django_db
+def test_request_latency(client):
+    before = _value('kubeportal_request_duration_seconds_count', view='health', method='GET', status='2xx')
+    client.get('/health/')
+    after = _value('kubeportal_request_duration_seconds_count', view='health', method='GET', status='2xx')
+    assert after == before + 1
+
+
+def test_api_call_attributed_to_function(mocker):
+    breaker.reset()
+    mocker.patch.object(client.ApiClient, 'call_api')
+    mocker.patch('kubeportal.k8s.kubernetes_api.get_portal_api_client', return_value=ResilientApiClient())
+    mocker.patch('kubeportal.k8s.kubernetes_api._version', {'value': None, 'checked': None})
+    before = _value('kubeportal_k8s_api_calls_total', function='get_kubernetes_version', method='GET', outcome='success')
+    api.get_kubernetes_version()
+    after = _value('kubeportal_k8s_api_calls_total', function='get_kubernetes_version', method='GET', outcome='success')
+    assert after == before + 1
+
+
+def test_cache_access():
+    before = _value('kubeportal_cache_requests_total', cache='tokens', result='hit')
+    metrics.cache_access('tokens', True)
+    assert _value('kubeportal_cache_requests_total', cache='tokens', result='hit') == before + 1
+
+
+@pytest.mark.django_db
+def test_subauth_decision(client):
+    app = WebApplication(name="app", can_subauth=True)
+    app.save()
+    before = _value('kubeportal_subauth_decisions_total', result='denied', reason='anonymous')
+    client.get(f'/subauthreq/{app.pk}/')
+    assert _value('kubeportal_subauth_decisions_total', result='denied', reason='anonymous') == before + 1
+
+
+@pytest.mark.django_db
+def test_metrics_view(client):
+    response = client.get('/metrics/')
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain')
+    assert b'kubeportal_request_duration_seconds' in response.content
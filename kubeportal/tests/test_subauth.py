@@ -2,11 +2,25 @@
 Tests for the sub-authentication feature of the portal.
 """
 
+import time
+from importlib import import_module
+from wsgiref.util import setup_testing_defaults
+
 import pytest
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
 
+from kubeportal import access
+from kubeportal.models.kubernetesnamespace import KubernetesNamespace
+from kubeportal.models.kubernetesserviceaccount import KubernetesServiceAccount
 from kubeportal.models.portalgroup import PortalGroup
 from kubeportal.models.webapplication import WebApplication
 from kubeportal.tests.helpers import create_group
+from kubeportal.subauth_app import SubAuthApplication
 from kubeportal.views import SubAuthRequestView
 from kubeportal.tests.helpers import minikube_unavailable
 
@@ -94,3 +108,198 @@ def test_subauth_view_existent_app(client):
     app1.save()
     response = client.get('/subauthreq/{}/'.format(app1.pk))
     assert response.status_code == 401
+
+
+@pytest.fixture
+def subauth_setup(admin_user, mocker):
+    ns = KubernetesNamespace(name="subauth", uid="subauth-uid")
+    ns.save()
+    svca = KubernetesServiceAccount(name="default", uid="subauth-svca-uid", namespace=ns)
+    svca.save()
+    admin_user.service_account = svca
+    admin_user.save()
+    webapp = WebApplication(name="Cached Web App", can_subauth=True)
+    webapp.save()
+    group = PortalGroup(name="Cached group")
+    group.save()
+    group.members.add(admin_user)
+    group.can_web_applications.add(webapp)
+    get_token = mocker.patch('kubeportal.k8s.kubernetes_api.get_token', return_value="secret-token")
+    return webapp, group, get_token
+
+
+@pytest.mark.django_db
+def test_subauth_decision_cached(subauth_setup, admin_client):
+    webapp, group, get_token = subauth_setup
+    response = admin_client.get(f'/subauthreq/{webapp.pk}/')
+    assert response.status_code == 200
+    assert response['Authorization'] == 'Bearer secret-token'
+
+    with CaptureQueriesContext(connection) as queries:
+        response = admin_client.get(f'/subauthreq/{webapp.pk}/')
+    assert response.status_code == 200
+    # Only the session is loaded (apart from the profiler), and no API server call happens
+    portal_queries = [q['sql'] for q in queries if 'silk_' not in q['sql'] and 'SAVEPOINT' not in q['sql']]
+    assert len(portal_queries) == 1
+    assert 'django_session' in portal_queries[0]
+    assert response['Authorization'] == 'Bearer secret-token'
+    get_token.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_subauth_cache_invalidated(subauth_setup, admin_client, admin_user):
+    webapp, group, get_token = subauth_setup
+    assert admin_client.get(f'/subauthreq/{webapp.pk}/').status_code == 200
+    group.can_web_applications.remove(webapp)
+    assert admin_client.get(f'/subauthreq/{webapp.pk}/').status_code == 401
+    group.can_web_applications.add(webapp)
+    assert admin_client.get(f'/subauthreq/{webapp.pk}/').status_code == 200
+    group.members.remove(admin_user)
+    assert admin_client.get(f'/subauthreq/{webapp.pk}/').status_code == 401
+    group.members.add(admin_user)
+    admin_user.service_account = None
+    admin_user.save()
+    assert admin_client.get(f'/subauthreq/{webapp.pk}/').status_code == 401
+
+
+@pytest.mark.django_db
+def test_subauth_missing_token_not_cached(subauth_setup, admin_client):
+    webapp, group, get_token = subauth_setup
+    get_token.side_effect = Exception()
+    assert admin_client.get(f'/subauthreq/{webapp.pk}/').status_code == 401
+    get_token.side_effect = None
+    assert admin_client.get(f'/subauthreq/{webapp.pk}/').status_code == 200
+
+
+def _call_fast_path(application, path, cookie):
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', 'HTTP_COOKIE': cookie}
+    setup_testing_defaults(environ)
+    result = {}
+
+    def start_response(status, headers):
+        result['status'], result['headers'] = status, dict(headers)
+
+    application(environ, start_response)
+    return result
+
+
+@pytest.mark.django_db
+def test_subauth_fast_path(subauth_setup, admin_client, mocker):
+    webapp, group, get_token = subauth_setup
+    # The test database connection must survive
+    mocker.patch('kubeportal.subauth_app.close_old_connections')
+    django_application = mocker.Mock(return_value=[b''])
+    application = SubAuthApplication(django_application)
+    path = f'/subauthreq/{webapp.pk}/'
+    cookie = f'{settings.SESSION_COOKIE_NAME}={admin_client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    # Nothing cached yet, the Django application decides
+    _call_fast_path(application, path, cookie)
+    assert django_application.call_count == 1
+
+    assert admin_client.get(path).status_code == 200
+    with CaptureQueriesContext(connection) as queries:
+        result = _call_fast_path(application, path, cookie)
+    # Only the session is loaded
+    assert len(queries) == 1
+    assert django_application.call_count == 1
+    assert result['status'] == '200 OK'
+    assert result['headers']['Authorization'] == 'Bearer secret-token'
+
+    # Other sessions, paths and changed permissions are not answered from the cache
+    _call_fast_path(application, path, f'{settings.SESSION_COOKIE_NAME}=unknown')
+    _call_fast_path(application, '/subauthreq/abc/', cookie)
+    group.can_web_applications.remove(webapp)
+    _call_fast_path(application, path, cookie)
+    assert django_application.call_count == 4
+
+    assert admin_client.get(path).status_code == 401
+    assert _call_fast_path(application, path, cookie)['status'] == '401 Unauthorized'
+    assert django_application.call_count == 4
+
+
+@pytest.fixture
+def ticket_setup(subauth_setup, settings, mocker):
+    settings.SUBAUTH_TICKET_LIFETIME = 60
+    mocker.patch('kubeportal.k8s.kubernetes_api.get_service_account_token', return_value="secret-token")
+    return subauth_setup
+
+
+def _ticket_client(ticket):
+    ticket_client = Client()
+    ticket_client.cookies[access.TICKET_COOKIE_NAME] = ticket
+    return ticket_client
+
+
+@pytest.mark.django_db
+def test_subauth_ticket(ticket_setup, admin_client, mocker):
+    webapp, group, get_token = ticket_setup
+    response = admin_client.get(f'/subauthreq/{webapp.pk}/')
+    assert response.status_code == 200
+    ticket = response.cookies[access.TICKET_COOKIE_NAME]
+    assert ticket['httponly']
+    assert ticket['max-age'] == 60
+
+    # The ticket alone is enough, without session
+    ticket_client = _ticket_client(ticket.value)
+    with CaptureQueriesContext(connection) as queries:
+        response = ticket_client.get(f'/subauthreq/{webapp.pk}/')
+    assert response.status_code == 200
+    assert response['Authorization'] == 'Bearer secret-token'
+    assert [q['sql'] for q in queries if 'silk_' not in q['sql'] and 'SAVEPOINT' not in q['sql']] == []
+
+    # Only for the web applications that were allowed when the ticket was issued
+    other_webapp = WebApplication(name="Other Web App", can_subauth=True)
+    other_webapp.save()
+    assert ticket_client.get(f'/subauthreq/{other_webapp.pk}/').status_code == 401
+
+    # Forged and expired tickets are rejected
+    assert _ticket_client(ticket.value + 'x').get(f'/subauthreq/{webapp.pk}/').status_code == 401
+    mocker.patch('django.core.signing.time.time', return_value=time.time() + 61)
+    assert ticket_client.get(f'/subauthreq/{webapp.pk}/').status_code == 401
+
+
+@pytest.mark.django_db
+def test_subauth_ticket_revoked(ticket_setup, admin_client, admin_user):
+    webapp, group, get_token = ticket_setup
+    ticket = admin_client.get(f'/subauthreq/{webapp.pk}/').cookies[access.TICKET_COOKIE_NAME].value
+    ticket_client = _ticket_client(ticket)
+    assert ticket_client.get(f'/subauthreq/{webapp.pk}/').status_code == 200
+    group.members.remove(admin_user)
+    assert ticket_client.get(f'/subauthreq/{webapp.pk}/').status_code == 401
+
+    group.members.add(admin_user)
+    ticket = admin_client.get(f'/subauthreq/{webapp.pk}/').cookies[access.TICKET_COOKIE_NAME].value
+    ticket_client = _ticket_client(ticket)
+    assert ticket_client.get(f'/subauthreq/{webapp.pk}/').status_code == 200
+    admin_client.logout()
+    assert ticket_client.get(f'/subauthreq/{webapp.pk}/').status_code == 401
+
+
+@pytest.mark.django_db
+def test_subauth_ticket_disabled(subauth_setup, admin_client):
+    webapp, group, get_token = subauth_setup
+    response = admin_client.get(f'/subauthreq/{webapp.pk}/')
+    assert response.status_code == 200
+    assert access.TICKET_COOKIE_NAME not in response.cookies
+
+
+@pytest.mark.django_db
+def test_logout_reaches_all_workers(admin_client, mocker):
+    """
+    Each worker process has its own cache, a logout in one of them
+    must invalidate the session for all of them.
+    """
+    engine = import_module(settings.SESSION_ENGINE)
+    session_key = admin_client.cookies[settings.SESSION_COOKIE_NAME].value
+    worker_caches = [LocMemCache('worker-a', {}), LocMemCache('worker-b', {})]
+
+    def load_in_worker(worker_cache):
+        mocker.patch('django.contrib.sessions.backends.cached_db.caches', {'default': worker_cache})
+        return engine.SessionStore(session_key)
+
+    for worker_cache in worker_caches:
+        assert load_in_worker(worker_cache).get(SESSION_KEY) is not None
+    # Logout in the first worker
+    load_in_worker(worker_caches[0]).flush()
+    assert load_in_worker(worker_caches[1]).get(SESSION_KEY) is None
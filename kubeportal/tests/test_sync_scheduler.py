@@ -0,0 +1,74 @@
+"""
+Tests for the leader-elected background synchronization.
+"""
+
+import time
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from kubeportal.k8s import sync_scheduler
+from kubeportal.models.synclease import SyncLease
+
+
+@pytest.mark.django_db
+def test_lease():
+    assert sync_scheduler.acquire_lease("a", 60)
+    assert not sync_scheduler.acquire_lease("b", 60)
+    # Renewing works for the holder
+    assert sync_scheduler.acquire_lease("a", 60)
+    # An expired lease can be taken over
+    SyncLease.objects.update(expires=timezone.now() - timedelta(seconds=1))
+    assert sync_scheduler.acquire_lease("b", 60)
+    assert not sync_scheduler.acquire_lease("a", 60)
+
+
+@pytest.mark.django_db
+def test_run_once(mocker):
+    sync = mocker.patch('kubeportal.k8s.sync_scheduler.k8s_sync.sync', return_value=True)
+    assert sync_scheduler.run_once("a", interval=60) is True
+    assert sync_scheduler.run_once("b", interval=60) is None
+    sync.assert_called_once()
+    state = sync_scheduler.get_state()
+    assert state.last_holder == "a"
+    assert state.last_result is True
+    assert state.last_duration >= 0
+
+    sync.side_effect = RuntimeError()
+    assert sync_scheduler.run_once("a", interval=60) is False
+    assert sync_scheduler.get_state().last_result is False
+
+
+@pytest.mark.django_db
+def test_lease_renewed_during_run(mocker):
+    renewals = []
+
+    def acquire_lease(holder, duration, name=sync_scheduler.LEASE_NAME):
+        renewals.append((holder, duration))
+        return True
+
+    mocker.patch('kubeportal.k8s.sync_scheduler.acquire_lease', acquire_lease)
+    mocker.patch('kubeportal.k8s.sync_scheduler.k8s_sync.sync', side_effect=lambda: time.sleep(0.5) or True)
+    assert sync_scheduler.run_once("a", interval=0.1) is True
+    # Acquired before, renewed by the heartbeat every 0.1 seconds, and renewed after the run
+    assert len(renewals) >= 4
+    assert set(renewals) == {("a", 0.1 * 3)}
+
+
+def test_disabled(settings, mocker):
+    settings.SYNC_INTERVAL = 0
+    thread = mocker.patch('kubeportal.k8s.sync_scheduler.threading.Thread')
+    sync_scheduler.SyncScheduler().start()
+    thread.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_admin_index(admin_client, settings, mocker):
+    settings.SYNC_INTERVAL = 300
+    mocker.patch('kubeportal.k8s.sync_scheduler.k8s_sync.sync', return_value=True)
+    sync_scheduler.run_once("replica-1:42")
+    response = admin_client.get('/admin/')
+    assert response.status_code == 200
+    assert b"replica-1:42" in response.content
+    assert b"successful" in response.content
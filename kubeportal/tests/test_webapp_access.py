@@ -0,0 +1,119 @@
+"""
+Tests for the materialized access of users to web applications.
+"""
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from kubeportal.models import User
+from kubeportal.models.portalgroup import PortalGroup
+from kubeportal.models.webapplication import WebApplication
+from kubeportal.models.webapplicationaccess import WebApplicationAccess
+
+
+def _pairs():
+    return set(WebApplicationAccess.objects.values_list('user_id', 'webapp_id'))
+
+
+def _assert_consistent():
+    assert WebApplicationAccess.verify() == (set(), set())
+
+
+@pytest.fixture
+def apps_and_groups(admin_user):
+    first = WebApplication.objects.create(name="First")
+    second = WebApplication.objects.create(name="Second")
+    group_a = PortalGroup.objects.create(name="A")
+    group_b = PortalGroup.objects.create(name="B")
+    return admin_user, first, second, group_a, group_b
+
+
+@pytest.mark.django_db
+def test_access_maintained(apps_and_groups):
+    user, first, second, group_a, group_b = apps_and_groups
+    other = User.objects.create(username="other")
+
+    group_a.can_web_applications.add(first)
+    group_a.members.add(user, other)
+    assert (user.pk, first.pk) in _pairs()
+    user.portal_groups.add(group_b)
+    second.portal_groups.add(group_b)
+    assert {(user.pk, first.pk), (user.pk, second.pk), (other.pk, first.pk)} <= _pairs()
+    _assert_consistent()
+
+    # Access through two groups survives the removal of one of them
+    group_b.can_web_applications.add(first)
+    group_a.members.remove(user)
+    assert (user.pk, first.pk) in _pairs()
+    _assert_consistent()
+
+    group_b.can_web_applications.clear()
+    assert (user.pk, first.pk) not in _pairs()
+    _assert_consistent()
+
+    group_a.members.clear()
+    assert (other.pk, first.pk) not in _pairs()
+    group_a.members.add(other)
+    first.portal_groups.clear()
+    _assert_consistent()
+
+    first.portal_groups.add(group_a)
+    other.portal_groups.clear()
+    _assert_consistent()
+
+    group_a.members.add(other)
+    group_a.delete()
+    assert (other.pk, first.pk) not in _pairs()
+    _assert_consistent()
+
+    second.portal_groups.add(group_b)
+    second.delete()
+    other.delete()
+    _assert_consistent()
+
+
+@pytest.mark.django_db
+def test_checks_use_access_table(apps_and_groups, django_assert_num_queries):
+    user, first, second, group_a, group_b = apps_and_groups
+    second.link_show = True
+    second.save()
+    group_a.can_web_applications.add(first, second)
+    group_b.can_web_applications.add(second)
+    user.portal_groups.add(group_a, group_b)
+
+    with django_assert_num_queries(1):
+        assert user.can_subauth(first)
+    assert list(user.web_applications(include_invisible=True).order_by('pk')) == [first, second]
+    assert list(user.web_applications(include_invisible=False)) == [second]
+
+
+@pytest.mark.django_db
+def test_rebuild_command(apps_and_groups):
+    user, first, second, group_a, group_b = apps_and_groups
+    group_a.can_web_applications.add(first)
+    group_a.members.add(user)
+    WebApplicationAccess.objects.filter(user=user, webapp=first).delete()
+    WebApplicationAccess.objects.create(user=user, webapp=second)
+
+    with pytest.raises(CommandError):
+        call_command('rebuild_webapp_access', verify_only=True)
+    call_command('rebuild_webapp_access')
+    assert (user.pk, first.pk) in _pairs()
+    assert (user.pk, second.pk) not in _pairs()
+    call_command('rebuild_webapp_access', verify_only=True)
+
+
+@pytest.mark.django_db
+def test_large_group(apps_and_groups):
+    user, first, second, group_a, group_b = apps_and_groups
+    User.objects.bulk_create([User(username=f"member-{i}") for i in range(1500)])
+    group_a.can_web_applications.add(first, second)
+    group_a.members.add(*User.objects.all())
+    assert WebApplicationAccess.objects.count() == 2 * User.objects.count()
+
+    group_a.can_web_applications.remove(first)
+    assert not WebApplicationAccess.objects.filter(webapp=first).exists()
+    group_a.members.clear()
+    assert not WebApplicationAccess.objects.exists()
+    _assert_consistent()
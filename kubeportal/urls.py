@@ -23,6 +23,8 @@ urlpatterns = [
     path('settings/', views.SettingsView.as_view(), name="settings"),
     path('settings/update', views.SettingsView.update_settings, name="update_settings"),
     path('access/request/', views.AccessRequestView.as_view(), name="access_request"),
+    path('health/', views.HealthView.as_view(), name="health"),
+    path('metrics/', views.MetricsView.as_view(), name="metrics"),
 
     # backend web views
     path('admin/', admin_site.urls),
@@ -62,6 +64,8 @@ urlpatterns = [
     path('api/<str:version>/groups/<int:group_id>/', api_views.GroupView.as_view(), name='group'),
     path('api/<str:version>/webapps/<int:webapp_id>/', api_views.WebAppView.as_view(), name='webapplication'),
     path('api/<str:version>/infos/', api_views.InfoView.as_view(), name='info_overview'),
+    path('api/<str:version>/infos/batch/', api_views.InfoBatchView.as_view(), name='info_batch'),
+    path('api/<str:version>/infos/history/', api_views.InfoHistoryView.as_view(), name='info_history'),
     path('api/<str:version>/infos/<str:info_slug>/', api_views.InfoDetailView.as_view(), name='info_detail'),
     path('api/<str:version>/news/', api_views.NewsView.as_view(), name='news'),
     path('api/<str:version>/ingresshosts/', api_views.IngressHostsView.as_view()),
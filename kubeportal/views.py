@@ -1,13 +1,15 @@
 from django.views.generic.base import TemplateView, View, RedirectView
-from django.http.response import HttpResponse
+from django.http.response import HttpResponse, JsonResponse
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.contrib.auth import get_user_model
+from django.contrib.auth import get_user_model, SESSION_KEY, HASH_SESSION_KEY
 from django.shortcuts import get_object_or_404, redirect
 from kubeportal.models.webapplication import WebApplication
 from kubeportal.models.news import News
 from .k8s import kubernetes_api as api
+from .k8s import stats as cluster_stats
+from . import access, metrics
 
 import logging
 
@@ -24,17 +26,24 @@ class StatsView(LoginRequiredMixin, TemplateView):
         try:
             context['usercount'] = User.objects.count()
             context['version'] = settings.VERSION
-            context['k8sversion'] = api.get_kubernetes_version()
-            context['apiserver'] = api.get_apiserver()
-            context['numberofnodes'] = api.get_number_of_nodes()
-            context['cpusum'] = api.get_number_of_cpus()
-            context['memsum'] = api.get_memory_sum()
-            context['numberofpods'] = api.get_number_of_pods()
-            context['numberofvolumes'] = api.get_number_of_volumes()
+            stats, context['snapshot_age'] = cluster_stats.get_snapshot()
+            context['k8sversion'] = stats['k8s_version']
+            context['apiserver'] = stats['k8s_apiserver_url']
+            context['numberofnodes'] = stats['k8s_node_count']
+            context['cpusum'] = stats['k8s_cpu_count']
+            context['memsum'] = stats['k8s_mem_sum']
+            context['numberofpods'] = stats['k8s_pod_count']
+            context['numberofvolumes'] = stats['k8s_volume_count']
         except Exception as e:
             logger.exception("Failed to fetch Kubernetes stats: {}".format(e))
         return context
 
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        if 'snapshot_age' in context:
+            response['Age'] = str(context['snapshot_age'])
+        return response
+
 
 class WelcomeView(LoginRequiredMixin, TemplateView):
     template_name = "portal_welcome.html"
@@ -107,6 +116,9 @@ class SubAuthRequestView(View):
     official documentation for more information.
 
     This view assumes a valid K8S service account linked to the portal user.
+
+    Decisions are cached per user and web application (see kubeportal.access),
+    so that repeated checks need neither database queries nor API server calls.
     """
     http_method_names = ['get']
 
@@ -117,25 +129,27 @@ class SubAuthRequestView(View):
         logger.debug("  GET parameters: " + str(request.GET))
         logger.debug("  POST parameters: " + str(request.POST))
 
-    def get(self, request, *args, **kwargs):
-        webapp = get_object_or_404(WebApplication, pk=kwargs['webapp_pk'])
+    def _decide(self, request, webapp_pk):
+        """
+        Returns a tuple of decision, reason and bearer token.
+        """
+        webapp = get_object_or_404(WebApplication, pk=webapp_pk)
         if (not request.user) or (not request.user.is_authenticated):
             logger.debug(f"Rejecting authorization for {request.user} through sub-request, user is anonymous / not authenticated.")
             self._dump_request_info(request)
-            # 401 is the expected fail code in ingress-nginx
-            return HttpResponse(status=401)
+            return False, 'anonymous', None
         elif not webapp.can_subauth:
             logger.debug(f"Rejecting authorization for {webapp} through sub-request for user {request.user}, subauth is not enabled for this app.")
             self._dump_request_info(request)
-            return HttpResponse(status=401)
+            return False, 'subauth_disabled', None
         elif not request.user.service_account:
             logger.debug(f"Rejecting authorization for {webapp} through sub-request, user {request.user} has no Kubernetes access.")
             self._dump_request_info(request)
-            return HttpResponse(status=401)
+            return False, 'no_service_account', None
         elif not request.user.can_subauth(webapp):
             logger.debug(f"Rejecting authorization for {webapp} through sub-request, forbidden for user {request.user} through group membership constellation.")
             self._dump_request_info(request)
-            return HttpResponse(status=401)
+            return False, 'forbidden', None
         else:
             # This produces an event storm on applications such as K8S dashboard, and should only be
             # enabled as last resort
@@ -144,14 +158,58 @@ class SubAuthRequestView(View):
             #    request.user,
             #    request.user.service_account.namespace.name,
             #    request.user.service_account.name))
-            response = HttpResponse()
             token = request.user.token
             if token:
-                response['Authorization'] = 'Bearer ' + token
-                return response
+                return True, 'ok', token
             else:
                 logger.error(f"Error while fetching Kubernetes secret bearer token for user {request.user}, must reject valid  authorization for {webapp} through subrequest.")
-                return HttpResponse(status=401)
+                return False, 'no_token', None
+
+    def _respond(self, allowed, reason, token):
+        metrics.subauth_decisions.labels('allowed' if allowed else 'denied', reason).inc()
+        if not allowed:
+            # 401 is the expected fail code in ingress-nginx
+            return HttpResponse(status=401)
+        response = HttpResponse()
+        response['Authorization'] = 'Bearer ' + token
+        return response
+
+    def _set_ticket(self, request, response):
+        service_account = request.user.service_account
+        webapp_pks = request.user.web_applications(include_invisible=True) \
+            .filter(can_subauth=True).values_list('pk', flat=True)
+        ticket = access.issue_ticket(request.user.pk, service_account.namespace.name,
+                                     service_account.name, webapp_pks)
+        response.set_cookie(access.TICKET_COOKIE_NAME, ticket,
+                            max_age=settings.SUBAUTH_TICKET_LIFETIME,
+                            domain=settings.SESSION_COOKIE_DOMAIN,
+                            secure=settings.SESSION_COOKIE_SECURE,
+                            httponly=True, samesite='Lax')
+
+    def get(self, request, *args, **kwargs):
+        webapp_pk = kwargs['webapp_pk']
+        # A valid ticket needs neither session nor database
+        token = access.ticket_token(request.COOKIES.get(access.TICKET_COOKIE_NAME), webapp_pk)
+        if token:
+            return self._respond(True, 'ticket', token)
+
+        # The session tells the user without loading it from the database
+        user_id = request.session.get(SESSION_KEY)
+        if user_id is not None:
+            decision = access.get_subauth_decision(user_id, webapp_pk)
+            # A changed password invalidates the session, as in django.contrib.auth.get_user()
+            if decision and decision['session_hash'] == request.session.get(HASH_SESSION_KEY):
+                return self._respond(decision['allowed'], decision['reason'], decision['token'])
+
+        allowed, reason, token = self._decide(request, webapp_pk)
+        # Missing tokens may be a temporary API server problem, and are not remembered
+        if user_id is not None and reason != 'no_token' and request.user.is_authenticated:
+            access.store_subauth_decision(user_id, webapp_pk, allowed, reason, token,
+                                          request.user.get_session_auth_hash())
+        response = self._respond(allowed, reason, token)
+        if allowed and settings.SUBAUTH_TICKET_LIFETIME:
+            self._set_ticket(request, response)
+        return response
 
 
 class ConfigDownloadView(LoginRequiredMixin, TemplateView):
@@ -184,3 +242,27 @@ class ConfigView(LoginRequiredMixin, TemplateView):
             User.objects.filter(is_staff=True))
         return context
 
+
+class HealthView(View):
+    """
+    Monitoring information about the connection to the Kubernetes API server.
+    Works without login and without calling the API server.
+    """
+    http_method_names = ['get']
+
+    def get(self, request):
+        return JsonResponse({'api_breaker': api.get_breaker_state(),
+                             'portal_clients': api.get_portal_pool_stats(),
+                             'user_clients': api.get_user_client_cache_stats(),
+                             'tokens': api.get_token_cache_stats()})
+
+
+class MetricsView(View):
+    """
+    Prometheus metrics in text exposition format, see kubeportal.metrics.
+    """
+    http_method_names = ['get']
+
+    def get(self, request):
+        content_type, content = metrics.exposition()
+        return HttpResponse(content, content_type=content_type)
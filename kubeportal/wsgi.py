@@ -5,4 +5,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kubeportal.settings')
 os.environ.setdefault('DJANGO_CONFIGURATION', 'Production')
 
 from configurations.wsgi import get_wsgi_application
-application = get_wsgi_application()
+from kubeportal.subauth_app import SubAuthApplication
+# Sub-authentication requests are answered from the cache when possible
+application = SubAuthApplication(get_wsgi_application())
+
+# Background synchronization, if enabled by KUBEPORTAL_SYNC_INTERVAL
+from kubeportal.k8s.sync_scheduler import scheduler
+scheduler.start()